@@ -6,23 +6,30 @@ Extracts products from ALDI category pages
 import requests
 from bs4 import BeautifulSoup
 import json
-import re
+import logging
 from typing import List, Dict, Optional
 
+from prices import parse_price_text, to_dollars
+
+
+log = logging.getLogger(__name__)
+
 
 class AldiScraper:
     """Scraper for ALDI Australia products"""
 
-    def __init__(self):
-        self.base_url = "https://www.aldi.com.au"
-        self.session = requests.Session()
+    def __init__(self, session=None, base_url: str = "https://www.aldi.com.au"):
+        # base_url can point at a mock server (mock_supermarket_server.py)
+        self.base_url = base_url.rstrip('/')
+        # Injected sessions let the pipeline replay captured responses (replay.py)
+        self.session = session or requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
         })
 
-    def scrape_category(self, category_url: str) -> List[Dict]:
+    def scrape_category(self, category_url: str, page: int = 1) -> List[Dict]:
         """
         Scrape products from an ALDI category page
 
@@ -30,6 +37,7 @@ class AldiScraper:
             category_url: Full URL or path to category page
                          e.g., "/products/fruits-vegetables/fresh-fruits/k/1111111152"
                          or "https://www.aldi.com.au/products/fruits-vegetables/fresh-fruits/k/1111111152"
+            page: Results page, starting at 1
 
         Returns:
             List of product dictionaries
@@ -39,25 +47,25 @@ class AldiScraper:
             url = self.base_url + category_url
         else:
             url = category_url
+        if page > 1:
+            url += f"{'&' if '?' in url else '?'}page={page}"
 
-        print(f"\n[INFO] Scraping ALDI category: {url}")
+        log.info("Scraping ALDI category: %s", url)
 
         try:
             response = self.session.get(url, timeout=30)
 
             if response.status_code != 200:
-                print(f"[ERROR] HTTP {response.status_code}")
+                log.error("Category HTTP %s", response.status_code)
                 return []
 
             products = self._extract_products_from_html(response.text)
-            print(f"[OK] Found {len(products)} products")
+            log.info("Found %d products", len(products))
 
             return products
 
         except Exception as e:
-            print(f"[ERROR] {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Category failed: %s", e)
             return []
 
     def _extract_products_from_html(self, html: str) -> List[Dict]:
@@ -73,7 +81,7 @@ class AldiScraper:
                 if product:
                     products.append(product)
             except Exception as e:
-                print(f"[WARNING] Failed to parse product: {e}")
+                log.warning("Failed to parse product: %s", e)
                 continue
 
         return products
@@ -111,15 +119,24 @@ class AldiScraper:
 
             # Extract numeric price and unit
             # Format: "($1.49 per 1 each)" or "($5.99 per 1 kg)"
-            price_match = re.search(r'\$?([\d.]+)\s*per\s*([\d.]+)?\s*(.+?)\)?$', price_text)
-            if price_match:
-                product['price'] = float(price_match.group(1))
-                product['unit'] = price_match.group(3).strip()
+            parsed = parse_price_text(price_text)
+            if parsed:
+                product['price'] = to_dollars(parsed.cents)
+                product['unit'] = parsed.unit
 
                 # Calculate base price if quantity specified
-                quantity = price_match.group(2)
-                if quantity and float(quantity) != 1:
-                    product['base_price'] = product['price'] / float(quantity)
+                if parsed.quantity != 1:
+                    product['base_price'] = product['price'] / parsed.quantity
+
+        # Shelf price, e.g. "$2.99" or "$5.39 /0.9 kg"; the price above is per comparison unit
+        shelf_price = tile.select_one('.base-price__regular') or tile.select_one('.base-price')
+        if shelf_price:
+            product['shelf_price_text'] = shelf_price.get_text(' ', strip=True)
+
+        # Pack size, e.g. "250 g"
+        size = tile.select_one('.product-tile__unit-of-measurement')
+        if size:
+            product['size'] = size.get_text(strip=True)
 
         # Brand (if available)
         brand = tile.find(class_='product-tile__brand')
@@ -138,11 +155,12 @@ class AldiScraper:
         """Save products to JSON file"""
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(products, f, indent=2, ensure_ascii=False)
-        print(f"[OK] Saved {len(products)} products to: {filename}")
+        log.info("Saved %d products to: %s", len(products), filename)
 
 
 def main():
     """Example usage"""
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
     scraper = AldiScraper()
 
     # Scrape fresh fruits category
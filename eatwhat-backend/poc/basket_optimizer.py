@@ -0,0 +1,311 @@
+"""
+Basket Optimizer
+Finds the cheapest way to buy a shopping list across Woolworths, Coles and
+ALDI under a store constraint ("single store", "at most 2 stores"), using
+the trigram index for candidates, product_matcher clusters for equivalent
+products and pack sizes / unit prices for the cost of the needed quantity
+
+Usage:
+    python basket_optimizer.py [all_supermarkets_products.json] [max_stores]
+"""
+
+import json
+import math
+import re
+import sys
+from collections import namedtuple
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from compression import open_input, resolve_input
+from normalize import to_rows
+from product import Product, Unit, products_from_scraped
+from product_index import DEFAULT_MIN_SCORE, ProductIndex
+from unit_prices import BASE_EACH, BASE_KG, BASE_L, BASE_NONE, normalize_products, parse_measure
+
+
+# Candidates within this much of a store's best match_score compete on price
+SCORE_TOLERANCE = 0.1
+
+CANDIDATES_PER_INGREDIENT = 30
+
+# A cluster mate found only through its cluster scores this share of the
+# match it was found through
+MATE_SCORE_FACTOR = 0.9
+
+# Recipe units that mean "a number of items"
+_COUNT_UNITS = {'each', 'ea', 'piece', 'pieces', 'pc', 'pcs', 'whole', 'head', 'heads', 'bunch', 'bunches'}
+
+_SIZE = re.compile(r'(\d+(?:\.\d+)?)\s*(kg|g|ml|l)\b')
+
+ShoppingItem = namedtuple('ShoppingItem', ['name', 'quantity', 'unit'])
+
+# One bought line: the product, how many packs (or kg/L when sold by weight)
+# and its cost
+BasketLine = namedtuple('BasketLine', ['item', 'product', 'amount', 'cost_cents', 'match_score'])
+
+Basket = namedtuple('Basket', ['stores', 'total_cents', 'lines', 'unmatched'])
+
+
+def needed_quantity(item: ShoppingItem) -> Tuple[int, float]:
+    """(base unit, quantity) an ingredient needs, (BASE_NONE, nan) if not measurable"""
+    unit = (item.unit or '').strip().lower()
+    if unit in _COUNT_UNITS:
+        return BASE_EACH, float(item.quantity)
+    return parse_measure(f"{item.quantity}{unit}")
+
+
+def pack_size(product: Product) -> Tuple[int, float]:
+    """
+    (base unit, quantity) in one unit of sale
+
+    Read from the size field or the name; approximate weights ("approx. 340g")
+    count, since that is what one item weighs. Items without a size are
+    treated as one each.
+    """
+    for text in (product.size, product.name):
+        if text:
+            match = _SIZE.search(text.lower())
+            if match:
+                return parse_measure(match.group(1) + match.group(2))
+    if product.size and product.size.strip().lower() in _COUNT_UNITS | {'1 each'}:
+        return BASE_EACH, 1.0
+    return BASE_NONE, np.nan
+
+
+def line_cost(product: Product, need: Tuple[int, float], pack: Tuple[int, float],
+              unit_price: Dict[int, float]) -> Tuple[float, float]:
+    """
+    Cost in cents of covering an ingredient with one product
+
+    Whole packs are bought when the pack size is known; products sold by
+    weight or volume without a pack size are costed by unit price; items
+    sold each cover a weight only when their weight per item is known (from
+    the two comparison prices). A weight or volume that cannot be converted
+    is not comparable and costs inf; anything else buys one unit (or the
+    number of items asked for).
+
+    Returns:
+        (amount bought, cost in cents)
+    """
+    need_unit, need_quantity = need
+    pack_unit, pack_quantity = pack
+    if product.price_cents is None:
+        return 0.0, math.inf
+    per_base = unit_price.get(need_unit)
+    known_per_base = per_base is not None and not math.isnan(per_base) and per_base > 0
+
+    if need_unit != BASE_NONE and need_unit == pack_unit:
+        packs = max(1, math.ceil(need_quantity / pack_quantity - 1e-9))
+        if known_per_base and product.price_cents == product.unit_price_cents and pack_quantity != 1:
+            # The price is already per kg / L (no shelf price), not per pack
+            return float(packs), packs * pack_quantity * per_base
+        return float(packs), packs * product.price_cents
+
+    by_weight = product.unit in (Unit.KG, Unit.G, Unit.L, Unit.ML)
+    if need_unit in (BASE_KG, BASE_L):
+        if pack_unit == BASE_NONE and by_weight and known_per_base:
+            return need_quantity, need_quantity * per_base
+        if pack_unit in (BASE_NONE, BASE_EACH) and not by_weight and known_per_base:
+            # Per-kg and per-each prices together give the weight of one item
+            per_item = product.price_cents / per_base
+            items = max(1, math.ceil(need_quantity / per_item - 1e-9))
+            return float(items), items * product.price_cents
+        return 0.0, math.inf
+
+    if need_unit == BASE_EACH:
+        packs = max(1, math.ceil(need_quantity - 1e-9))
+        return float(packs), packs * product.price_cents
+    return 1.0, float(product.price_cents)
+
+
+class BasketOptimizer:
+    """Cheapest-basket search over one crawl's products"""
+
+    def __init__(self, products: Sequence[Product], assignments: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            products: Product records of the crawl
+            assignments: Optional product_matcher cluster assignments
+                         ("<supermarket_brand>\\t<product_id>" -> cluster ID)
+        """
+        self.products = [p for p in products if p.price_cents is not None]
+        self.stores = sorted({p.supermarket.value for p in self.products})
+        self.index = ProductIndex.build(to_rows(self.products, scraped_at='-'))
+        self.position = {(p.supermarket.value, p.product_id): i for i, p in enumerate(self.products)}
+
+        table = normalize_products(self.products)
+        self.unit_prices = [
+            {BASE_KG: table.per_kg[i], BASE_L: table.per_l[i], BASE_EACH: table.per_each[i]}
+            for i in range(len(self.products))
+        ]
+        self.packs = [pack_size(p) for p in self.products]
+
+        self.cluster_of: Dict[int, int] = {}
+        self.cluster_members: Dict[int, List[int]] = {}
+        for key, cluster_id in (assignments or {}).items():
+            supermarket, product_id = key.split('\t', 1)
+            i = self._find(supermarket, product_id)
+            if i is not None:
+                self.cluster_of[i] = cluster_id
+                self.cluster_members.setdefault(cluster_id, []).append(i)
+
+        self._candidates: Dict[str, List[Tuple[int, float]]] = {}
+
+    def _find(self, supermarket_brand: str, product_id: str) -> Optional[int]:
+        return self.position.get((supermarket_brand, product_id))
+
+    def candidates(self, name: str) -> List[Tuple[int, float]]:
+        """
+        (product position, match_score) candidates for an ingredient name
+
+        Index matches plus the cluster mates of each match (same product at
+        another supermarket). A match keeps its own index score; a mate the
+        index did not return scores MATE_SCORE_FACTOR of its match, capped
+        at the best index match of its store, so a cluster never pushes a
+        store's direct matches out of SCORE_TOLERANCE. Cached per name,
+        since the same ingredients recur across meal plans.
+        """
+        cached = self._candidates.get(name)
+        if cached is not None:
+            return cached
+        direct: Dict[int, float] = {}
+        for result in self.index.search(name, limit=CANDIDATES_PER_INGREDIENT, min_score=DEFAULT_MIN_SCORE):
+            i = self._find(result['supermarket_brand'], result['product_id'])
+            if i is not None:
+                direct[i] = max(direct.get(i, 0.0), result['match_score'])
+
+        best_direct: Dict[str, float] = {}
+        for i, score in direct.items():
+            store = self.products[i].supermarket.value
+            best_direct[store] = max(best_direct.get(store, 0.0), score)
+
+        scores = dict(direct)
+        for i, score in direct.items():
+            for mate in self.cluster_members.get(self.cluster_of.get(i), ()):
+                if mate in direct:
+                    continue
+                inherited = score * MATE_SCORE_FACTOR
+                store = self.products[mate].supermarket.value
+                if store in best_direct:
+                    inherited = min(inherited, best_direct[store])
+                scores[mate] = max(scores.get(mate, 0.0), inherited)
+        self._candidates[name] = list(scores.items())
+        return self._candidates[name]
+
+    def warm(self, names: Sequence[str]):
+        """
+        Precompute candidates for known ingredient names (e.g. every recipe
+        ingredient) once per crawl, so per-request optimization only prices them
+        """
+        for name in names:
+            self.candidates(name)
+
+    def _best_per_store(self, item: ShoppingItem) -> List[Optional[Tuple[int, float, float, float]]]:
+        """Cheapest good-enough candidate at each store: (position, score, amount, cost)"""
+        need = needed_quantity(item)
+        by_store: Dict[str, List[Tuple[int, float]]] = {}
+        for i, score in self.candidates(item.name):
+            by_store.setdefault(self.products[i].supermarket.value, []).append((i, score))
+
+        best = []
+        for store in self.stores:
+            options = by_store.get(store)
+            if not options:
+                best.append(None)
+                continue
+            top = max(score for _, score in options)
+            choice = None
+            for i, score in options:
+                if score < top - SCORE_TOLERANCE:
+                    continue
+                amount, cost = line_cost(self.products[i], need, self.packs[i], self.unit_prices[i])
+                if choice is None or cost < choice[3]:
+                    choice = (i, score, amount, cost)
+            best.append(choice)
+        return best
+
+    def optimize(self, items: Sequence[ShoppingItem], max_stores: int = 1,
+                 allowed_stores: Optional[Sequence[str]] = None) -> Basket:
+        """
+        Cheapest basket visiting at most `max_stores` supermarkets
+
+        Every store combination is priced at once from an (items x stores)
+        cost matrix; the winner covers the most items, then costs the least.
+
+        Args:
+            items: Shopping list
+            max_stores: 1 for single-store, 2 for "at most two stores", ...
+            allowed_stores: Restrict to these supermarkets (default all)
+        """
+        choices = [self._best_per_store(item) for item in items]
+        costs = np.array([[math.inf if c is None else c[3] for c in row] for row in choices],
+                         dtype=np.float64).reshape(len(items), len(self.stores))
+
+        stores = [s for s in self.stores if not allowed_stores or s in allowed_stores]
+        best_subset, best_key = (), None
+        for size in range(1, min(max_stores, len(stores)) + 1):
+            for subset in combinations(stores, size):
+                columns = [self.stores.index(s) for s in subset]
+                cheapest = costs[:, columns].min(axis=1) if len(items) else np.zeros(0)
+                covered = np.isfinite(cheapest)
+                key = (-int(covered.sum()), float(cheapest[covered].sum()), size)
+                if best_key is None or key < best_key:
+                    best_subset, best_key = subset, key
+
+        lines, unmatched = [], []
+        columns = [self.stores.index(s) for s in best_subset]
+        for item, row, cost_row in zip(items, choices, costs):
+            if not columns or not np.isfinite(cost_row[columns]).any():
+                unmatched.append(item)
+                continue
+            i, score, amount, cost = row[columns[int(np.argmin(cost_row[columns]))]]
+            lines.append(BasketLine(item, self.products[i], amount, int(round(cost)), score))
+
+        used = sorted({line.product.supermarket.value for line in lines})
+        return Basket(used, sum(line.cost_cents for line in lines), lines, unmatched)
+
+
+def main():
+    """Optimize a sample shopping list against a saved crawl"""
+    import time
+    from prices import format_cents
+    from price_analytics import load_assignments
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "all_supermarkets_products.json"
+    max_stores = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    with open_input(resolve_input(source)) as f:
+        data = json.load(f)
+    products = []
+    for section in data['supermarkets'].values():
+        products.extend(products_from_scraped(section['products']))
+
+    optimizer = BasketOptimizer(products, load_assignments())
+    items = [
+        ShoppingItem('Carrot', 1, 'kg'),
+        ShoppingItem('Broccoli', 500, 'g'),
+        ShoppingItem('Capsicum', 2, 'pieces'),
+        ShoppingItem('Sweet potato', 1.5, 'kg'),
+        ShoppingItem('Red onion', 3, 'each'),
+        ShoppingItem('Cherry tomatoes', 250, 'g'),
+    ]
+    optimizer.warm([item.name for item in items])
+
+    for limit in sorted({1, max_stores}):
+        start = time.perf_counter()
+        basket = optimizer.optimize(items, max_stores=limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"\nAt most {limit} store(s): {', '.join(basket.stores)} - "
+              f"{format_cents(basket.total_cents)} ({elapsed:.1f} ms)")
+        for line in basket.lines:
+            print(f"  {line.item.name:<16} {line.product.supermarket.value:<10} {line.product.name:<40} "
+                  f"x{line.amount:g}  {format_cents(line.cost_cents)}")
+        for item in basket.unmatched:
+            print(f"  {item.name:<16} (no match)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Benchmark Regression Gate
+Compares two parser_bench.py result files benchmark by benchmark and exits
+nonzero when any parse path got slower than the threshold, so a checkout
+can gate on it
+
+A slowdown only counts when it is beyond noise:
+    - both the median and the fastest time grew by more than the threshold
+      (default 10%), so a few runs hit by machine load do not count
+    - and the median grew by more than an absolute floor (millisecond
+      paths jitter)
+    - and, with at least MIN_SAMPLES repeats on both sides, a one-sided
+      Mann-Whitney U test says the new times are larger, at ALPHA across
+      all benchmarks together (Holm correction; a dozen tests at 5% each
+      would flag something on most runs of unchanged code); with fewer
+      repeats only the fastest runs are compared
+Speedups are held to the same standard. Peak memory is compared separately
+against its own threshold.
+
+Exit codes: 0 no regressions, 1 regressions, 2 unusable input.
+
+Usage:
+    python bench_compare.py baseline.json current.json [threshold_pct] [memory_threshold_pct]
+"""
+
+import json
+import math
+import sys
+from itertools import combinations
+from typing import Dict, List, Sequence, Tuple
+
+from parser_bench import RESULTS_VERSION
+
+
+DEFAULT_THRESHOLD_PCT = 10.0
+DEFAULT_MEMORY_THRESHOLD_PCT = 20.0
+
+# Absolute slowdown below which a change is treated as noise
+MIN_DELTA_S = 0.002
+
+MIN_SAMPLES = 5
+ALPHA = 0.05
+
+# Above this many sample combinations the normal approximation is used
+_EXACT_LIMIT = 200_000
+
+# Environment fields that make timings incomparable when they differ
+_ENVIRONMENT_KEYS = ('python', 'machine', 'sizes')
+
+
+def mann_whitney_p(baseline: Sequence[float], current: Sequence[float]) -> float:
+    """
+    One-sided p-value that `current` tends to be larger than `baseline`
+
+    Exact over all rank assignments for small samples, normal approximation
+    (with tie correction) otherwise.
+    """
+    n, m = len(baseline), len(current)
+    values = sorted((v, i) for i, v in enumerate(list(baseline) + list(current)))
+    ranks = [0.0] * (n + m)
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[values[k][1]] = (i + j) / 2 + 1
+        i = j + 1
+
+    observed = sum(ranks[n:])
+    if math.comb(n + m, m) <= _EXACT_LIMIT:
+        extreme = total = 0
+        for chosen in combinations(ranks, m):
+            total += 1
+            if sum(chosen) >= observed - 1e-9:
+                extreme += 1
+        return extreme / total
+
+    u = observed - m * (m + 1) / 2
+    mean = n * m / 2
+    ties = {}
+    for rank in ranks:
+        ties[rank] = ties.get(rank, 0) + 1
+    tie_term = sum(t ** 3 - t for t in ties.values()) / ((n + m) * (n + m - 1))
+    sd = math.sqrt(n * m / 12 * ((n + m + 1) - tie_term))
+    if sd == 0:
+        return 1.0
+    z = (u - mean - 0.5) / sd
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def holm(p_values: Dict, alpha: float = ALPHA) -> set:
+    """
+    Keys whose p-value is significant at `alpha` across the whole family
+    (Holm step-down: the k-th smallest p must be below alpha / (m - k))
+    """
+    significant = set()
+    ordered = sorted(p_values.items(), key=lambda item: item[1])
+    for k, (key, p_value) in enumerate(ordered):
+        if p_value >= alpha / (len(ordered) - k):
+            break
+        significant.add(key)
+    return significant
+
+
+def _load(path: str) -> Dict:
+    with open(path, encoding='utf-8') as f:
+        document = json.load(f)
+    if document.get('version') != RESULTS_VERSION:
+        raise ValueError(f"{path}: unsupported benchmark results version {document.get('version')}")
+    return document
+
+
+def _median(values: Sequence[float]) -> float:
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def compare_results(baseline: Dict, current: Dict, threshold_pct: float = DEFAULT_THRESHOLD_PCT,
+                    memory_threshold_pct: float = DEFAULT_MEMORY_THRESHOLD_PCT) -> Tuple[List[Dict], List[str]]:
+    """
+    Compare two results documents
+
+    Returns:
+        (one comparison per benchmark present in both, warnings). A
+        comparison has benchmark, load, baseline_s, current_s, change_pct
+        (median), min_change_pct, p_value (uncorrected; None without enough
+        samples), memory_change_pct and status: 'slower', 'memory',
+        'faster' or 'same'
+    """
+    warnings = []
+    for key in _ENVIRONMENT_KEYS:
+        before = baseline.get('environment', {}).get(key)
+        after = current.get('environment', {}).get(key)
+        if before != after:
+            warnings.append(f"environment differs: {key} {before} -> {after}")
+
+    old = {(r['benchmark'], r['load']): r for r in baseline['results']}
+    new = {(r['benchmark'], r['load']): r for r in current['results']}
+    for key in sorted(old.keys() - new.keys()):
+        warnings.append(f"missing from current run: {key[0]} [{key[1]}]")
+    for key in sorted(new.keys() - old.keys()):
+        warnings.append(f"new benchmark without baseline: {key[0]} [{key[1]}]")
+
+    threshold = 1 + threshold_pct / 100
+    keys = sorted(old.keys() & new.keys())
+    tested = [key for key in keys
+              if min(len(old[key]['times_s']), len(new[key]['times_s'])) >= MIN_SAMPLES]
+    slower_p = {key: mann_whitney_p(old[key]['times_s'], new[key]['times_s']) for key in tested}
+    # The mirrored test, so "faster" is held to the same standard
+    faster_p = {key: mann_whitney_p(new[key]['times_s'], old[key]['times_s']) for key in tested}
+    significant, improved = holm(slower_p), holm(faster_p)
+
+    if tested:
+        n = min(min(len(old[key]['times_s']), len(new[key]['times_s'])) for key in tested)
+        if 1 / math.comb(2 * n, n) >= ALPHA / len(tested):
+            warnings.append(f"{n} repeats cannot show a significant change across {len(tested)} "
+                            f"benchmarks; run parser_bench.py with more repeats")
+
+    comparisons = []
+    for key in keys:
+        before, after = old[key], new[key]
+        before_times, after_times = before['times_s'], after['times_s']
+
+        if key in slower_p:
+            base_s, current_s = _median(before_times), _median(after_times)
+            p_value = slower_p[key]
+        else:
+            base_s, current_s = min(before_times), min(after_times)
+            p_value = None
+
+        ratio = current_s / base_s if base_s else 1.0
+        min_ratio = min(after_times) / min(before_times) if min(before_times) else 1.0
+        beyond_floor = abs(current_s - base_s) >= MIN_DELTA_S
+
+        memory_change = None
+        if before.get('peak_memory_bytes') and after.get('peak_memory_bytes') is not None:
+            memory_change = (after['peak_memory_bytes'] / before['peak_memory_bytes'] - 1) * 100
+
+        if (ratio > threshold and min_ratio > threshold and beyond_floor
+                and (p_value is None or key in significant)):
+            status = 'slower'
+        elif memory_change is not None and memory_change > memory_threshold_pct:
+            status = 'memory'
+        elif (ratio < 1 / threshold and min_ratio < 1 / threshold and beyond_floor
+              and (p_value is None or key in improved)):
+            status = 'faster'
+        else:
+            status = 'same'
+
+        comparisons.append({
+            'benchmark': key[0],
+            'load': key[1],
+            'baseline_s': base_s,
+            'current_s': current_s,
+            'change_pct': round((ratio - 1) * 100, 1),
+            'min_change_pct': round((min_ratio - 1) * 100, 1),
+            'p_value': round(p_value, 4) if p_value is not None else None,
+            'memory_change_pct': round(memory_change, 1) if memory_change is not None else None,
+            'status': status,
+        })
+    return comparisons, warnings
+
+
+def format_comparison(comparisons: List[Dict], warnings: List[str]) -> str:
+    lines = [f"  {'benchmark':<34} {'load':<16} {'baseline':>10} {'current':>10} {'change':>8} "
+             f"{'min':>8} {'p':>6} {'memory':>8}  status"]
+    for c in comparisons:
+        p_value = f"{c['p_value']:.3f}" if c['p_value'] is not None else 'min'
+        memory = f"{c['memory_change_pct']:+.1f}%" if c['memory_change_pct'] is not None else '-'
+        marker = {'slower': '[REGRESSION]', 'memory': '[MEMORY]', 'faster': '[faster]'}.get(c['status'], '')
+        lines.append(f"  {c['benchmark']:<34} {c['load']:<16} {c['baseline_s'] * 1000:>8.2f}ms "
+                     f"{c['current_s'] * 1000:>8.2f}ms {c['change_pct']:>+7.1f}% "
+                     f"{c['min_change_pct']:>+7.1f}% {p_value:>6} {memory:>8}  {marker}")
+    for warning in warnings:
+        lines.append(f"[WARNING] {warning}")
+    return '\n'.join(lines)
+
+
+def main():
+    """Compare two benchmark runs; exit 1 on regressions"""
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_THRESHOLD_PCT
+    memory_threshold = float(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_MEMORY_THRESHOLD_PCT
+
+    try:
+        baseline, current = _load(sys.argv[1]), _load(sys.argv[2])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(2)
+
+    comparisons, warnings = compare_results(baseline, current, threshold, memory_threshold)
+    print(f"Benchmarks: {sys.argv[1]} -> {sys.argv[2]} (threshold {threshold:g}%, memory {memory_threshold:g}%)\n")
+    print(format_comparison(comparisons, warnings))
+
+    regressions = [c for c in comparisons if c['status'] in ('slower', 'memory')]
+    if not comparisons:
+        print("\n[ERROR] No benchmarks in common")
+        sys.exit(2)
+    if regressions:
+        print(f"\n[ERROR] {len(regressions)} of {len(comparisons)} benchmarks regressed")
+        sys.exit(1)
+    print(f"\n[OK] No regressions in {len(comparisons)} benchmarks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Memory-Mapped Binary Catalogue
+Read-only snapshot of supermarket_products rows built after each crawl:
+fixed-width records, a string heap and an open-addressing hash index, so any
+number of reader processes can mmap one copy and look products up in O(1)
+without parsing anything
+
+File layout (little-endian):
+    header   magic 'EWCAT\\0\\0\\1', count, record size, slot count and the
+             offsets of the three sections (HEADER below)
+    records  count x RECORD; strings are (offset, length) into the heap,
+             length 0xFFFF meaning NULL; prices in cents, -1 meaning NULL
+    index    slots x uint32 record number + 1 (0 = empty), linear probing on
+             crc32 of b"<supermarket_brand>\\t<product_id>"
+    strings  UTF-8 heap, each distinct string stored once
+
+Usage:
+    python catalogue.py [supermarket_products.json] [catalogue.bin]
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from typing import Dict, Iterator, List, Optional
+
+from compression import open_input, resolve_input
+from prices import to_cents, to_dollars
+
+
+MAGIC = b'EWCAT\x00\x00\x01'
+
+# magic, count, record_size, slots, records_offset, index_offset, strings_offset
+HEADER = struct.Struct('<8sIIIQQQ')
+
+# String columns stored in the heap, in record order
+STRING_COLUMNS = (
+    'supermarket_brand', 'product_id', 'name', 'category', 'brand', 'size',
+    'image_url', 'sale_end_date', 'scraped_at',
+)
+
+# current/original price cents, discount, is_on_sale, padding, then one
+# (offset, length) pair per string column
+RECORD = struct.Struct('<iihBx' + 'IH' * len(STRING_COLUMNS))
+
+_NULL_LENGTH = 0xFFFF
+_NULL_CENTS = -1
+
+
+def _key(supermarket_brand: str, product_id: str) -> bytes:
+    return f"{supermarket_brand}\t{product_id}".encode('utf-8')
+
+
+def _slot_count(count: int) -> int:
+    """Power of two with load factor <= 0.5"""
+    slots = 1
+    while slots < count * 2:
+        slots <<= 1
+    return max(slots, 8)
+
+
+def write_catalogue(rows: List[Dict], path: str = "catalogue.bin") -> str:
+    """
+    Write rows as a memory-mappable catalogue (atomically replacing `path`)
+
+    Args:
+        rows: supermarket_products rows as produced by normalize.to_rows;
+              keys must be unique
+
+    Returns:
+        Path written
+    """
+    heap = bytearray()
+    offsets: Dict[str, tuple] = {}
+
+    def intern(value: Optional[str]) -> tuple:
+        if value is None:
+            return (0, _NULL_LENGTH)
+        if value not in offsets:
+            data = value.encode('utf-8')
+            if len(data) >= _NULL_LENGTH:
+                raise ValueError(f"String too long for catalogue: {value[:40]!r}...")
+            offsets[value] = (len(heap), len(data))
+            heap.extend(data)
+        return offsets[value]
+
+    slots = _slot_count(len(rows))
+    index = [0] * slots
+    records = bytearray(RECORD.size * len(rows))
+
+    for number, row in enumerate(rows):
+        strings = []
+        for column in STRING_COLUMNS:
+            strings.extend(intern(row[column]))
+        current = to_cents(row['current_price'])
+        original = to_cents(row['original_price'])
+        RECORD.pack_into(
+            records, number * RECORD.size,
+            _NULL_CENTS if current is None else current,
+            _NULL_CENTS if original is None else original,
+            row['discount_percentage'] or 0,
+            int(row['is_on_sale']),
+            *strings,
+        )
+
+        slot = zlib.crc32(_key(row['supermarket_brand'], row['product_id'])) & (slots - 1)
+        while index[slot]:
+            slot = (slot + 1) & (slots - 1)
+        index[slot] = number + 1
+
+    records_offset = HEADER.size
+    index_offset = records_offset + len(records)
+    strings_offset = index_offset + 4 * slots
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(rows), RECORD.size, slots, records_offset, index_offset, strings_offset))
+        f.write(records)
+        f.write(struct.pack(f'<{slots}I', *index))
+        f.write(heap)
+    os.replace(tmp_path, path)
+    print(f"[OK] Wrote catalogue of {len(rows)} products ({os.path.getsize(path):,} bytes) to: {path}")
+    return path
+
+
+class Catalogue:
+    """Read-only view of a catalogue file through a shared memory map"""
+
+    def __init__(self, path: str = "catalogue.bin"):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.count, record_size, self._slots,
+         self._records, self._index, self._strings) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            self._map.close()
+            raise ValueError(f"Not a catalogue file (or unsupported version): {path}")
+        # Zero-copy views; closed in close()
+        self._view = memoryview(self._map)
+        self._slot_view = self._view[self._index:self._strings].cast('I')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._slot_view.release()
+        self._view.release()
+        self._map.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _string_bytes(self, fields: tuple, column: int):
+        offset, length = fields[4 + 2 * column], fields[5 + 2 * column]
+        if length == _NULL_LENGTH:
+            return None
+        start = self._strings + offset
+        return self._view[start:start + length]
+
+    def find(self, supermarket_brand: str, product_id: str) -> Optional[int]:
+        """Record number of a product, or None; compares raw bytes, no decoding"""
+        key = _key(supermarket_brand, product_id)
+        brand_bytes, _, id_bytes = key.partition(b'\t')
+        mask = self._slots - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            entry = self._slot_view[slot]
+            if entry == 0:
+                return None
+            fields = RECORD.unpack_from(self._view, self._records + (entry - 1) * RECORD.size)
+            if self._string_bytes(fields, 1) == id_bytes and self._string_bytes(fields, 0) == brand_bytes:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def price_cents(self, supermarket_brand: str, product_id: str) -> Optional[int]:
+        """Current price of a product without materialising the row"""
+        number = self.find(supermarket_brand, product_id)
+        if number is None:
+            return None
+        cents = struct.unpack_from('<i', self._view, self._records + number * RECORD.size)[0]
+        return None if cents == _NULL_CENTS else cents
+
+    def row(self, number: int) -> Dict:
+        """Materialise record `number` as a supermarket_products row"""
+        if not 0 <= number < self.count:
+            raise IndexError(number)
+        fields = RECORD.unpack_from(self._view, self._records + number * RECORD.size)
+        current, original, discount, on_sale = fields[:4]
+        strings = {}
+        for column, name in enumerate(STRING_COLUMNS):
+            data = self._string_bytes(fields, column)
+            strings[name] = None if data is None else str(data, 'utf-8')
+        return {
+            'supermarket_brand': strings['supermarket_brand'],
+            'product_id': strings['product_id'],
+            'name': strings['name'],
+            'category': strings['category'],
+            'brand': strings['brand'],
+            'size': strings['size'],
+            'image_url': strings['image_url'],
+            'current_price': None if current == _NULL_CENTS else to_dollars(current),
+            'original_price': None if original == _NULL_CENTS else to_dollars(original),
+            'is_on_sale': bool(on_sale),
+            'discount_percentage': discount or None,
+            'sale_end_date': strings['sale_end_date'],
+            'scraped_at': strings['scraped_at'],
+        }
+
+    def get(self, supermarket_brand: str, product_id: str) -> Optional[Dict]:
+        """Look up one product by its unique key"""
+        number = self.find(supermarket_brand, str(product_id))
+        return None if number is None else self.row(number)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for number in range(self.count):
+            yield self.row(number)
+
+
+def main():
+    """Build a catalogue from a row file and time lookups against it"""
+    import time
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "supermarket_products.json"
+    path = sys.argv[2] if len(sys.argv) > 2 else "catalogue.bin"
+
+    with open_input(resolve_input(source)) as f:
+        rows = json.load(f)
+    write_catalogue(rows, path)
+
+    with Catalogue(path) as catalogue:
+        keys = [(row['supermarket_brand'], row['product_id']) for row in rows]
+        start = time.perf_counter()
+        for key in keys:
+            catalogue.get(*key)
+        elapsed = time.perf_counter() - start
+        print(f"{len(keys)} lookups: {elapsed / max(len(keys), 1) * 1e6:.1f} us each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Coles Next.js Data Client
+Fetches Coles search results from the site's Next.js data route instead of
+the search page: the page's server-side props as JSON (~70 KB) without the
+~470 KB of markup around them, and without the regex over the whole page
+
+    /_next/data/<buildId>/en/search/products.json?q=vegetables
+
+The route is addressed by the buildId of the current Coles deploy. It is
+discovered from the __NEXT_DATA__ of a search page, kept per site in
+coles_build_id.json between runs, and refreshed when the data route answers
+404 (a new deploy retired the buildId). Only when the data route fails is
+the HTML search page fetched instead, which also yields the current buildId.
+Replayed responses carry a long-retired buildId: a replay session starts
+from the route its data-route recordings use and never touches the cache.
+
+(coles_response_graphql.json, saved while probing /graphql, is the Coles
+HTML error page: there is no public GraphQL endpoint to use instead.)
+
+Usage:
+    python coles_data_client.py [search term] [pages]
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+from typing import Dict, List, Optional
+
+import requests
+
+from coles_scraper_poc import ColesScraperPOC
+from normalize import utc_timestamp
+
+
+log = logging.getLogger(__name__)
+
+BUILD_ID_CACHE = "coles_build_id.json"
+
+# Search page route when __NEXT_DATA__ does not name one
+DEFAULT_PAGE = "/search/products"
+
+# Next.js answers data requests carrying this header with JSON, never HTML
+DATA_HEADERS = {'x-nextjs-data': '1', 'Accept': 'application/json'}
+
+# Top-level __NEXT_DATA__ fields, found without decoding the page's JSON
+_BUILD_ID = re.compile(r'"buildId"\s*:\s*"([^"]+)"')
+_PAGE = re.compile(r'"page"\s*:\s*"(/[^"]*)"\s*,\s*"query"')
+_LOCALE = re.compile(r'"locale"\s*:\s*"([^"]+)"')
+
+# Data route URL: /_next/data/<buildId>[/<locale>]<page>.json
+_DATA_PATH = re.compile(r'/_next/data/([^/]+)(?:/([a-z]{2}(?:-[A-Za-z]{2})?))?(/[^?]*?)\.json(?:\?|$)')
+
+
+class ColesDataClient(ColesScraperPOC):
+    """Coles search through the Next.js data route, falling back to the HTML page"""
+
+    def __init__(self, session=None, base_url="https://www.coles.com.au",
+                 build_id_cache: Optional[str] = BUILD_ID_CACHE):
+        """
+        Args:
+            session: Optional requests session, e.g. replay.replay_session()
+            base_url: Site root, or a mock server (mock_supermarket_server.py)
+            build_id_cache: JSON file keeping the discovered route between
+                            runs; None keeps it in memory only, as does a
+                            replay session
+        """
+        super().__init__(session, base_url)
+        replay = getattr(self.session, 'is_replay', False)
+        if replay:
+            build_id_cache = None
+        self.build_id_cache = build_id_cache
+        # {'build_id', 'page', 'locale'} of the data route, once known
+        self.route: Optional[Dict] = self._recorded_route() if replay else self._load_route()
+        self.fetches = {'data': 0, 'html': 0, 'refreshes': 0}
+
+    def search_products(self, search_term, page=1):
+        """
+        Search for products, through the data route when its buildId is known
+
+        Args:
+            search_term: What to search for
+            page: Results page, starting at 1
+
+        Returns:
+            list: Product data
+        """
+        if self.route:
+            products = self._search_data(search_term, page)
+            if products is not None:
+                return products
+        self.fetches['html'] += 1
+        return super().search_products(search_term, page)
+
+    def _data_url(self) -> str:
+        locale = f"/{self.route['locale']}" if self.route.get('locale') else ''
+        return f"{self.base_url}/_next/data/{self.route['build_id']}{locale}{self.route['page']}.json"
+
+    def _search_data(self, search_term, page) -> Optional[List[Dict]]:
+        """Products from the data route, or None when the HTML page is needed"""
+        url = self._data_url()
+        params = {'q': search_term}
+        if page > 1:
+            params['page'] = page
+        log.info("Searching for: %s", search_term)
+        log.debug("Data route: %s?q=%s", url, search_term)
+
+        try:
+            response = self.session.get(url, params=params, headers=DATA_HEADERS, timeout=30)
+        except requests.RequestException as e:
+            log.warning("Data route failed (%s), using the search page", type(e).__name__)
+            return None
+        log.debug("Status: %s", response.status_code)
+
+        if response.status_code == 404:
+            # The deploy behind this buildId is gone; the search page names the new one
+            log.warning("buildId %s is stale, refreshing from the search page", self.route['build_id'])
+            self.fetches['refreshes'] += 1
+            self.route = None
+            return None
+        if response.status_code == 429:
+            # Fetching the heavier page as well would only deepen the rate limiting
+            log.error("Data route HTTP 429")
+            return []
+        if response.status_code != 200:
+            log.warning("Data route HTTP %s, using the search page", response.status_code)
+            return None
+
+        try:
+            data = response.json()
+        except ValueError:
+            log.warning("Data route did not return JSON, using the search page")
+            return None
+        if 'searchResults' not in data.get('pageProps', {}):
+            # e.g. a redirect (__N_REDIRECT) in place of the page props
+            log.warning("Data route returned no search results, using the search page")
+            return None
+
+        self.fetches['data'] += 1
+        return self._extract_products(data)
+
+    def _extract_products(self, data):
+        """Extract products from a data route response ({'pageProps': ...})"""
+        return self._extract_from_nextjs_data({'props': {'pageProps': data['pageProps']}})
+
+    def _extract_products_from_html(self, html):
+        """Learn the data route from the page, then extract its products as usual"""
+        self._discover(html)
+        return super()._extract_products_from_html(html)
+
+    def _discover(self, html: str):
+        match = _BUILD_ID.search(html)
+        if not match:
+            return
+        page = _PAGE.search(html)
+        locale = _LOCALE.search(html)
+        route = {
+            'build_id': match.group(1),
+            'page': page.group(1) if page else DEFAULT_PAGE,
+            'locale': locale.group(1) if locale else None,
+        }
+        if route != self.route:
+            log.info("Coles buildId: %s", route['build_id'])
+            self.route = route
+            self._save_route()
+
+    def _read_cache(self) -> Dict:
+        try:
+            with open(self.build_id_cache, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_route(self) -> Optional[Dict]:
+        if not self.build_id_cache:
+            return None
+        route = self._read_cache().get(self.base_url)
+        if route:
+            return {key: route.get(key) for key in ('build_id', 'page', 'locale')}
+        return None
+
+    def _recorded_route(self) -> Optional[Dict]:
+        """Route of the first data-route recording of this site in a replay session"""
+        for url in getattr(self.session, 'recorded_urls', ()):
+            if not url.startswith(self.base_url + '/_next/data/'):
+                continue
+            match = _DATA_PATH.search(url)
+            if match:
+                return {'build_id': match.group(1), 'page': match.group(3), 'locale': match.group(2)}
+        return None
+
+    def _save_route(self):
+        """Remember the route for this site (atomic replace; one entry per base_url)"""
+        if not self.build_id_cache:
+            return
+        cache = self._read_cache()
+        cache[self.base_url] = dict(self.route, discovered_at=utc_timestamp())
+        tmp_path = f"{self.build_id_cache}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, self.build_id_cache)
+
+
+def main():
+    """Search a few pages and show how they were fetched"""
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    search_term = sys.argv[1] if len(sys.argv) > 1 else 'vegetables'
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    client = ColesDataClient()
+    products = []
+    for page in range(1, pages + 1):
+        products.extend(client.search_products(search_term, page=page))
+
+    print()
+    print(f"[OK] {len(products)} products from {pages} pages "
+          f"({client.fetches['data']} via the data route, {client.fetches['html']} via the search page, "
+          f"{client.fetches['refreshes']} buildId refreshes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ import json
 import re
 import time
 
+from prices import discount_percentage, parse_was_now, savings_cents, to_dollars
+
 
 class ColesScraper:
     """Coles scraper using Next.js data extraction"""
@@ -167,13 +169,14 @@ class ColesScraper:
 
             # Calculate discount
             on_sale = False
-            discount_percentage = 0
+            discount = 0
             savings = 0
 
-            if was_price and price and was_price > price:
+            price_cents, was_cents = parse_was_now(price, was_price)
+            if was_cents:
                 on_sale = True
-                savings = round(was_price - price, 2)
-                discount_percentage = round((savings / was_price) * 100, 1)
+                savings = to_dollars(savings_cents(price_cents, was_cents))
+                discount = discount_percentage(price_cents, was_cents)
 
             # Check for promotion
             promotion_type = None
@@ -193,7 +196,7 @@ class ColesScraper:
                 'on_sale': on_sale,
                 'is_special': promotion_type == 'SPECIAL',
                 'savings': savings,
-                'discount_percentage': discount_percentage,
+                'discount_percentage': discount,
                 'unit_price': unit_price,
                 'comparable': comparable,  # e.g., "$1.70/ 1kg"
                 'image_small': image_small,
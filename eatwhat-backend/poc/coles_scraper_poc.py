@@ -5,16 +5,24 @@ Extracts product data from Coles website HTML (Next.js data)
 
 import requests
 import json
+import logging
 import re
 from bs4 import BeautifulSoup
 
+from prices import discount_percentage, parse_was_now, savings_cents, to_dollars
+
+
+log = logging.getLogger(__name__)
+
 
 class ColesScraperPOC:
     """Coles scraper using HTML parsing"""
 
-    def __init__(self):
-        self.base_url = "https://www.coles.com.au"
-        self.session = requests.Session()
+    def __init__(self, session=None, base_url="https://www.coles.com.au"):
+        # base_url can point at a mock server (mock_supermarket_server.py)
+        self.base_url = base_url.rstrip('/')
+        # Injected sessions let the pipeline replay captured responses (replay.py)
+        self.session = session or requests.Session()
 
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -23,42 +31,43 @@ class ColesScraperPOC:
             'Accept-Encoding': 'gzip, deflate, br'
         })
 
-    def search_products(self, search_term):
+    def search_products(self, search_term, page=1):
         """
         Search for products via Coles search page
 
         Args:
             search_term: What to search for
+            page: Results page, starting at 1
 
         Returns:
             list: Product data
         """
         search_url = f"{self.base_url}/search"
         params = {'q': search_term}
+        if page > 1:
+            params['page'] = page
 
-        print(f"Searching for: {search_term}")
-        print(f"URL: {search_url}?q={search_term}")
+        log.info("Searching for: %s", search_term)
+        log.debug("URL: %s?q=%s", search_url, search_term)
 
         try:
             response = self.session.get(search_url, params=params, timeout=30)
-            print(f"Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
 
             if response.status_code == 200:
                 # Save HTML for debugging
                 with open("coles_search_page.html", "w", encoding="utf-8") as f:
                     f.write(response.text)
-                print("[OK] Page saved to: coles_search_page.html")
+                log.debug("Page saved to: coles_search_page.html")
 
                 products = self._extract_products_from_html(response.text)
                 return products
             else:
-                print(f"Error: Status {response.status_code}")
+                log.error("Search HTTP %s", response.status_code)
                 return []
 
         except Exception as e:
-            print(f"Exception: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Search failed: %s", e)
             return []
 
     def browse_category(self, category_path="browse/fruit-vegetables"):
@@ -73,29 +82,27 @@ class ColesScraperPOC:
         """
         url = f"{self.base_url}/{category_path}"
 
-        print(f"Browsing category: {category_path}")
-        print(f"URL: {url}")
+        log.info("Browsing category: %s", category_path)
+        log.debug("URL: %s", url)
 
         try:
             response = self.session.get(url, timeout=30)
-            print(f"Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
 
             if response.status_code == 200:
                 # Save HTML for debugging
                 with open("coles_category_page.html", "w", encoding="utf-8") as f:
                     f.write(response.text)
-                print("[OK] Page saved to: coles_category_page.html")
+                log.debug("Page saved to: coles_category_page.html")
 
                 products = self._extract_products_from_html(response.text)
                 return products
             else:
-                print(f"Error: Status {response.status_code}")
+                log.error("Category HTTP %s", response.status_code)
                 return []
 
         except Exception as e:
-            print(f"Exception: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Category failed: %s", e)
             return []
 
     def _extract_products_from_html(self, html):
@@ -111,7 +118,7 @@ class ColesScraperPOC:
         products = []
 
         # Method 1: Extract from __NEXT_DATA__ script tag
-        print("\nMethod 1: Looking for __NEXT_DATA__...")
+        log.debug("Method 1: Looking for __NEXT_DATA__")
         next_data_pattern = r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>'
         match = re.search(next_data_pattern, html, re.DOTALL)
 
@@ -120,17 +127,17 @@ class ColesScraperPOC:
                 next_data = json.loads(match.group(1))
                 with open("coles_next_data.json", "w", encoding="utf-8") as f:
                     json.dump(next_data, f, indent=2, ensure_ascii=False)
-                print("[OK] __NEXT_DATA__ found and saved to: coles_next_data.json")
+                log.debug("__NEXT_DATA__ found and saved to: coles_next_data.json")
 
                 # Try to extract products from Next.js data
                 products = self._extract_from_nextjs_data(next_data)
                 if products:
                     return products
             except Exception as e:
-                print(f"[X] Error parsing __NEXT_DATA__: {e}")
+                log.warning("Error parsing __NEXT_DATA__: %s", e)
 
         # Method 2: Look for window.__INITIAL_STATE__
-        print("\nMethod 2: Looking for __INITIAL_STATE__...")
+        log.debug("Method 2: Looking for __INITIAL_STATE__")
         initial_state_pattern = r'window\.__INITIAL_STATE__\s*=\s*({.*?});'
         match = re.search(initial_state_pattern, html, re.DOTALL)
 
@@ -139,16 +146,16 @@ class ColesScraperPOC:
                 initial_state = json.loads(match.group(1))
                 with open("coles_initial_state.json", "w", encoding="utf-8") as f:
                     json.dump(initial_state, f, indent=2, ensure_ascii=False)
-                print("[OK] __INITIAL_STATE__ found and saved to: coles_initial_state.json")
+                log.debug("__INITIAL_STATE__ found and saved to: coles_initial_state.json")
 
                 products = self._extract_from_initial_state(initial_state)
                 if products:
                     return products
             except Exception as e:
-                print(f"[X] Error parsing __INITIAL_STATE__: {e}")
+                log.warning("Error parsing __INITIAL_STATE__: %s", e)
 
         # Method 3: JSON-LD structured data
-        print("\nMethod 3: Looking for JSON-LD structured data...")
+        log.debug("Method 3: Looking for JSON-LD structured data")
         soup = BeautifulSoup(html, 'html.parser')
         json_ld_scripts = soup.find_all('script', type='application/ld+json')
 
@@ -156,7 +163,7 @@ class ColesScraperPOC:
             try:
                 data = json.loads(script.string)
                 if isinstance(data, dict) and 'itemListElement' in data:
-                    print(f"[OK] Found JSON-LD with {len(data['itemListElement'])} items")
+                    log.debug("Found JSON-LD with %d items", len(data['itemListElement']))
                     products = self._extract_from_jsonld(data)
                     if products:
                         return products
@@ -164,7 +171,7 @@ class ColesScraperPOC:
                 continue
 
         # Method 4: Direct HTML parsing
-        print("\nMethod 4: Trying direct HTML parsing...")
+        log.debug("Method 4: Trying direct HTML parsing")
         products = self._extract_from_html_direct(soup)
 
         return products
@@ -189,7 +196,7 @@ class ColesScraperPOC:
                     for key in possible_keys:
                         if key in page_props:
                             items = page_props[key]
-                            print(f"[OK] Found products in pageProps.{key}")
+                            log.debug("Found products in pageProps.%s", key)
 
                             if isinstance(items, list):
                                 for item in items:
@@ -205,7 +212,7 @@ class ColesScraperPOC:
                                             products.append(product)
 
         except Exception as e:
-            print(f"Error extracting from Next.js data: {e}")
+            log.warning("Error extracting from Next.js data: %s", e)
 
         return products
 
@@ -227,7 +234,7 @@ class ColesScraperPOC:
                     if product:
                         products.append(product)
         except Exception as e:
-            print(f"Error extracting from JSON-LD: {e}")
+            log.warning("Error extracting from JSON-LD: %s", e)
 
         return products
 
@@ -248,7 +255,7 @@ class ColesScraperPOC:
         for selector in selectors:
             tiles = soup.select(selector)
             if tiles:
-                print(f"[OK] Found {len(tiles)} products with selector: {selector}")
+                log.debug("Found %d products with selector: %s", len(tiles), selector)
 
                 for tile in tiles:
                     try:
@@ -279,7 +286,7 @@ class ColesScraperPOC:
                             products.append(product)
 
                     except Exception as e:
-                        print(f"Error extracting product: {e}")
+                        log.warning("Failed to extract product: %s", e)
                         continue
 
                 if products:
@@ -316,13 +323,14 @@ class ColesScraperPOC:
 
             # Calculate discount
             on_sale = False
-            discount_percentage = 0
+            discount = 0
             savings = 0
 
-            if was_price and price and was_price > price:
+            price_cents, was_cents = parse_was_now(price, was_price)
+            if was_cents:
                 on_sale = True
-                savings = was_price - price
-                discount_percentage = round((savings / was_price) * 100, 1)
+                savings = to_dollars(savings_cents(price_cents, was_cents))
+                discount = discount_percentage(price_cents, was_cents)
 
             product = {
                 'product_id': item.get('id') or item.get('productId'),
@@ -334,7 +342,7 @@ class ColesScraperPOC:
                 'was_price': was_price,
                 'on_sale': on_sale,
                 'savings': savings,
-                'discount_percentage': discount_percentage,
+                'discount_percentage': discount,
                 'unit_price': unit_price,
                 'comparable': comparable,
                 'image_url': image_url,
@@ -349,15 +357,14 @@ class ColesScraperPOC:
                 return product
 
         except Exception as e:
-            print(f"Error normalizing product: {e}")
-            import traceback
-            traceback.print_exc()
+            log.warning("Failed to normalize product: %s", e, exc_info=True)
 
         return None
 
 
 def main():
     """Main function"""
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
     print("=" * 70)
     print("Coles Product Scraper - Proof of Concept")
     print("=" * 70)
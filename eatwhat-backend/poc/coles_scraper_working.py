@@ -8,6 +8,8 @@ import json
 import re
 from bs4 import BeautifulSoup
 
+from prices import discount_percentage, parse_was_now, savings_cents, to_dollars
+
 
 class ColesScraperPOC:
     """Coles scraper using HTML parsing"""
@@ -316,13 +318,14 @@ class ColesScraperPOC:
 
             # Calculate discount
             on_sale = False
-            discount_percentage = 0
+            discount = 0
             savings = 0
 
-            if was_price and price and was_price > price:
+            price_cents, was_cents = parse_was_now(price, was_price)
+            if was_cents:
                 on_sale = True
-                savings = was_price - price
-                discount_percentage = round((savings / was_price) * 100, 1)
+                savings = to_dollars(savings_cents(price_cents, was_cents))
+                discount = discount_percentage(price_cents, was_cents)
 
             product = {
                 'product_id': item.get('id') or item.get('productId'),
@@ -334,7 +337,7 @@ class ColesScraperPOC:
                 'was_price': was_price,
                 'on_sale': on_sale,
                 'savings': savings,
-                'discount_percentage': discount_percentage,
+                'discount_percentage': discount,
                 'unit_price': unit_price,
                 'comparable': comparable,
                 'image_url': image_url,
@@ -0,0 +1,184 @@
+"""
+Compressed Snapshot I/O
+Opens product snapshots and raw captures with compression chosen by file
+extension, streaming in both directions
+
+    .zst  Zstandard (needs: pip install zstandard) - best ratio and speed
+    .gz   gzip (standard library)
+    other plain file
+
+Usage:
+    python compression.py compress coles_search_page.html [--format zst|gz]
+    python compression.py decompress coles_search_page.html.zst
+"""
+
+import gzip
+import io
+import os
+import shutil
+import sys
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+EXTENSIONS = ('.zst', '.gz')
+
+
+def compression_for(path: str):
+    """Compression implied by a file name: 'zst', 'gz' or None"""
+    lowered = str(path).lower()
+    if lowered.endswith('.zst'):
+        return 'zst'
+    if lowered.endswith('.gz'):
+        return 'gz'
+    return None
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ImportError("Reading or writing .zst files needs zstandard: pip install zstandard")
+
+
+def open_output(path: str, mode: str = 'wt', encoding: str = 'utf-8'):
+    """
+    Open a file for streaming writes, compressing by extension
+
+    Args:
+        path: Output path; '.zst' or '.gz' enables compression
+        mode: 'wt'/'at' for text, 'wb'/'ab' for bytes
+
+    Returns:
+        File object; close it (or use it as a context manager) to finish the stream
+    """
+    text = 'b' not in mode
+    raw_mode = mode.replace('t', '').replace('b', '') + 'b'
+    kind = compression_for(path)
+
+    if kind == 'zst':
+        _require_zstandard()
+        stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, raw_mode))
+    elif kind == 'gz':
+        stream = gzip.open(path, raw_mode, compresslevel=GZIP_LEVEL)
+    else:
+        return open(path, mode, encoding=encoding if text else None)
+
+    if text:
+        return io.TextIOWrapper(stream, encoding=encoding, write_through=True)
+    return stream
+
+
+def open_input(path: str, mode: str = 'rt', encoding: str = 'utf-8'):
+    """
+    Open a file for streaming reads, decompressing by extension
+
+    Data is decompressed incrementally as it is read, so files larger than
+    memory can be processed line by line.
+
+    Args:
+        path: Input path; '.zst' or '.gz' enables decompression
+        mode: 'rt' for text, 'rb' for bytes
+    """
+    text = 'b' not in mode
+    kind = compression_for(path)
+
+    if kind == 'zst':
+        _require_zstandard()
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb')))
+    elif kind == 'gz':
+        stream = gzip.open(path, 'rb')
+    else:
+        return open(path, mode, encoding=encoding if text else None)
+
+    if text:
+        return io.TextIOWrapper(stream, encoding=encoding)
+    return stream
+
+
+def read_text(path: str, encoding: str = 'utf-8') -> str:
+    """Read a whole (possibly compressed) text file, e.g. a saved HTML capture"""
+    with open_input(path, 'rt', encoding) as f:
+        return f.read()
+
+
+def write_text(path: str, text: str, encoding: str = 'utf-8'):
+    """Write a whole text file, compressing by extension"""
+    with open_output(path, 'wt', encoding) as f:
+        f.write(text)
+
+
+def resolve_input(path: str) -> str:
+    """
+    Find a file or its compressed sibling
+
+    Lets readers ask for 'coles_search_page.html' and transparently pick up
+    'coles_search_page.html.zst' or '.gz' once captures have been compressed.
+    """
+    if os.path.exists(path):
+        return path
+    for extension in EXTENSIONS:
+        if os.path.exists(path + extension):
+            return path + extension
+    return path
+
+
+def compress_file(path: str, file_format: str = 'zst', remove_original: bool = False) -> str:
+    """
+    Compress an existing file alongside the original
+
+    Returns:
+        Path of the compressed file
+    """
+    target = f"{path}.{file_format}"
+    with open(path, 'rb') as source, open_output(target, 'wb') as out:
+        shutil.copyfileobj(source, out, length=1 << 20)
+    if remove_original:
+        os.remove(path)
+    return target
+
+
+def decompress_file(path: str) -> str:
+    """
+    Decompress a .zst or .gz file next to itself
+
+    Returns:
+        Path of the decompressed file
+    """
+    if not compression_for(path):
+        raise ValueError(f"Not a compressed file: {path}")
+    target = path.rsplit('.', 1)[0]
+    with open_input(path, 'rb') as source, open(target, 'wb') as out:
+        shutil.copyfileobj(source, out, length=1 << 20)
+    return target
+
+
+def main():
+    """Compress or decompress captures from the command line"""
+    if len(sys.argv) < 3 or sys.argv[1] not in ('compress', 'decompress'):
+        print(__doc__)
+        sys.exit(1)
+
+    command, args = sys.argv[1], sys.argv[2:]
+    file_format = 'zst'
+    if '--format' in args:
+        i = args.index('--format')
+        file_format = args[i + 1]
+        args = args[:i] + args[i + 2:]
+    paths = args
+
+    for path in paths:
+        if command == 'compress':
+            target = compress_file(path, file_format)
+            before, after = os.path.getsize(path), os.path.getsize(target)
+            print(f"[OK] {path}: {before:,} -> {after:,} bytes ({before / max(after, 1):.1f}x)")
+        else:
+            print(f"[OK] {decompress_file(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Shared pytest fixtures for the scraper POC modules (run pytest from poc/)"""
+
+import pytest
+
+
+@pytest.fixture
+def make_row():
+    """Factory for supermarket_products rows as produced by normalize.to_rows"""
+
+    def make(product_id, price, scraped_at='2026-01-01T00:00:00+00:00', **fields):
+        row = {
+            'supermarket_brand': 'ALDI',
+            'product_id': product_id,
+            'name': f"Product {product_id}",
+            'category': None,
+            'brand': None,
+            'size': None,
+            'image_url': None,
+            'current_price': price,
+            'original_price': None,
+            'is_on_sale': False,
+            'discount_percentage': None,
+            'sale_end_date': None,
+            'scraped_at': scraped_at,
+        }
+        row.update(fields)
+        return row
+
+    return make
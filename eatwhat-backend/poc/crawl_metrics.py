@@ -0,0 +1,457 @@
+"""
+Crawl Instrumentation
+Per-request and per-stage timings, counters and structured logs for a crawl,
+with an end-of-run summary of where the time went
+
+Request stages are measured in the HTTP transport of each scraper's session:
+
+    dns       name resolution (new connections only)
+    connect   TCP connect (new connections only)
+    tls       TLS handshake (new HTTPS connections only)
+    ttfb      request sent until response headers, less the above
+    download  reading the response body
+    request   all of the above
+
+Responses flagged from_cache (replayed, or from a caching session) count
+as cache hits, the rest as misses.
+
+Pipeline stages are timed around the code that does them: scrape (one
+scraper call, requests included), parse (the scraper's extraction method),
+normalize (scraper output -> supermarket_products rows) and write (NDJSON
+writer and product store).
+
+Every request and stage is one JSON line in the crawl log, as is every
+message the scrapers log (INFO and up; warnings and errors are also echoed):
+
+    {"ts": "...", "event": "request", "store": "coles", "status": 200,
+     "bytes": 536374, "dns_ms": 1.2, "connect_ms": 8.4, "tls_ms": 21.0,
+     "ttfb_ms": 310.5, "download_ms": 42.1, ...}
+    {"ts": "...", "event": "stage", "store": "coles", "stage": "parse",
+     "duration_ms": 12.3, "products": 48}
+    {"ts": "...", "event": "log", "store": "coles", "level": "info",
+     "logger": "coles_data_client", "message": "Searching for: vegetables"}
+
+Usage:
+    metrics = CrawlMetrics("crawl_log.ndjson")
+    scraper = ColesScraperPOC()
+    instrument_scraper(scraper, metrics)
+    with metrics.stage('scrape', store='coles'):
+        products = scraper.search_products('vegetables')
+    print(metrics.format_summary())
+"""
+
+import bisect
+import json
+import logging
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from normalize import utc_timestamp
+
+
+REQUEST_STAGES = ('dns', 'connect', 'tls', 'ttfb', 'download')
+
+# Upper bounds (seconds) of the latency histogram buckets, as exported by
+# metrics_exporter.py
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Statuses that mean the store is refusing us rather than failing
+BLOCK_STATUSES = frozenset({403, 429})
+
+# Scraper methods timed as the parse stage
+PARSE_METHODS = ('_extract_products', '_extract_products_from_html')
+
+# Connection timings of the request in flight on this thread
+_local = threading.local()
+
+
+class _TimedConnectionMixin:
+    """Splits urllib3's connection setup into DNS, TCP connect and TLS"""
+
+    def _new_conn(self):
+        timings = getattr(_local, 'timings', None)
+        if timings is None:
+            return super()._new_conn()
+
+        # Resolve here so the lookup is timed on its own; urllib3 then
+        # connects to the address, while TLS still uses the host name
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            address = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+        except (OSError, UnicodeError):
+            address = None  # urllib3 raises its usual error below
+        resolved = time.perf_counter()
+        timings['dns'] = resolved - start
+        if address:
+            self._dns_host = address
+        try:
+            sock = super()._new_conn()
+        finally:
+            self._dns_host = host
+        timings['connect'] = time.perf_counter() - resolved
+        return sock
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        timings = getattr(_local, 'timings', None)
+        if timings is not None and 'connect' in timings and isinstance(self, HTTPSConnection):
+            setup = time.perf_counter() - start
+            timings['tls'] = max(0.0, setup - timings['dns'] - timings['connect'])
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class InstrumentedAdapter(BaseAdapter):
+    """
+    Transport adapter that times and counts every request of its inner adapter
+
+    Works with any adapter (including replay.ReplayAdapter); connection
+    setup is only split out for the standard HTTPAdapter.
+    """
+
+    def __init__(self, inner: BaseAdapter, metrics: 'CrawlMetrics'):
+        super().__init__()
+        self.inner = inner
+        self.metrics = metrics
+        if isinstance(inner, HTTPAdapter):
+            inner.poolmanager.pool_classes_by_scheme = {
+                'http': _TimedHTTPConnectionPool,
+                'https': _TimedHTTPSConnectionPool,
+            }
+            inner.poolmanager.clear()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        _local.timings = timings = {}
+        start = time.perf_counter()
+        try:
+            # Headers first, so the body read can be timed as the download
+            response = self.inner.send(request, stream=True, timeout=timeout, verify=verify,
+                                       cert=cert, proxies=proxies)
+            headers = time.perf_counter()
+            size = None if stream else len(response.content)
+        except Exception as e:
+            self.metrics.request_failed(request, e, time.perf_counter() - start)
+            raise
+        finally:
+            _local.timings = None
+        done = time.perf_counter()
+
+        setup = sum(timings.get(stage, 0.0) for stage in ('dns', 'connect', 'tls'))
+        timings['ttfb'] = max(0.0, headers - start - setup)
+        if size is not None:
+            timings['download'] = done - headers
+        retries = getattr(getattr(response.raw, 'retries', None), 'history', None) or ()
+        self.metrics.request_done(request, response, timings, size, len(retries))
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class _EventLogHandler(logging.Handler):
+    """Log records as 'log' events of a crawl; warnings and up also echoed"""
+
+    def __init__(self, metrics: 'CrawlMetrics'):
+        super().__init__(logging.INFO)
+        self.metrics = metrics
+
+    def emit(self, record):
+        store = self.metrics.current_store
+        message = record.getMessage()
+        fields = {'error': record.exc_info[0].__name__} if record.exc_info else {}
+        self.metrics.event('log', store=store, level=record.levelname.lower(), logger=record.name,
+                           message=message, **fields)
+        if self.metrics.echo and record.levelno >= logging.WARNING:
+            print(f"[{record.levelname}] {store or '-'}: {message}")
+
+
+def instrument_session(session, metrics: 'CrawlMetrics'):
+    """Wrap every transport adapter of a requests session (once)"""
+    for prefix, adapter in list(session.adapters.items()):
+        if not isinstance(adapter, InstrumentedAdapter):
+            session.mount(prefix, InstrumentedAdapter(adapter, metrics))
+    return session
+
+
+def instrument_scraper(scraper, metrics: 'CrawlMetrics'):
+    """
+    Instrument a scraper instance: its session's requests, its extraction
+    method as the parse stage, and the loggers of its modules
+    """
+    instrument_session(scraper.session, metrics)
+    for cls in type(scraper).__mro__[:-1]:
+        metrics.capture_logs(cls.__module__)
+    for name in PARSE_METHODS:
+        method = getattr(scraper, name, None)
+        if method is None:
+            continue
+
+        def timed(*args, _method=method, **kwargs):
+            with metrics.stage('parse') as stage:
+                products = _method(*args, **kwargs)
+                stage['products'] = len(products)
+            return products
+
+        setattr(scraper, name, timed)
+    return scraper
+
+
+class CrawlMetrics:
+    """Timings, counters and the structured log of one crawl"""
+
+    def __init__(self, log_path: Optional[str] = None, echo: bool = True, memory=None):
+        """
+        Args:
+            log_path: JSON-lines crawl log, one event per request/stage
+            echo: Also print a one-line summary of each stage
+            memory: Optional memory_monitor.MemoryMonitor adding memory
+                    figures to every stage and to the summary
+        """
+        self.log_path = log_path
+        self.echo = echo
+        self.memory = memory
+        self.started = time.perf_counter()
+        # (store, stage) -> [count, total seconds, max seconds, bucket counts]
+        self.stages: Dict[tuple, list] = {}
+        # (store, counter) -> value
+        self.counters: Dict[tuple, int] = {}
+        self.gauges: Dict[tuple, float] = {}
+        self.status_counts: Dict[tuple, int] = {}
+        self.error_counts: Dict[tuple, int] = {}
+        self._store = threading.local()
+        # Exporters read from other threads while the crawl updates
+        self._lock = threading.Lock()
+        self._log = open(log_path, 'w', encoding='utf-8') if log_path else None
+        self._log_handler = _EventLogHandler(self)
+        self._captured: List[logging.Logger] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        for logger in self._captured:
+            logger.removeHandler(self._log_handler)
+        self._captured = []
+        if self._log:
+            self.event('summary', **self.summary())
+            self._log.close()
+            self._log = None
+
+    @property
+    def current_store(self) -> Optional[str]:
+        """Store of the innermost open stage on this thread"""
+        return getattr(self._store, 'name', None)
+
+    def event(self, kind: str, **fields):
+        """Append one structured event to the crawl log"""
+        if self._log:
+            record = {'ts': utc_timestamp(), 'event': kind}
+            record.update(fields)
+            self._log.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def capture_logs(self, logger_name: str):
+        """Record a logger's messages as events of this crawl, until close()"""
+        logger = logging.getLogger(logger_name)
+        if logger in self._captured:
+            return
+        if logger.getEffectiveLevel() > logging.INFO:
+            logger.setLevel(logging.INFO)
+        logger.addHandler(self._log_handler)
+        self._captured.append(logger)
+
+    def count(self, name: str, n: int = 1, store: Optional[str] = None):
+        key = (store or self.current_store, name)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def set_gauge(self, name: str, value: float, store: Optional[str] = None):
+        """Current value of something that goes up and down, e.g. a queue depth"""
+        with self._lock:
+            self.gauges[(store, name)] = value
+
+    def add_time(self, stage: str, seconds: float, store: Optional[str] = None):
+        key = (store or self.current_store, stage)
+        with self._lock:
+            entry = self.stages.get(key)
+            if entry is None:
+                entry = self.stages[key] = [0, 0.0, 0.0, [0] * (len(LATENCY_BUCKETS) + 1)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def snapshot(self) -> Dict:
+        """Consistent copy of stages, counters, gauges, statuses and errors"""
+        with self._lock:
+            return {
+                'stages': {key: [c, t, m, list(b)] for key, (c, t, m, b) in self.stages.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'statuses': dict(self.status_counts),
+                'errors': dict(self.error_counts),
+            }
+
+    @contextmanager
+    def stage(self, name: str, store: Optional[str] = None, **fields):
+        """
+        Time a block as one pipeline stage
+
+        Yields a dict the block can add fields to (e.g. products=...), which
+        go into the log event. A failing block is logged and counted under
+        its exception class, then re-raised.
+        """
+        previous = self.current_store
+        store = store or previous
+        self._store.name = store
+        details = dict(fields)
+        if self.memory:
+            self.memory.stage_started()
+        start = time.perf_counter()
+        try:
+            yield details
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            if self.memory:
+                details.update(self.memory.stage_finished(name, store))
+            self.add_time(name, elapsed, store)
+            self.error(e, name, store)
+            self.event('stage', store=store, stage=name, duration_ms=round(elapsed * 1000, 3),
+                       error=type(e).__name__, message=str(e), **details)
+            raise
+        finally:
+            self._store.name = previous
+        elapsed = time.perf_counter() - start
+        if self.memory:
+            details.update(self.memory.stage_finished(name, store))
+        self.add_time(name, elapsed, store)
+        self.event('stage', store=store, stage=name, duration_ms=round(elapsed * 1000, 3), **details)
+        if self.echo:
+            extra = ''.join(f", {k}={v}" for k, v in details.items())
+            print(f"[{name}] {store or '-'}: {elapsed * 1000:.1f} ms{extra}")
+
+    def error(self, exc: BaseException, stage: str, store: Optional[str] = None):
+        key = (store or self.current_store, type(exc).__name__)
+        with self._lock:
+            self.error_counts[key] = self.error_counts.get(key, 0) + 1
+        if self.echo:
+            print(f"[ERROR] {store or '-'} {stage}: {type(exc).__name__}: {exc}")
+
+    def request_done(self, request, response, timings: Dict[str, float], size: Optional[int], retries: int = 0):
+        store = self.current_store
+        for stage, seconds in timings.items():
+            self.add_time(stage, seconds, store)
+        self.add_time('request', sum(timings.values()), store)
+        key = (store, response.status_code)
+        with self._lock:
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+        self.count('requests', store=store)
+        self.count('cache_hits' if getattr(response, 'from_cache', False) else 'cache_misses', store=store)
+        if size is not None:
+            self.count('bytes', size, store=store)
+        if retries:
+            self.count('retries', retries, store=store)
+        if response.status_code in BLOCK_STATUSES:
+            self.count('blocks', store=store)
+        self.event('request', store=store, method=request.method, url=request.url,
+                   status=response.status_code, bytes=size, retries=retries,
+                   **{f"{stage}_ms": round(seconds * 1000, 3) for stage, seconds in timings.items()})
+
+    def request_failed(self, request, exc: BaseException, elapsed: float):
+        store = self.current_store
+        self.count('requests', store=store)
+        self.error(exc, 'request', store)
+        self.event('request', store=store, method=request.method, url=request.url,
+                   error=type(exc).__name__, message=str(exc), duration_ms=round(elapsed * 1000, 3))
+
+    def summary(self) -> Dict:
+        """
+        End-of-run totals
+
+        Returns:
+            Dict with wall_s, stages (per stage: count, total_s, mean_ms,
+            max_ms), counters, statuses and errors, each also broken down
+            by store
+        """
+        def by_store(mapping):
+            result: Dict[str, Dict] = {}
+            for (store, name), value in sorted(mapping.items(), key=lambda item: (str(item[0][0]), str(item[0][1]))):
+                result.setdefault(store or 'all', {})[str(name)] = value
+            return result
+
+        snapshot = self.snapshot()
+        stages: Dict[str, Dict] = {}
+        for (store, name), (count, total, longest, _) in snapshot['stages'].items():
+            for group in (store or 'all', 'total'):
+                entry = stages.setdefault(name, {}).setdefault(group, [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+        stages = {
+            name: {group: {'count': c, 'total_s': round(t, 6), 'mean_ms': round(t / c * 1000, 3),
+                           'max_ms': round(m * 1000, 3)}
+                   for group, (c, t, m) in groups.items()}
+            for name, groups in stages.items()
+        }
+        summary = {
+            'wall_s': round(time.perf_counter() - self.started, 6),
+            'stages': stages,
+            'counters': by_store(snapshot['counters']),
+            'statuses': by_store(snapshot['statuses']),
+            'errors': by_store(snapshot['errors']),
+        }
+        if self.memory:
+            summary['memory'] = self.memory.summary()
+        return summary
+
+    def format_summary(self) -> str:
+        """Readable version of summary(): stage table, then counters and errors"""
+        summary = self.summary()
+        wall = summary['wall_s']
+        order = list(REQUEST_STAGES) + ['request', 'parse', 'normalize', 'write']
+        names = sorted(summary['stages'], key=lambda n: (order.index(n) if n in order else len(order), n))
+
+        lines = [f"Crawl summary ({wall:.2f}s wall)",
+                 f"  {'stage':<10} {'count':>6} {'total':>10} {'mean':>10} {'max':>10} {'share':>6}"]
+        for name in names:
+            total = summary['stages'][name]['total']
+            share = total['total_s'] / wall * 100 if wall else 0.0
+            lines.append(f"  {name:<10} {total['count']:>6} {total['total_s'] * 1000:>8.1f}ms "
+                         f"{total['mean_ms']:>8.1f}ms {total['max_ms']:>8.1f}ms {share:>5.1f}%")
+        lines.append("  (scrape includes its requests and parse; shares of nested stages overlap)")
+
+        for store, counters in summary['counters'].items():
+            statuses = summary['statuses'].get(store, {})
+            status_text = ', '.join(f"{status}: {n}" for status, n in statuses.items())
+            counter_text = ', '.join(f"{name}={value:,}" for name, value in counters.items())
+            lines.append(f"  {store:<10} {counter_text}" + (f" (HTTP {status_text})" if status_text else ''))
+        for store, errors in summary['errors'].items():
+            lines.append(f"  {store:<10} errors: " + ', '.join(f"{name} x{n}" for name, n in errors.items()))
+        if self.memory:
+            lines.append(self.memory.format_summary())
+        return '\n'.join(lines)
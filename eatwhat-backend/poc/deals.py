@@ -0,0 +1,262 @@
+"""
+Incremental Deal Detection
+Keeps a deals table in the product store up to date from the price history:
+each run only looks at products whose price or sale status changed since the
+previous run, inferred deals whose reference price has aged out of the
+window, and products back on the shelf after their deal was dropped; the
+deal list is kept sorted by depth through an index
+
+    reported  the supermarket marks it on sale with a higher was-price
+              (Woolworths specials, Coles was-prices)
+    inferred  the price is below the product's regular price, i.e. the
+              highest price of the REGULAR_PRICE_WEEKS before the latest
+              crawl (ALDI reports no sales at all)
+
+Usage:
+    python deals.py [products.db]
+"""
+
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from price_history import price_series
+from product_store import ProductStore
+
+
+# Window the regular price is taken from when inferring a price drop
+REGULAR_PRICE_WEEKS = 8
+
+# Smallest drop below the regular price that counts as a deal
+MIN_INFERRED_DROP_PCT = 5.0
+
+# Deals that started within this many days are flagged as new
+NEW_DEAL_DAYS = 7
+
+DEALS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deals (
+    product_ref INTEGER PRIMARY KEY REFERENCES supermarket_products(id),
+    supermarket_brand TEXT NOT NULL,
+    price_cents INTEGER NOT NULL,
+    reference_cents INTEGER NOT NULL,
+    depth_pct REAL NOT NULL,
+    source TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    reference_until TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_deals_depth ON deals(depth_pct DESC);
+CREATE INDEX IF NOT EXISTS idx_deals_store_depth ON deals(supermarket_brand, depth_pct DESC);
+
+CREATE TABLE IF NOT EXISTS deal_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- Products whose deal was dropped while they were off the shelf; their
+-- price may not change when they return, so they are re-checked then
+CREATE TABLE IF NOT EXISTS deals_off_shelf (
+    product_ref INTEGER PRIMARY KEY
+);
+"""
+
+# Products missing from their supermarket's latest crawl
+_OFF_SHELF = (
+    "SELECT p.id FROM supermarket_products p"
+    " JOIN (SELECT supermarket_brand, MAX(scraped_at) AS latest"
+    "       FROM supermarket_products GROUP BY supermarket_brand) l"
+    " ON l.supermarket_brand = p.supermarket_brand"
+    " WHERE p.scraped_at < l.latest"
+)
+
+
+def _shift(timestamp: str, **delta) -> str:
+    """ISO timestamp moved by a timedelta, in the same format"""
+    return (datetime.fromisoformat(timestamp) + timedelta(**delta)).isoformat(timespec='seconds')
+
+
+class DealEngine:
+    """Maintains the deals table of a ProductStore incrementally"""
+
+    def __init__(self, store: ProductStore):
+        self.store = store
+        self.conn = store.conn
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(deals)")]
+        if columns and 'reference_until' not in columns:
+            # Deals are derived from the price history: rebuild them from scratch
+            self.conn.executescript("DROP TABLE deals; DELETE FROM deal_state;")
+        self.conn.executescript(DEALS_SCHEMA)
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """valid_from of the newest price change already processed"""
+        row = self.conn.execute("SELECT value FROM deal_state WHERE key = 'watermark'").fetchone()
+        return row[0] if row else None
+
+    def _evaluate(self, ref: int, supermarket_brand: str, product_id: str, since: str) -> Optional[Dict]:
+        """
+        Deal for one product from its current run and recent history, or None
+
+        Args:
+            since: Start of the regular price window
+        """
+        runs = price_series(self.conn, supermarket_brand, product_id, weeks=None)
+        if not runs or runs[-1]['price_cents'] is None:
+            return None
+        current = runs[-1]
+        price = current['price_cents']
+
+        reference_until = None
+        if current['is_on_sale'] and current['was_price_cents'] and current['was_price_cents'] > price:
+            reference, source = current['was_price_cents'], 'reported'
+        else:
+            # Runs overlapping the window before the current one
+            previous = [run for run in runs[:-1]
+                        if run['price_cents'] is not None and (run['valid_to'] or '') > since]
+            if not previous:
+                return None
+            reference = max(run['price_cents'] for run in previous)
+            if reference <= price:
+                return None
+            source = 'inferred'
+            # The deal lasts until the last run at the reference price leaves the window
+            reference_until = max(run['valid_to'] for run in previous if run['price_cents'] == reference)
+
+        depth = round((reference - price) / reference * 100, 1)
+        if source == 'inferred' and depth < MIN_INFERRED_DROP_PCT:
+            return None
+
+        # A deal that carries on (e.g. price cut further) keeps its start date
+        existing = self.conn.execute("SELECT started_at FROM deals WHERE product_ref = ?", (ref,)).fetchone()
+        return {
+            'product_ref': ref,
+            'supermarket_brand': supermarket_brand,
+            'price_cents': price,
+            'reference_cents': reference,
+            'depth_pct': depth,
+            'source': source,
+            'started_at': existing[0] if existing else current['valid_from'],
+            'reference_until': reference_until,
+        }
+
+    def update(self) -> Dict[str, int]:
+        """
+        Re-evaluate products changed since the last run and expire stale deals
+
+        Besides price changes, inferred deals whose reference price is now
+        older than REGULAR_PRICE_WEEKS before the latest crawl, and products
+        back in the latest crawl after their deal was dropped, are re-checked.
+
+        Returns:
+            Counts: processed, deals (total), expired
+        """
+        latest = self.conn.execute("SELECT MAX(scraped_at) FROM supermarket_products").fetchone()[0]
+        if latest is None:
+            return {'processed': 0, 'deals': 0, 'expired': 0}
+        since = _shift(latest, weeks=-REGULAR_PRICE_WEEKS)
+
+        watermark = self.watermark
+        query = "SELECT DISTINCT h.product_ref, p.supermarket_brand, p.product_id, h.valid_from " \
+                "FROM price_history h JOIN supermarket_products p ON p.id = h.product_ref"
+        params = []
+        if watermark:
+            query += " WHERE h.valid_from > ?"
+            params.append(watermark)
+        changed = {}
+        newest = watermark
+        for ref, supermarket_brand, product_id, valid_from in self.conn.execute(query, params):
+            changed[ref] = (supermarket_brand, product_id)
+            newest = valid_from if newest is None or valid_from > newest else newest
+
+        aged = self.conn.execute(
+            "SELECT d.product_ref, p.supermarket_brand, p.product_id FROM deals d "
+            "JOIN supermarket_products p ON p.id = d.product_ref WHERE d.reference_until <= ?",
+            (since,),
+        ).fetchall()
+        returned = self.conn.execute(
+            "SELECT o.product_ref, p.supermarket_brand, p.product_id FROM deals_off_shelf o "
+            f"JOIN supermarket_products p ON p.id = o.product_ref WHERE o.product_ref NOT IN ({_OFF_SHELF})"
+        ).fetchall()
+        for ref, supermarket_brand, product_id in aged + returned:
+            changed[ref] = (supermarket_brand, product_id)
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM deals_off_shelf WHERE product_ref = ?",
+                                  [(ref,) for ref, _, _ in returned])
+            for ref, (supermarket_brand, product_id) in changed.items():
+                deal = self._evaluate(ref, supermarket_brand, product_id, since)
+                if deal is None:
+                    self.conn.execute("DELETE FROM deals WHERE product_ref = ?", (ref,))
+                else:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO deals VALUES (:product_ref, :supermarket_brand, :price_cents, "
+                        ":reference_cents, :depth_pct, :source, :started_at, :reference_until)",
+                        deal,
+                    )
+
+            # Products missing from their supermarket's latest crawl are off the shelf
+            self.conn.execute(
+                f"INSERT OR IGNORE INTO deals_off_shelf SELECT product_ref FROM deals WHERE product_ref IN ({_OFF_SHELF})"
+            )
+            expired = self.conn.execute(f"DELETE FROM deals WHERE product_ref IN ({_OFF_SHELF})").rowcount
+
+            if newest:
+                self.conn.execute("INSERT OR REPLACE INTO deal_state VALUES ('watermark', ?)", (newest,))
+
+        total = self.conn.execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+        return {'processed': len(changed), 'deals': total, 'expired': expired}
+
+    def deals(self, supermarket_brand: Optional[str] = None, new_only: bool = False,
+              limit: int = 50) -> List[Dict]:
+        """
+        Current deals, deepest first (read straight off the depth index)
+
+        Returns:
+            List of dicts: supermarket_brand, product_id, name, price_cents,
+            reference_cents, depth_pct, source, started_at, is_new
+        """
+        new_since = _shift(self.watermark, days=-NEW_DEAL_DAYS) if self.watermark else ''
+        query = ("SELECT d.supermarket_brand, p.product_id, p.name, d.price_cents, d.reference_cents, "
+                 "d.depth_pct, d.source, d.started_at FROM deals d "
+                 "JOIN supermarket_products p ON p.id = d.product_ref")
+        clauses, params = [], []
+        if supermarket_brand:
+            clauses.append("d.supermarket_brand = ?")
+            params.append(supermarket_brand)
+        if new_only:
+            clauses.append("d.started_at >= ?")
+            params.append(new_since)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY d.depth_pct DESC LIMIT ?"
+        params.append(limit)
+
+        columns = ('supermarket_brand', 'product_id', 'name', 'price_cents', 'reference_cents',
+                   'depth_pct', 'source', 'started_at')
+        results = []
+        for row in self.conn.execute(query, params):
+            deal = dict(zip(columns, row))
+            deal['is_new'] = deal['started_at'] >= new_since
+            results.append(deal)
+        return results
+
+
+def main():
+    """Update the deals of a product store and list the best ones"""
+    from prices import format_cents
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "products.db"
+    with ProductStore(path) as store:
+        engine = DealEngine(store)
+        counts = engine.update()
+        print(f"[OK] Re-evaluated {counts['processed']} changed products: "
+              f"{counts['deals']} deals ({counts['expired']} expired)")
+        for deal in engine.deals(limit=10):
+            new = " NEW" if deal['is_new'] else ""
+            print(f"  -{deal['depth_pct']:>4.1f}%  {deal['supermarket_brand']:<10} {deal['name']}: "
+                  f"{format_cents(deal['price_cents'])} (was {format_cents(deal['reference_cents'])}, "
+                  f"{deal['source']}){new}")
+
+
+if __name__ == "__main__":
+    main()
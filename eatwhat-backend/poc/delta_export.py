@@ -0,0 +1,201 @@
+"""
+Incremental Delta Export
+Diffs a crawl against the previous export by (supermarket_brand, product_id)
+and a content hash, and writes only inserted, changed and disappeared
+products for `npm run import:products`
+
+Output (one operation per line):
+    {"op": "insert", "supermarket_brand": "Coles", "product_id": "123", ...row}
+    {"op": "update", ...row}
+    {"op": "delete", "supermarket_brand": "Coles", "product_id": "456"}
+
+The hashes of the last export are kept in a small state file, so the next
+crawl is diffed without re-reading the previous snapshot. A new export only
+writes them as pending (export_state.pending.json.gz); the state advances
+once the importer has applied the delta, so a failed import is exported
+again by the next crawl instead of being lost.
+
+Usage:
+    python delta_export.py [supermarket_products.json] [supermarket_products.delta.ndjson] [export_state.json.gz]
+    python delta_export.py --confirm [supermarket_products.delta.ndjson] [export_state.json.gz]
+"""
+
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from compression import open_input, open_output, resolve_input
+from normalize import utc_timestamp
+
+
+# scraped_at changes every crawl without the product changing
+_HASH_EXCLUDE = ('scraped_at',)
+
+_KEY_SEPARATOR = '\t'
+
+STATE_FILE = "export_state.json.gz"
+
+
+def content_hash(row: Dict) -> str:
+    """Short stable hash of a row's content, ignoring the crawl timestamp"""
+    content = {k: v for k, v in row.items() if k not in _HASH_EXCLUDE}
+    data = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def row_key(row: Dict) -> str:
+    return f"{row['supermarket_brand']}{_KEY_SEPARATOR}{row['product_id']}"
+
+
+def load_state(path: str) -> Dict[str, str]:
+    """Key -> content hash of the last export, empty if there was none"""
+    if not os.path.exists(path):
+        return {}
+    with open_input(path) as f:
+        return json.load(f)['hashes']
+
+
+def pending_path(state_path: str) -> str:
+    """export_state.json.gz -> export_state.pending.json.gz"""
+    directory, name = os.path.split(state_path)
+    stem, dot, extensions = name.partition('.')
+    return os.path.join(directory, f"{stem}.pending{dot}{extensions}")
+
+
+def save_state(path: str, hashes: Dict[str, str], **fields):
+    """Atomically replace the state file, keeping its compression extension"""
+    base, extension = os.path.splitext(path)
+    tmp_path = f"{base}.tmp{extension}"
+    with open_output(tmp_path) as f:
+        json.dump({'exported_at': utc_timestamp(), **fields, 'hashes': hashes}, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def confirm_import(delta_path: str, state_path: Optional[str] = None) -> bool:
+    """
+    Advance the export state after the delta file has been imported
+
+    The pending state only replaces the state when it was written with this
+    delta file, so confirming an older delta cannot skip a newer export.
+
+    Args:
+        delta_path: Delta file that was imported
+        state_path: State file, by default export_state.json.gz next to the delta
+
+    Returns:
+        True if the state advanced
+    """
+    state_path = state_path or os.path.join(os.path.dirname(delta_path), STATE_FILE)
+    pending = pending_path(state_path)
+    if not os.path.exists(pending):
+        print(f"[WARNING] No pending export state for {os.path.basename(delta_path)}")
+        return False
+    with open_input(pending) as f:
+        delta = json.load(f).get('delta')
+    if delta != os.path.basename(delta_path):
+        print(f"[WARNING] {pending} belongs to {delta}, not {os.path.basename(delta_path)}; state not advanced")
+        return False
+    os.replace(pending, state_path)
+    print(f"[OK] Export state advanced: {state_path}")
+    return True
+
+
+def diff_rows(previous: Dict[str, str], rows: Iterable[Dict]) -> Tuple[List[Dict], Dict[str, str]]:
+    """
+    Compare a crawl with the previous export
+
+    Products of a supermarket that is missing from this crawl entirely (e.g.
+    its scraper failed) are not reported as deleted.
+
+    Args:
+        previous: Key -> content hash of the last export
+        rows: supermarket_products rows of the current crawl
+
+    Returns:
+        (operations, new state). Operations are rows with an added 'op' of
+        'insert' or 'update', or key-only 'delete' records.
+    """
+    operations = []
+    current = {}
+    brands = set()
+    for row in rows:
+        key = row_key(row)
+        digest = content_hash(row)
+        current[key] = digest
+        brands.add(row['supermarket_brand'])
+        old = previous.get(key)
+        if old is None:
+            operations.append({'op': 'insert', **row})
+        elif old != digest:
+            operations.append({'op': 'update', **row})
+
+    new_state = dict(current)
+    for key, digest in previous.items():
+        if key in current:
+            continue
+        supermarket_brand, product_id = key.split(_KEY_SEPARATOR, 1)
+        if supermarket_brand in brands:
+            operations.append({'op': 'delete', 'supermarket_brand': supermarket_brand, 'product_id': product_id})
+        else:
+            new_state[key] = digest
+    return operations, new_state
+
+
+def export_delta(rows: Iterable[Dict], delta_path: str = "supermarket_products.delta.ndjson",
+                 state_path: str = STATE_FILE) -> Dict[str, int]:
+    """
+    Write the delta between this crawl and the last imported export
+
+    An empty delta file is still written so the importer can run unconditionally.
+    The new state is saved as pending and only replaces the state when the
+    import is confirmed (confirm_import, or the importer on success). Until
+    then every export is diffed against the last imported one, and upserts
+    and deletes are idempotent, so a failed import is simply retried.
+
+    Returns:
+        Operation counts, e.g. {'insert': 3, 'update': 41, 'delete': 2, 'unchanged': 900}
+    """
+    rows = list(rows)
+    operations, new_state = diff_rows(load_state(state_path), rows)
+
+    with open_output(delta_path) as f:
+        for operation in operations:
+            f.write(json.dumps(operation, ensure_ascii=False, separators=(',', ':')) + '\n')
+    save_state(pending_path(state_path), new_state, delta=os.path.basename(delta_path))
+
+    counts = {'insert': 0, 'update': 0, 'delete': 0}
+    for operation in operations:
+        counts[operation['op']] += 1
+    counts['unchanged'] = len(rows) - counts['insert'] - counts['update']
+    print(f"[OK] Delta: {counts['insert']} new, {counts['update']} changed, {counts['delete']} gone, "
+          f"{counts['unchanged']} unchanged -> {delta_path}")
+    return counts
+
+
+def main():
+    """Export the delta of a supermarket_products.json row file, or confirm its import"""
+    if sys.argv[1:2] == ['--confirm']:
+        delta_path = sys.argv[2] if len(sys.argv) > 2 else "supermarket_products.delta.ndjson"
+        state_path = sys.argv[3] if len(sys.argv) > 3 else None
+        confirm_import(delta_path, state_path)
+        return
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "supermarket_products.json"
+    delta_path = sys.argv[2] if len(sys.argv) > 2 else "supermarket_products.delta.ndjson"
+    state_path = sys.argv[3] if len(sys.argv) > 3 else STATE_FILE
+
+    source = resolve_input(source)
+    if source.replace('.gz', '').replace('.zst', '').endswith('.ndjson'):
+        from ndjson_writer import read_ndjson
+        rows = list(read_ndjson(source))
+    else:
+        with open_input(source) as f:
+            rows = json.load(f)
+
+    export_delta(rows, delta_path, state_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Memory Profiling and Budget
+Opt-in memory instrumentation for a crawl: tracemalloc peaks per stage, RSS
+after every page, the allocation sites still holding memory at the end of
+the run, and a memory budget that makes the crawler release memory and then
+shed remaining work before the process is OOM-killed
+
+Hooked into CrawlMetrics, so every stage event carries its memory figures:
+
+    {"event": "stage", "store": "aldi", "stage": "parse", ...,
+     "rss_mb": 182.4, "traced_peak_mb": 41.7}
+
+Budget enforcement, checked after each page:
+    above soft_ratio x budget   flush: run the registered flush callbacks,
+                                collect garbage and return freed heap to the OS
+    still above the budget      shed: the crawler skips the work left
+
+Usage:
+    python scrape_all_supermarkets.py --memory-profile --memory-budget-mb 1024
+"""
+
+import ctypes
+import ctypes.util
+import gc
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+
+TOP_ALLOCATIONS = 10
+
+# Fraction of the budget at which memory is flushed before anything is shed
+SOFT_RATIO = 0.85
+
+_MB = 1024 * 1024
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where the current one is not available)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """Highest resident set size of the process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _malloc_trim():
+    """Hand freed heap pages back to the OS (glibc only), so RSS actually drops"""
+    name = ctypes.util.find_library('c')
+    if not name:
+        return
+    try:
+        ctypes.CDLL(name).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class MemoryMonitor:
+    """Per-stage and per-page memory figures, plus the memory budget"""
+
+    def __init__(self, trace: bool = False, budget_mb: Optional[float] = None,
+                 soft_ratio: float = SOFT_RATIO, frames: int = 1):
+        """
+        Args:
+            trace: Track Python allocations with tracemalloc (slows the crawl
+                   noticeably; RSS figures are always collected)
+            budget_mb: RSS budget; None disables enforcement
+            soft_ratio: Fraction of the budget at which memory is flushed
+            frames: Stack frames kept per allocation (1 = allocation line)
+        """
+        self.trace = trace
+        self.budget = budget_mb * _MB if budget_mb else None
+        self.soft_limit = self.budget * soft_ratio if self.budget else None
+        self.frames = frames
+        self.pages: List[Dict] = []
+        # (store, stage) -> highest traced peak / RSS seen
+        self.stage_peaks: Dict[tuple, Dict[str, float]] = {}
+        self.flushes = 0
+        self.shedding = False
+        self._flush_callbacks: List[Callable[[], None]] = []
+        self._stack: List[float] = []
+        self._baseline = None
+        self._started_tracing = False
+
+    def start(self) -> 'MemoryMonitor':
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        if self.trace:
+            self._baseline = tracemalloc.take_snapshot()
+        return self
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def register_flush(self, callback: Callable[[], None]):
+        """Callback that drops caches or buffers when memory runs short"""
+        self._flush_callbacks.append(callback)
+
+    def stage_started(self):
+        """Called by CrawlMetrics when a stage opens"""
+        if self.trace and tracemalloc.is_tracing():
+            # Carry the running peak of the enclosing stage before resetting
+            if self._stack:
+                self._stack[-1] = max(self._stack[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._stack.append(0)
+
+    def stage_finished(self, name: str, store: Optional[str]) -> Dict[str, float]:
+        """
+        Called by CrawlMetrics when a stage closes
+
+        Returns:
+            Fields added to the stage event: rss_mb, and traced_mb /
+            traced_peak_mb when tracing
+        """
+        fields = {'rss_mb': round(rss_bytes() / _MB, 1)}
+        if self.trace and tracemalloc.is_tracing() and self._stack:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self._stack.pop())
+            if self._stack:
+                self._stack[-1] = max(self._stack[-1], peak)
+            tracemalloc.reset_peak()
+            fields['traced_mb'] = round(current / _MB, 1)
+            fields['traced_peak_mb'] = round(peak / _MB, 1)
+
+        entry = self.stage_peaks.setdefault((store, name), {})
+        for key, value in fields.items():
+            if key != 'traced_mb':
+                entry[key] = max(entry.get(key, 0.0), value)
+        return fields
+
+    def page_done(self, store: Optional[str] = None) -> str:
+        """
+        Record RSS after a page and enforce the budget
+
+        Returns:
+            'ok', 'flushed' (memory was released and is back under budget) or
+            'shed' (still over budget; `shedding` is set for the crawler)
+        """
+        rss = rss_bytes()
+        page = {'store': store, 'rss_mb': round(rss / _MB, 1),
+                'peak_rss_mb': round(peak_rss_bytes() / _MB, 1), 'at': round(time.time(), 3)}
+        self.pages.append(page)
+
+        if not self.budget or rss < self.soft_limit:
+            return 'ok'
+        self.flush()
+        rss = rss_bytes()
+        page['flushed_rss_mb'] = round(rss / _MB, 1)
+        if rss < self.budget:
+            return 'flushed'
+        self.shedding = True
+        return 'shed'
+
+    def flush(self):
+        """Run the flush callbacks, collect garbage and trim the heap"""
+        self.flushes += 1
+        for callback in self._flush_callbacks:
+            callback()
+        gc.collect()
+        _malloc_trim()
+
+    def top_allocations(self, limit: int = TOP_ALLOCATIONS) -> List[Dict]:
+        """Allocation sites holding the most memory now that was not held at start()"""
+        if not (self.trace and tracemalloc.is_tracing() and self._baseline):
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        sites = []
+        for stat in snapshot.compare_to(self._baseline, 'lineno')[:limit]:
+            frame = stat.traceback[0]
+            sites.append({
+                'site': f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                'size_kb': round(stat.size / 1024, 1),
+                'size_diff_kb': round(stat.size_diff / 1024, 1),
+                'count': stat.count,
+            })
+        return sites
+
+    def summary(self) -> Dict:
+        """Peak RSS, per-page RSS, per-stage peaks, budget actions and top allocation sites"""
+        return {
+            'peak_rss_mb': round(peak_rss_bytes() / _MB, 1),
+            'budget_mb': round(self.budget / _MB, 1) if self.budget else None,
+            'flushes': self.flushes,
+            'shed': self.shedding,
+            'pages': self.pages,
+            'stages': {f"{store or 'all'}/{name}": peaks for (store, name), peaks in self.stage_peaks.items()},
+            'top_allocations': self.top_allocations(),
+        }
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        budget = f", budget {summary['budget_mb']:.0f} MB" if summary['budget_mb'] else ''
+        lines = [f"Memory: peak RSS {summary['peak_rss_mb']:.1f} MB{budget}, "
+                 f"{summary['flushes']} flushes{', work shed' if summary['shed'] else ''}"]
+        for page in summary['pages']:
+            lines.append(f"  page {page['store'] or '-':<10} RSS {page['rss_mb']:>8.1f} MB  "
+                         f"(peak {page['peak_rss_mb']:.1f} MB)")
+        traced = sorted(((peaks.get('traced_peak_mb', 0.0), stage) for stage, peaks in summary['stages'].items()),
+                        reverse=True)
+        for peak, stage in traced[:5]:
+            if peak:
+                lines.append(f"  stage {stage:<20} traced peak {peak:>8.1f} MB")
+        for site in summary['top_allocations']:
+            lines.append(f"  alloc {site['site']:<36} {site['size_kb']:>10.1f} KB "
+                         f"({site['size_diff_kb']:+.1f} KB, {site['count']} blocks)")
+        return '\n'.join(lines)
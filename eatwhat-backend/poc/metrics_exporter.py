@@ -0,0 +1,201 @@
+"""
+Prometheus Metrics Exporter
+Exposes a running crawl's CrawlMetrics in the Prometheus text format, either
+on a local HTTP endpoint for Prometheus to scrape or as a textfile for the
+node_exporter textfile collector, so throughput and error rates are visible
+while a nightly crawl runs
+
+Metrics (labels in braces):
+    eatwhat_crawl_requests_total{store,status}
+    eatwhat_crawl_request_duration_seconds{store,phase}   histogram: dns, connect, tls, ttfb, download, request
+    eatwhat_crawl_stage_duration_seconds{store,stage}     histogram: scrape, parse, normalize, write, ...
+    eatwhat_crawl_products_parsed_total{store}
+    eatwhat_crawl_dedup_hits_total{store}
+    eatwhat_crawl_cache_requests_total{store,result}      result: hit, miss
+    eatwhat_crawl_cache_hit_ratio{store}
+    eatwhat_crawl_queue_depth{store,queue}
+    eatwhat_crawl_errors_total{store,error}
+    plus rows, skipped, bytes, retries and blocks totals
+
+Usage:
+    python scrape_all_supermarkets.py --metrics-port 9464
+    python scrape_all_supermarkets.py --metrics-textfile /var/lib/node_exporter/eatwhat_crawl.prom
+"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from crawl_metrics import LATENCY_BUCKETS, REQUEST_STAGES, CrawlMetrics
+
+
+PREFIX = "eatwhat_crawl"
+
+DEFAULT_PORT = 9464
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# CrawlMetrics counter -> (exported name, help)
+COUNTERS = {
+    'products': ('products_parsed_total', 'Products returned by the scrapers'),
+    'dedup': ('dedup_hits_total', 'Scraped products dropped as duplicates of another on the same crawl'),
+    'rows': ('rows_total', 'Normalized supermarket_products rows'),
+    'skipped': ('skipped_total', 'Scraped products that failed normalization or validation'),
+    'bytes': ('response_bytes_total', 'Response body bytes downloaded'),
+    'retries': ('retries_total', 'Transport-level retries'),
+    'blocks': ('blocks_total', 'Responses refusing the crawler (403/429)'),
+}
+
+_REQUEST_PHASES = frozenset(REQUEST_STAGES) | {'request'}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in labels.items() if value is not None]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(metrics: CrawlMetrics) -> str:
+    """Current state of a crawl in the Prometheus text exposition format"""
+    snapshot = metrics.snapshot()
+    lines: List[str] = []
+
+    def family(name: str, kind: str, help_text: str):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+    family('uptime_seconds', 'gauge', 'Seconds since the crawl started')
+    lines.append(f"{PREFIX}_uptime_seconds {_number(round(time.perf_counter() - metrics.started, 3))}")
+
+    family('requests_total', 'counter', 'HTTP responses by store and status')
+    for (store, status), n in sorted(snapshot['statuses'].items(), key=str):
+        lines.append(f"{PREFIX}_requests_total{_labels(store=store, status=status)} {n}")
+
+    family('errors_total', 'counter', 'Failures by store and exception class')
+    for (store, error), n in sorted(snapshot['errors'].items(), key=str):
+        lines.append(f"{PREFIX}_errors_total{_labels(store=store, error=error)} {n}")
+
+    counters = snapshot['counters']
+    for key, (name, help_text) in COUNTERS.items():
+        family(name, 'counter', help_text)
+        for (store, counter), n in sorted(counters.items(), key=str):
+            if counter == key:
+                lines.append(f"{PREFIX}_{name}{_labels(store=store)} {n}")
+
+    family('cache_requests_total', 'counter', 'Responses served from a cache or replay (hit) or the network (miss)')
+    ratios = {}
+    for store in sorted({store for store, _ in counters}, key=str):
+        hits = counters.get((store, 'cache_hits'), 0)
+        misses = counters.get((store, 'cache_misses'), 0)
+        if hits or misses:
+            lines.append(f"{PREFIX}_cache_requests_total{_labels(store=store, result='hit')} {hits}")
+            lines.append(f"{PREFIX}_cache_requests_total{_labels(store=store, result='miss')} {misses}")
+            ratios[store] = hits / (hits + misses)
+    family('cache_hit_ratio', 'gauge', 'Share of responses served without going to the network')
+    for store, ratio in ratios.items():
+        lines.append(f"{PREFIX}_cache_hit_ratio{_labels(store=store)} {_number(round(ratio, 6))}")
+
+    family('queue_depth', 'gauge', 'Work waiting in the crawl queues')
+    for (store, queue), value in sorted(snapshot['gauges'].items(), key=str):
+        lines.append(f"{PREFIX}_queue_depth{_labels(store=store, queue=queue)} {_number(value)}")
+
+    for name, label, request_phase, help_text in (
+        ('request_duration_seconds', 'phase', True, 'HTTP request latency by phase'),
+        ('stage_duration_seconds', 'stage', False, 'Pipeline stage duration'),
+    ):
+        family(name, 'histogram', help_text)
+        for (store, stage), (count, total, _, buckets) in sorted(snapshot['stages'].items(), key=str):
+            if (stage in _REQUEST_PHASES) != request_phase:
+                continue
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + (float('inf'),), buckets):
+                cumulative += n
+                labels = _labels(store=store, **{label: stage}, le=_number(float(bound)))
+                lines.append(f"{PREFIX}_{name}_bucket{labels} {cumulative}")
+            lines.append(f"{PREFIX}_{name}_sum{_labels(store=store, **{label: stage})} {_number(round(total, 6))}")
+            lines.append(f"{PREFIX}_{name}_count{_labels(store=store, **{label: stage})} {count}")
+
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(metrics: CrawlMetrics, path: str):
+    """Write the metrics for the node_exporter textfile collector (atomic replace)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render(metrics))
+    os.replace(tmp_path, path)
+
+
+class MetricsServer:
+    """Serves /metrics on a local port from a background thread"""
+
+    def __init__(self, metrics: CrawlMetrics, port: int = DEFAULT_PORT, host: str = '127.0.0.1'):
+        self.metrics = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split('?')[0] not in ('/metrics', '/'):
+                    handler.send_error(404)
+                    return
+                body = render(metrics).encode('utf-8')
+                handler.send_response(200)
+                handler.send_header('Content-Type', CONTENT_TYPE)
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass  # scrapes every few seconds would drown the crawl output
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name='metrics-server', daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> 'MetricsServer':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TextfileWriter:
+    """Rewrites a textfile every `interval` seconds while a crawl runs, and once at the end"""
+
+    def __init__(self, metrics: CrawlMetrics, path: str, interval: float = 15.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-textfile', daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            write_textfile(self.metrics, self.path)
+
+    def start(self) -> 'TextfileWriter':
+        write_textfile(self.metrics, self.path)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        write_textfile(self.metrics, self.path)
@@ -0,0 +1,599 @@
+"""
+Mock Supermarket Server
+Local stand-in for the three supermarket sites, built from the captured
+fixtures, so crawl concurrency, throughput and retry/backoff behaviour can be
+load-tested without sending a single request to the real sites
+
+Routes (paged like the real sites; the search term is ignored):
+    /apis/ui/Search/products?pageSize=36&pageNumber=2   Woolworths search API JSON
+    /search?q=vegetables&page=2                         Coles search page (__NEXT_DATA__ HTML)
+    /_next/data/<buildId>/en/search/products.json?q=..  Coles Next.js data route (404 for a stale buildId)
+    /products/<category>/k/<id>?page=2                  ALDI category page (product tile HTML)
+    /__stats                                            requests served so far by this process (JSON)
+    /__deploy                                           new Coles buildId, as after a Coles deploy
+
+Each store has --products synthetic products: the captured products repeated
+with unique product IDs, so downstream dedup sees them as distinct. Pages
+are rendered once and served from memory.
+
+Faults, drawn per request from a seeded random generator:
+    --latency-ms, --jitter-ms   delay before every response
+    --error-rate                share of 500/503 responses
+    --rate-429                  share of 429 responses with Retry-After
+    --block-rate                share of 403 "Access Denied" block pages
+    --max-rps                   token bucket; requests above it get 429
+
+The load mode drives the real scrapers (instrumented with crawl_metrics.py)
+from a thread pool against the server. Run the server in its own process
+for the highest request rates; without --url one is started in-process.
+
+Usage:
+    python mock_supermarket_server.py serve [--port 8765] [--workers 4] [--products 1000] [--latency-ms 20] [--rate-429 0.05]
+    python scrape_all_supermarkets.py --mock http://127.0.0.1:8765
+    python mock_supermarket_server.py load [--url http://127.0.0.1:8765] [--requests 3000]
+        [--concurrency 32] [--stores woolworths,coles,aldi] [--retries 3] [--backoff 0.1]
+"""
+
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import re
+import signal
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from aldi_scraper_final import AldiScraper
+from coles_data_client import ColesDataClient
+from crawl_metrics import CrawlMetrics, instrument_scraper
+from woolworths_scraper_final import WoolworthsScraper
+
+
+DEFAULT_PORT = 8765
+DEFAULT_PRODUCTS = 1000
+
+WOOLWORTHS_FIXTURE = "response_ui_api__search.json"
+COLES_FIXTURE = "coles_search_page.html"
+ALDI_FIXTURE = "aldi_category_page.html"
+
+# Page sizes of the real sites
+WOOLWORTHS_MAX_PAGE_SIZE = 36
+COLES_PAGE_SIZE = 48
+ALDI_PAGE_SIZE = 30
+
+STORES = ('woolworths', 'coles', 'aldi')
+
+# Synthetic products get IDs from here on, clear of the captured ones
+_SYNTHETIC_ID = 900_000_000
+
+_NEXT_DATA = re.compile(r'(<script id="__NEXT_DATA__" type="application/json">)(.*?)(</script>)', re.DOTALL)
+_COLES_DATA = re.compile(r'/_next/data/([^/]+)(?:/[a-z]{2})?/search/products\.json')
+_ALDI_TILE = re.compile(r'<div id="product-tile-(\d+)"')
+_DIV = re.compile(r'<(/?)div\b')
+
+_REASONS = {200: 'OK', 403: 'Forbidden', 404: 'Not Found', 429: 'Too Many Requests',
+            500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+_BLOCK_PAGE = (
+    '<HTML><HEAD>\n<TITLE>Access Denied</TITLE>\n</HEAD><BODY>\n<H1>Access Denied</H1>\n'
+    'You don\'t have permission to access "{path}" on this server.<P>\n'
+    'Reference&#32;&#35;18&#46;mock&#46;{ref}\n</BODY>\n</HTML>\n'
+)
+
+HTML = 'text/html; charset=utf-8'
+JSON = 'application/json; charset=utf-8'
+
+
+def _read(path: str) -> str:
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _element_end(html: str, start: int) -> int:
+    """End offset of the <div> element opening at `start`"""
+    depth = 0
+    for match in _DIV.finditer(html, start):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            return html.index('>', match.end()) + 1
+    raise ValueError("Unbalanced <div> in fixture")
+
+
+class _Catalogue:
+    """Synthetic products of the three stores, rendered as pages on demand"""
+
+    def __init__(self, fixture_dir: str, products: int):
+        self.products = products
+        self._pages: Dict[tuple, bytes] = {}
+
+        data = json.loads(_read(os.path.join(fixture_dir, WOOLWORTHS_FIXTURE)))
+        items = [item for group in data['Products'] for item in group.get('Products', [])]
+        self._woolworths = data
+        self._woolworths_items = [self._copy(items, n, 'Stockcode') for n in range(products)]
+
+        html = _read(os.path.join(fixture_dir, COLES_FIXTURE))
+        match = _NEXT_DATA.search(html)
+        next_data = json.loads(match.group(2))
+        results = [r for r in next_data['props']['pageProps']['searchResults']['results']
+                   if r.get('_type') == 'PRODUCT']
+        self._coles_html = (html[:match.start(2)], html[match.end(2):])
+        self._coles_data = next_data
+        self.coles_build_id = next_data['buildId']
+        self.deploys = 0
+        self._coles_items = [self._copy(results, n, 'id') for n in range(products)]
+
+        html = _read(os.path.join(fixture_dir, ALDI_FIXTURE))
+        tiles = []
+        for match in _ALDI_TILE.finditer(html):
+            end = _element_end(html, match.start())
+            tiles.append((match.group(1), html[match.start():end]))
+        # Page chrome around the product grid's tiles
+        self._aldi_html = (html[:_ALDI_TILE.search(html).start()], html[end:])
+        self._aldi_tiles = []
+        for n in range(products):
+            product_id, markup = tiles[n % len(tiles)]
+            if n >= len(tiles):
+                # The ID is in the tile's id, tracking attribute and product link
+                markup = markup.replace(product_id, f"{_SYNTHETIC_ID + n:0{len(product_id)}d}")
+            self._aldi_tiles.append(markup)
+
+    @staticmethod
+    def _copy(items: List[Dict], n: int, id_key: str) -> Dict:
+        """n-th synthetic product: the captured ones first, then copies with new IDs"""
+        item = items[n % len(items)]
+        if n < len(items):
+            return item
+        item = dict(item)
+        item[id_key] = _SYNTHETIC_ID + n
+        return item
+
+    def page(self, store: str, page: int, page_size: int) -> bytes:
+        key = (store, page, page_size)
+        body = self._pages.get(key)
+        if body is None:
+            body = self._pages[key] = getattr(self, f"_{store}_page")(page, page_size)
+        return body
+
+    def _slice(self, items: List, page: int, page_size: int) -> List:
+        start = (page - 1) * page_size
+        return items[start:start + page_size]
+
+    def _woolworths_page(self, page: int, page_size: int) -> bytes:
+        data = dict(self._woolworths)
+        # The API returns groups of one product (or a few variants)
+        data['Products'] = [{'Products': [item]} for item in self._slice(self._woolworths_items, page, page_size)]
+        data['SearchResultsCount'] = self.products
+        return json.dumps(data).encode('utf-8')
+
+    def deploy(self) -> str:
+        """Retire the Coles buildId, as a Coles deploy does"""
+        self.deploys += 1
+        self.coles_build_id = f"{self._coles_data['buildId']}-deploy{self.deploys}"
+        # Cached search pages name the old buildId
+        self._pages = {key: body for key, body in self._pages.items() if key[0] not in ('coles', 'coles_data')}
+        return self.coles_build_id
+
+    def _coles_next_data(self, page: int, page_size: int) -> Dict:
+        # Shallow copies down to the replaced search results
+        data = dict(self._coles_data)
+        data['buildId'] = self.coles_build_id
+        data['props'] = dict(data['props'])
+        page_props = data['props']['pageProps'] = dict(data['props']['pageProps'])
+        search = page_props['searchResults'] = dict(page_props['searchResults'])
+        search['results'] = self._slice(self._coles_items, page, page_size)
+        search['noOfResults'] = self.products
+        search['start'] = (page - 1) * page_size
+        search['pageSize'] = page_size
+        return data
+
+    def _coles_page(self, page: int, page_size: int) -> bytes:
+        head, tail = self._coles_html
+        data = self._coles_next_data(page, page_size)
+        return (head + json.dumps(data, ensure_ascii=False, separators=(',', ':')) + tail).encode('utf-8')
+
+    def _coles_data_page(self, page: int, page_size: int) -> bytes:
+        data = self._coles_next_data(page, page_size)
+        return json.dumps({'pageProps': data['props']['pageProps'], '__N_SSP': True},
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def _aldi_page(self, page: int, page_size: int) -> bytes:
+        head, tail = self._aldi_html
+        return (head + ''.join(self._slice(self._aldi_tiles, page, page_size)) + tail).encode('utf-8')
+
+
+class MockSupermarketServer:
+    """Keep-alive HTTP/1.1 server on asyncio, serving the mock sites with injected faults"""
+
+    def __init__(self, port: int = DEFAULT_PORT, host: str = '127.0.0.1', products: int = DEFAULT_PRODUCTS,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 rate_429: float = 0.0, block_rate: float = 0.0, max_rps: Optional[float] = None,
+                 retry_after: int = 1, seed: int = 0, fixture_dir: str = '.', reuse_port: bool = False):
+        """
+        Args:
+            port: Port to listen on (0 picks a free one)
+            products: Synthetic products per store
+            latency_ms: Delay before every response
+            jitter_ms: Extra uniformly random delay on top of latency_ms
+            error_rate: Share of requests answered with 500 or 503
+            rate_429: Share of requests answered with 429
+            block_rate: Share of requests answered with a 403 block page
+            max_rps: Requests per second above which 429 is returned
+            retry_after: Retry-After seconds sent with every 429 and 503
+            seed: Seed of the fault generator, for repeatable runs
+            fixture_dir: Directory holding the captured fixtures
+            reuse_port: Share the port with other server processes
+                        (SO_REUSEPORT), which the kernel balances between
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.block_rate = block_rate
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.reuse_port = reuse_port
+        self.catalogue = _Catalogue(fixture_dir, products)
+        self.statuses: Dict[int, int] = {}
+        self.routes: Dict[str, int] = {}
+        self.bytes = 0
+        self._random = random.Random(seed)
+        self._tokens = max_rps or 0.0
+        self._refilled = time.perf_counter()
+        self._started = None
+        self._loop = None
+        self._stop = None
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    # Request handling
+
+    def _route(self, target: str) -> Tuple[str, int, str, bytes, Dict[str, str]]:
+        """(route, status, content type, body, extra headers) for a request target"""
+        parts = urlsplit(target)
+        query = parse_qs(parts.query)
+
+        def number(name: str, default: int) -> int:
+            try:
+                return max(1, int(query.get(name, [default])[0]))
+            except ValueError:
+                return default
+
+        if parts.path.rstrip('/') == '/apis/ui/Search/products':
+            size = min(number('pageSize', WOOLWORTHS_MAX_PAGE_SIZE), WOOLWORTHS_MAX_PAGE_SIZE)
+            return 'woolworths', 200, JSON, self.catalogue.page('woolworths', number('pageNumber', 1), size), {}
+        if parts.path.rstrip('/') in ('/search', '/search/products'):
+            return 'coles', 200, HTML, self.catalogue.page('coles', number('page', 1), COLES_PAGE_SIZE), {}
+        data_route = _COLES_DATA.fullmatch(parts.path)
+        if data_route:
+            if data_route.group(1) != self.catalogue.coles_build_id:
+                return 'coles-data', 404, HTML, b'<html><body><h1>404 Not Found</h1></body></html>', {}
+            body = self.catalogue.page('coles_data', number('page', 1), COLES_PAGE_SIZE)
+            return 'coles-data', 200, JSON, body, {}
+        if parts.path.startswith('/products/'):
+            return 'aldi', 200, HTML, self.catalogue.page('aldi', number('page', 1), ALDI_PAGE_SIZE), {}
+        if parts.path == '/__stats':
+            return 'control', 200, JSON, json.dumps(self.stats()).encode('utf-8'), {}
+        if parts.path == '/__deploy':
+            return 'control', 200, JSON, json.dumps({'build_id': self.catalogue.deploy()}).encode('utf-8'), {}
+        return 'unknown', 404, HTML, b'<html><body><h1>404 Not Found</h1></body></html>', {}
+
+    def _fault(self, path: str) -> Optional[Tuple[int, str, bytes, Dict[str, str]]]:
+        """Injected failure for this request, if any"""
+        if self.max_rps:
+            now = time.perf_counter()
+            self._tokens = min(self.max_rps, self._tokens + (now - self._refilled) * self.max_rps)
+            self._refilled = now
+            if self._tokens < 1:
+                return 429, HTML, b'Too Many Requests', {'Retry-After': str(self.retry_after)}
+            self._tokens -= 1
+
+        draw = self._random.random()
+        if draw < self.block_rate:
+            page = _BLOCK_PAGE.format(path=path, ref=f"{self._random.getrandbits(32):08x}")
+            return 403, HTML, page.encode('utf-8'), {'Server': 'AkamaiGHost'}
+        draw -= self.block_rate
+        if draw < self.rate_429:
+            return 429, HTML, b'Too Many Requests', {'Retry-After': str(self.retry_after)}
+        draw -= self.rate_429
+        if draw < self.error_rate:
+            if self._random.random() < 0.5:
+                return 500, HTML, b'Internal Server Error', {}
+            return 503, HTML, b'Service Unavailable', {'Retry-After': str(self.retry_after)}
+        return None
+
+    async def _respond(self, target: str) -> Tuple[int, str, bytes, Dict[str, str]]:
+        route, status, content_type, body, headers = self._route(target)
+        if route != 'control':
+            if self.latency or self.jitter:
+                await asyncio.sleep(self.latency + self._random.random() * self.jitter)
+            fault = self._fault(urlsplit(target).path)
+            if fault:
+                status, content_type, body, headers = fault
+        self.routes[route] = self.routes.get(route, 0) + 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes += len(body)
+        return status, content_type, body, headers
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = request_line.split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(':')
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length:
+                    await reader.readexactly(length)
+
+                status, content_type, body, extra = await self._respond(target)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                response_headers = {
+                    'Content-Type': content_type,
+                    'Content-Length': str(len(body)),
+                    'Connection': 'keep-alive' if keep_alive else 'close',
+                    **extra,
+                }
+                head = f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n" + ''.join(
+                    f"{name}: {value}\r\n" for name, value in response_headers.items()) + "\r\n"
+                writer.write(head.encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    def stats(self) -> Dict:
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        requests_served = sum(self.statuses.values())
+        return {
+            'requests': requests_served,
+            'rps': round(requests_served / elapsed, 1) if elapsed else 0.0,
+            'bytes': self.bytes,
+            'statuses': {str(status): n for status, n in sorted(self.statuses.items())},
+            'routes': dict(sorted(self.routes.items())),
+            'uptime_s': round(elapsed, 3),
+        }
+
+    # Lifecycle
+
+    async def _serve(self):
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024,
+                                            reuse_port=self.reuse_port or None)
+        self.port = server.sockets[0].getsockname()[1]
+        self._started = time.perf_counter()
+        self._ready.set()
+        async with server:
+            await self._stop.wait()
+            # Idle keep-alive connections would otherwise outlive the loop
+            for writer in list(self._connections.values()):
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve())
+        finally:
+            self._loop.close()
+
+    def start(self) -> 'MockSupermarketServer':
+        """Serve from a background thread; returns once the port is open"""
+        self._thread = threading.Thread(target=self._run, name='mock-supermarkets', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._stop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread:
+            self._thread.join()
+
+
+def load_session(retries: int = 0, backoff: float = 0.0, pool_size: int = 1) -> requests.Session:
+    """
+    Session for one load worker, with urllib3 retries on 429/5xx
+
+    Backoff doubles from `backoff` seconds per retry and honours Retry-After.
+    Retries are counted by CrawlMetrics from the response's retry history.
+    """
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                  respect_retry_after_header=True, raise_on_status=False)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def run_load(url: str, total: int, concurrency: int, metrics: CrawlMetrics, stores=STORES,
+             pages: int = 10, retries: int = 0, backoff: float = 0.0) -> Dict:
+    """
+    Fetch and parse `total` pages through the real scrapers
+
+    Pages cycle through the stores and their page numbers. The scrapers
+    save their last page into the working directory, so they run inside a
+    scratch directory; their log messages go to the crawl log of `metrics`.
+
+    Args:
+        url: Root URL of the mock server
+        total: Pages to fetch
+        concurrency: Worker threads, each with its own session and scrapers
+        metrics: CrawlMetrics the requests and scrape stages are recorded in
+        stores: Stores to fetch from
+        pages: Distinct pages per store to cycle through
+        retries: Retries per request on 429/5xx
+        backoff: Backoff factor of those retries
+
+    Returns:
+        Dict with pages, products, wall_s, pages_per_s and products_per_s
+    """
+    jobs = list(itertools.islice(itertools.cycle(
+        [(store, page) for page in range(1, pages + 1) for store in stores]), total))
+    local = threading.local()
+
+    def fetch(job):
+        store, page = job
+        if not hasattr(local, 'scrapers'):
+            session = load_session(retries, backoff)
+            local.scrapers = {
+                'woolworths': instrument_scraper(WoolworthsScraper(session, base_url=url), metrics),
+                # The buildId is learned per worker, from its first search page
+                'coles': instrument_scraper(ColesDataClient(session, base_url=url, build_id_cache=None), metrics),
+                'aldi': instrument_scraper(AldiScraper(session, base_url=url), metrics),
+            }
+        scraper = local.scrapers[store]
+        with metrics.stage('scrape', store=store) as stage:
+            if store == 'woolworths':
+                products = scraper.search_products('vegetables', page_size=WOOLWORTHS_MAX_PAGE_SIZE, page=page)
+            elif store == 'coles':
+                products = scraper.search_products('vegetables', page=page)
+            else:
+                products = scraper.scrape_category('/products/fruits-vegetables/fresh-fruits/k/1111111152', page=page)
+            stage['products'] = len(products)
+        metrics.count('products', len(products), store=store)
+        return len(products)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(concurrency) as pool:
+                products = sum(pool.map(fetch, jobs))
+        finally:
+            os.chdir(cwd)
+        wall = time.perf_counter() - start
+
+    return {
+        'pages': len(jobs),
+        'products': products,
+        'wall_s': round(wall, 3),
+        'pages_per_s': round(len(jobs) / wall, 1) if wall else 0.0,
+        'products_per_s': round(products / wall, 1) if wall else 0.0,
+    }
+
+
+def _option(name, default=None):
+    """Value following a command-line flag, e.g. --port 8765"""
+    args = sys.argv[2:]
+    if name in args and args.index(name) + 1 < len(args):
+        return args[args.index(name) + 1]
+    return default
+
+
+def _server_from_options(port: int, worker: int = 0, reuse_port: bool = False) -> MockSupermarketServer:
+    max_rps = _option('--max-rps')
+    return MockSupermarketServer(
+        port=int(_option('--port', port)),
+        products=int(_option('--products', DEFAULT_PRODUCTS)),
+        latency_ms=float(_option('--latency-ms', 0)),
+        jitter_ms=float(_option('--jitter-ms', 0)),
+        error_rate=float(_option('--error-rate', 0)),
+        rate_429=float(_option('--rate-429', 0)),
+        block_rate=float(_option('--block-rate', 0)),
+        max_rps=float(max_rps) if max_rps else None,
+        retry_after=int(_option('--retry-after', 1)),
+        seed=int(_option('--seed', 0)) + worker,
+        fixture_dir=os.path.dirname(os.path.abspath(__file__)),
+        reuse_port=reuse_port,
+    )
+
+
+def _serve_worker(worker: int):
+    """Extra `serve --workers` process; --max-rps then applies per process"""
+    # Ctrl+C is handled by the parent, which terminates its workers on exit
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _server_from_options(DEFAULT_PORT, worker, reuse_port=True).start()._thread.join()
+
+
+def main():
+    """Serve the mock sites, or load-test the scrapers against them"""
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode not in ('serve', 'load'):
+        print(__doc__)
+        sys.exit(2)
+
+    if mode == 'serve':
+        # One event loop per process; more processes for multi-core load tests
+        workers = int(_option('--workers', 1))
+        server = _server_from_options(DEFAULT_PORT, reuse_port=workers > 1).start()
+        for worker in range(1, workers):
+            multiprocessing.Process(target=_serve_worker, args=(worker,), daemon=True).start()
+        print(f"[OK] Mock supermarkets at {server.url} ({workers} process(es), Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.stop()
+            print(f"\n[OK] Served {json.dumps(server.stats())}")
+        return
+
+    url = _option('--url')
+    server = None
+    if not url:
+        server = _server_from_options(0).start()
+        url = server.url
+        print(f"[INFO] In-process mock server at {url}")
+
+    stores = tuple(_option('--stores', ','.join(STORES)).split(','))
+    unknown = set(stores) - set(STORES)
+    if unknown:
+        print(f"[ERROR] Unknown stores: {', '.join(sorted(unknown))}")
+        sys.exit(2)
+
+    metrics = CrawlMetrics(_option('--log'), echo=False)
+    try:
+        result = run_load(url, int(_option('--requests', 3000)), int(_option('--concurrency', 32)), metrics,
+                          stores=stores, pages=int(_option('--pages', 10)),
+                          retries=int(_option('--retries', 0)), backoff=float(_option('--backoff', 0.0)))
+    finally:
+        if server:
+            server.stop()
+        metrics.close()
+
+    print(metrics.format_summary())
+    print(f"\n[OK] {result['pages']:,} pages, {result['products']:,} products in {result['wall_s']:.2f}s: "
+          f"{result['pages_per_s']:,.1f} pages/s, {result['products_per_s']:,.1f} products/s")
+    if server:
+        print(f"[INFO] Server: {json.dumps(server.stats())}")
+
+
+if __name__ == "__main__":
+    main()
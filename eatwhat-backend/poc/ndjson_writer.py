@@ -0,0 +1,140 @@
+"""
+Streaming NDJSON Product Writer
+Appends supermarket_products rows to a newline-delimited JSON file as each
+page is parsed, then writes a small manifest with counts when the crawl ends
+
+Output:
+    all_supermarkets_products.ndjson                one row per line
+    all_supermarkets_products.ndjson.manifest.json  counts, written on close
+
+Name the file *.ndjson.zst or *.ndjson.gz to compress it as it streams.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Iterator, Optional
+
+from compression import open_input, open_output
+from normalize import to_rows, utc_timestamp
+from product import products_from_scraped
+
+
+def manifest_path(path: str) -> str:
+    """Manifest file that accompanies an NDJSON output file"""
+    return path + '.manifest.json'
+
+
+class NDJSONProductWriter:
+    """Incremental writer of supermarket_products rows, one JSON object per line"""
+
+    def __init__(self, path: str = "all_supermarkets_products.ndjson", scraped_at: Optional[str] = None):
+        """
+        Args:
+            path: Output file; truncated when the writer is opened. A .zst or
+                  .gz extension compresses the stream.
+            scraped_at: Crawl timestamp stamped on every row, defaults to now
+        """
+        self.path = path
+        self.scraped_at = scraped_at or utc_timestamp()
+        self.counts: Dict[str, int] = {}
+        self.skipped = 0
+        self.bytes_written = 0
+        self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(complete=exc_type is None)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def open(self):
+        # A stale manifest would mark an unfinished file as complete
+        if os.path.exists(manifest_path(self.path)):
+            os.remove(manifest_path(self.path))
+        self._file = open_output(self.path, 'wt')
+
+    def write_rows(self, rows: Iterable[Dict]) -> int:
+        """
+        Append already-normalized rows and flush them to disk
+
+        Returns:
+            Number of rows written
+        """
+        written = 0
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+            brand = row['supermarket_brand']
+            self.counts[brand] = self.counts.get(brand, 0) + 1
+            written += 1
+        if lines:
+            data = '\n'.join(lines) + '\n'
+            self._file.write(data)
+            self._file.flush()
+            self.bytes_written += len(data.encode('utf-8'))
+        return written
+
+    def write_products(self, items: Iterable[Dict]) -> int:
+        """
+        Normalize one page of scraper output and append it
+
+        Args:
+            items: Product dicts as returned by any scraper
+
+        Returns:
+            Number of rows written
+        """
+        items = list(items)
+        rows = to_rows(products_from_scraped(items), self.scraped_at)
+        self.skipped += len(items) - len(rows)
+        return self.write_rows(rows)
+
+    def close(self, complete: bool = True):
+        """
+        Close the file and, if the crawl completed, write the manifest
+
+        Readers can treat a missing manifest as an interrupted crawl.
+        """
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if not complete:
+            print(f"[WARNING] Crawl interrupted, no manifest written for: {self.path}")
+            return
+
+        manifest = {
+            'file': os.path.basename(self.path),
+            'scraped_at': self.scraped_at,
+            'finished_at': utc_timestamp(),
+            'counts': self.counts,
+            'total_products': self.total,
+            'skipped': self.skipped,
+            'bytes': self.bytes_written,
+            'compressed_bytes': os.path.getsize(self.path),
+        }
+        with open(manifest_path(self.path), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        print(f"[OK] Streamed {self.total} products to: {self.path}")
+
+
+def read_ndjson(path: str) -> Iterator[Dict]:
+    """Yield rows from an NDJSON file (optionally .zst/.gz) one line at a time"""
+    with open_input(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_manifest(path: str) -> Optional[Dict]:
+    """Manifest for an NDJSON file, or None if the crawl did not complete"""
+    try:
+        with open(manifest_path(path), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
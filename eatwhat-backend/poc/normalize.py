@@ -0,0 +1,185 @@
+"""
+Normalization Stage - supermarket_products Rows
+Turns scraper output into rows that match the supermarket_products table
+(eatwhat-backend/src/db/schema.sql), validated once at the source
+
+Usage:
+    python normalize.py [all_supermarkets_products.json] [supermarket_products.json]
+"""
+
+import json
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from compression import open_input, open_output, resolve_input
+from prices import discount_percentage, to_dollars
+from product import Product, Supermarket, products_from_scraped
+
+
+# Column order of supermarket_products, excluding database-managed columns
+# (id, created_at, updated_at)
+SUPERMARKET_PRODUCT_COLUMNS = (
+    'supermarket_brand',
+    'product_id',
+    'name',
+    'category',
+    'brand',
+    'size',
+    'image_url',
+    'current_price',
+    'original_price',
+    'is_on_sale',
+    'discount_percentage',
+    'sale_end_date',
+    'scraped_at',
+)
+
+# VARCHAR limits from schema.sql
+_MAX_LENGTHS = {
+    'supermarket_brand': 50,
+    'product_id': 100,
+    'name': 255,
+    'category': 100,
+    'brand': 100,
+    'size': 50,
+    'image_url': 500,
+}
+
+_REQUIRED = ('supermarket_brand', 'product_id', 'name', 'current_price')
+
+# DECIMAL(10,2) upper bound
+_MAX_PRICE = 99999999.99
+
+
+def utc_timestamp() -> str:
+    """Current time as an ISO-8601 UTC timestamp"""
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def to_row(product: Product, scraped_at: Optional[str] = None) -> Dict:
+    """
+    Convert a Product record to a supermarket_products row
+
+    Args:
+        product: Product record
+        scraped_at: ISO-8601 crawl timestamp, defaults to now
+
+    Returns:
+        dict with exactly SUPERMARKET_PRODUCT_COLUMNS as keys
+    """
+    size = product.size
+    if size is None and product.supermarket is Supermarket.ALDI and product.unit:
+        # ALDI tiles carry no pack size, only the unit the price is quoted in
+        size = product.unit.value
+
+    on_sale = product.on_sale or product.was_price_cents is not None
+    discount = discount_percentage(product.price_cents, product.was_price_cents, decimals=0)
+
+    return {
+        'supermarket_brand': product.supermarket.value,
+        'product_id': product.product_id,
+        'name': product.name,
+        'category': product.category,
+        'brand': product.brand,
+        'size': size,
+        'image_url': product.image_url,
+        'current_price': to_dollars(product.price_cents),
+        'original_price': to_dollars(product.was_price_cents),
+        'is_on_sale': on_sale,
+        'discount_percentage': discount or None,
+        'sale_end_date': None,
+        'scraped_at': scraped_at or utc_timestamp(),
+    }
+
+
+def validate_row(row: Dict) -> None:
+    """
+    Check a row against the supermarket_products schema
+
+    Raises:
+        ValueError: Describing the first problem found
+    """
+    if tuple(row) != SUPERMARKET_PRODUCT_COLUMNS:
+        raise ValueError(f"Unexpected columns: {sorted(set(row) ^ set(SUPERMARKET_PRODUCT_COLUMNS))}")
+
+    for column in _REQUIRED:
+        if row[column] is None or row[column] == '':
+            raise ValueError(f"Missing {column}")
+
+    Supermarket.parse(row['supermarket_brand'])
+
+    for column, limit in _MAX_LENGTHS.items():
+        value = row[column]
+        if value is not None and len(value) > limit:
+            raise ValueError(f"{column} longer than {limit} characters")
+
+    for column in ('current_price', 'original_price'):
+        value = row[column]
+        if value is not None and not 0 <= value <= _MAX_PRICE:
+            raise ValueError(f"{column} out of range: {value}")
+
+    if not isinstance(row['is_on_sale'], bool):
+        raise ValueError("is_on_sale must be a boolean")
+
+    discount = row['discount_percentage']
+    if discount is not None and not (isinstance(discount, int) and 0 < discount <= 100):
+        raise ValueError(f"discount_percentage out of range: {discount}")
+
+
+def to_rows(products: Iterable[Product], scraped_at: Optional[str] = None) -> List[Dict]:
+    """
+    Convert and validate Product records, skipping rows that fail validation
+
+    Rows are de-duplicated on (supermarket_brand, product_id), keeping the
+    last occurrence, since the upsert cannot apply one key twice per batch.
+    """
+    scraped_at = scraped_at or utc_timestamp()
+    rows = {}
+    for product in products:
+        row = to_row(product, scraped_at)
+        try:
+            validate_row(row)
+        except ValueError as e:
+            print(f"[WARNING] Invalid row for {product.supermarket.value} "
+                  f"{product.product_id!r}: {e}")
+            continue
+        rows[product.key] = row
+    return list(rows.values())
+
+
+def rows_from_scraped(all_products: Dict[str, List[Dict]], scraped_at: Optional[str] = None) -> List[Dict]:
+    """Rows for scrape_all_supermarkets output ({'woolworths': [...], ...})"""
+    products = []
+    for items in all_products.values():
+        products.extend(products_from_scraped(items))
+    return to_rows(products, scraped_at)
+
+
+def save_rows(rows: List[Dict], filename: str = "supermarket_products.json"):
+    """Save rows as a JSON array ready for `npm run import:products` (.zst/.gz compress it)"""
+    with open_output(filename) as f:
+        json.dump(rows, f, indent=2, ensure_ascii=False)
+    print(f"[OK] Saved {len(rows)} supermarket_products rows to: {filename}")
+
+
+def main():
+    """Convert a saved all_supermarkets_products.json to supermarket_products rows"""
+    source = sys.argv[1] if len(sys.argv) > 1 else "all_supermarkets_products.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else "supermarket_products.json"
+
+    with open_input(resolve_input(source)) as f:
+        data = json.load(f)
+
+    scraped_at = None
+    if isinstance(data, list):
+        all_products = {'products': data}
+    else:
+        all_products = {name: section['products'] for name, section in data['supermarkets'].items()}
+        scraped_at = data.get('scraped_at')
+
+    save_rows(rows_from_scraped(all_products, scraped_at), target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Parser Benchmarks
+Times the scrapers' parse and normalize hot paths against the captured
+fixtures and against synthetic pages scaled up to thousands of products,
+and writes the results as JSON so runs can be compared over time
+(bench_compare.py gates on regressions between two runs)
+
+Benchmarks (per page unless noted):
+    woolworths.extract_products       JSON decode + WoolworthsScraper._extract_products
+    coles.extract_products_from_html  ColesScraperPOC._extract_products_from_html
+    coles.normalize_product           ColesScraperPOC._normalize_product, per results list
+    coles.extract_products            JSON decode + ColesDataClient._extract_products (data route)
+    aldi.extract_products_from_html   AldiScraper._extract_products_from_html
+    aldi.parse_product_tile           AldiScraper._parse_product_tile, per parsed tiles
+
+Synthetic pages keep the captured page around the product data and repeat
+its products until the page holds the requested number. Each benchmark first
+runs once under tracemalloc for peak memory (which also warms it up), then
+the timed repeats run in rounds that go through every benchmark once, so a
+slow drift of the machine's speed is spread over all of them instead of
+landing on whichever one happened to be running (time per page and per
+product from the median).
+
+Usage:
+    python parser_bench.py [results.json] [sizes, default 1000,5000] [repeats, default 10]
+"""
+
+import copy
+import gc
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from bs4 import BeautifulSoup
+
+from aldi_scraper_final import AldiScraper
+from coles_data_client import ColesDataClient
+from coles_scraper_poc import ColesScraperPOC
+from memory_monitor import peak_rss_bytes
+from normalize import utc_timestamp
+from woolworths_scraper_final import WoolworthsScraper
+
+
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = (1000, 5000)
+DEFAULT_REPEATS = 10
+
+WOOLWORTHS_FIXTURE = "response_ui_api__search.json"
+COLES_FIXTURE = "coles_search_page.html"
+ALDI_FIXTURE = "aldi_category_page.html"
+
+_NEXT_DATA = re.compile(r'(<script id="__NEXT_DATA__" type="application/json">)(.*?)(</script>)', re.DOTALL)
+
+# (page input, number of products it holds)
+Load = Tuple[object, int]
+
+
+def _read(path: str) -> str:
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _scaled(items: List, size: int) -> List:
+    """`size` items, repeating the originals in order"""
+    return [items[i % len(items)] for i in range(size)]
+
+
+def woolworths_pages(fixture: str, sizes) -> Dict[str, Load]:
+    """Search API responses (JSON text): the capture and scaled copies"""
+    text = _read(fixture)
+    data = json.loads(text)
+    items = [item for group in data['Products'] for item in group.get('Products', [])]
+    pages = {'fixture': (text, len(items))}
+    for size in sizes:
+        scaled = dict(data)
+        # The API returns groups of one product (or a few variants)
+        scaled['Products'] = [{'Products': [item]} for item in _scaled(items, size)]
+        pages[f'synthetic-{size}'] = (json.dumps(scaled), size)
+    return pages
+
+
+def coles_results(fixture: str, sizes) -> Tuple[Dict[str, Load], Dict[str, Load]]:
+    """
+    Search pages (HTML with __NEXT_DATA__) and their searchResults lists
+
+    Returns:
+        (pages, results lists), each keyed by load name
+    """
+    html = _read(fixture)
+    match = _NEXT_DATA.search(html)
+    next_data = json.loads(match.group(2))
+    results = next_data['props']['pageProps']['searchResults']['results']
+    products = sum(1 for r in results if r.get('_type') == 'PRODUCT')
+
+    pages = {'fixture': (html, products)}
+    lists = {'fixture': (results, products)}
+    for size in sizes:
+        items = _scaled([r for r in results if r.get('_type') == 'PRODUCT'], size)
+        scaled = copy.deepcopy(next_data)
+        scaled['props']['pageProps']['searchResults']['results'] = items
+        blob = json.dumps(scaled, ensure_ascii=False)
+        pages[f'synthetic-{size}'] = (html[:match.start(2)] + blob + html[match.end(2):], size)
+        lists[f'synthetic-{size}'] = (items, size)
+    return pages, lists
+
+
+def coles_data_pages(pages: Dict[str, Load]) -> Dict[str, Load]:
+    """Next.js data route responses (JSON text) carrying the props of the search pages"""
+    data = {}
+    for load, (html, products) in pages.items():
+        next_data = json.loads(_NEXT_DATA.search(html).group(2))
+        body = {'pageProps': next_data['props']['pageProps'], '__N_SSP': True}
+        data[load] = (json.dumps(body, ensure_ascii=False), products)
+    return data
+
+
+def aldi_pages(fixture: str, sizes) -> Tuple[Dict[str, Load], Dict[str, Load]]:
+    """
+    Category pages (HTML product tiles) and their parsed tiles
+
+    Returns:
+        (pages, tile lists), each keyed by load name
+    """
+    html = _read(fixture)
+    tiles = BeautifulSoup(html, 'html.parser').select('.product-tile')
+    markup = [str(tile) for tile in tiles]
+
+    pages = {'fixture': (html, len(tiles))}
+    tile_lists = {'fixture': (tiles, len(tiles))}
+    end = html.rfind('</body>')
+    for size in sizes:
+        extra = ''.join(_scaled(markup, max(size - len(markup), 0)))
+        page = html[:end] + f'<div class="synthetic-tiles">{extra}</div>' + html[end:]
+        pages[f'synthetic-{size}'] = (page, size)
+        tile_lists[f'synthetic-{size}'] = (_scaled(tiles, size), size)
+    return pages, tile_lists
+
+
+def peak_memory(fn: Callable, arg) -> int:
+    """tracemalloc peak of one fn(arg) run, in bytes"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def measure(tasks: List[Tuple[Callable, object]], repeats: int) -> List[Dict]:
+    """
+    Median/min/max wall time of every fn(arg) in `tasks` over `repeats`
+    interleaved rounds, each running every task once, after one tracemalloc
+    run per task for its peak memory
+
+    Returns:
+        One stats dict per task, in order
+    """
+    peaks = [peak_memory(fn, arg) for fn, arg in tasks]
+    times: List[List[float]] = [[] for _ in tasks]
+    for _ in range(repeats):
+        for (fn, arg), task_times in zip(tasks, times):
+            gc.collect()
+            start = time.perf_counter()
+            fn(arg)
+            task_times.append(time.perf_counter() - start)
+
+    return [{
+        'times_s': [round(t, 6) for t in task_times],
+        'median_s': round(statistics.median(task_times), 6),
+        'min_s': round(min(task_times), 6),
+        'max_s': round(max(task_times), 6),
+        'peak_memory_bytes': peak,
+    } for task_times, peak in zip(times, peaks)]
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeats: int = DEFAULT_REPEATS, fixture_dir: str = '.') -> Dict:
+    """
+    Run every parser benchmark over the fixtures and synthetic loads
+
+    The Coles parser saves its __NEXT_DATA__, so the parsers run inside a
+    scratch directory.
+
+    Returns:
+        Results document: version, created_at, environment, results
+    """
+    fixture_dir = os.path.abspath(fixture_dir)
+    woolworths = WoolworthsScraper()
+    coles = ColesScraperPOC()
+    coles_data = ColesDataClient(build_id_cache=None)
+    aldi = AldiScraper()
+
+    ww_pages = woolworths_pages(os.path.join(fixture_dir, WOOLWORTHS_FIXTURE), sizes)
+    coles_pages, coles_lists = coles_results(os.path.join(fixture_dir, COLES_FIXTURE), sizes)
+    coles_json = coles_data_pages(coles_pages)
+    aldi_html, aldi_tiles = aldi_pages(os.path.join(fixture_dir, ALDI_FIXTURE), sizes)
+
+    def normalize_all(items):
+        return [coles._normalize_product(item) for item in items]
+
+    def parse_tiles(tiles):
+        return [aldi._parse_product_tile(tile) for tile in tiles]
+
+    benchmarks = [
+        ('woolworths.extract_products', lambda text: woolworths._extract_products(json.loads(text)), ww_pages),
+        ('coles.extract_products_from_html', coles._extract_products_from_html, coles_pages),
+        ('coles.normalize_product', normalize_all, coles_lists),
+        ('coles.extract_products', lambda text: coles_data._extract_products(json.loads(text)), coles_json),
+        ('aldi.extract_products_from_html', aldi._extract_products_from_html, aldi_html),
+        ('aldi.parse_product_tile', parse_tiles, aldi_tiles),
+    ]
+
+    runs = [(name, load, fn, arg, products)
+            for name, fn, loads in benchmarks for load, (arg, products) in loads.items()]
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            all_stats = measure([(fn, arg) for _, _, fn, arg, _ in runs], repeats)
+        finally:
+            os.chdir(cwd)
+
+    results = []
+    for (name, load, _, arg, products), stats in zip(runs, all_stats):
+        result = {
+            'benchmark': name,
+            'load': load,
+            'products': products,
+            'input_bytes': len(arg.encode('utf-8')) if isinstance(arg, str) else None,
+            'per_page_s': stats['median_s'],
+            'per_product_us': round(stats['median_s'] / max(products, 1) * 1e6, 3),
+        }
+        result.update(stats)
+        results.append(result)
+        print(f"  {name:<34} {load:<16} {products:>6} products  "
+              f"{result['per_page_s'] * 1000:>9.2f} ms/page  "
+              f"{result['per_product_us']:>8.1f} us/product  "
+              f"{stats['peak_memory_bytes'] / 1e6:>7.1f} MB peak")
+
+    return {
+        'version': RESULTS_VERSION,
+        'created_at': utc_timestamp(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'repeats': repeats,
+            'sizes': list(sizes),
+        },
+        'peak_rss_bytes': peak_rss_bytes(),
+        'results': results,
+    }
+
+
+def main():
+    """Run the suite and save the results"""
+    path = sys.argv[1] if len(sys.argv) > 1 else "parser_bench.json"
+    sizes = tuple(int(s) for s in sys.argv[2].split(',')) if len(sys.argv) > 2 else DEFAULT_SIZES
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_REPEATS
+
+    print(f"Parser benchmarks: fixtures + synthetic {', '.join(map(str, sizes))} products, {repeats} repeats\n")
+    document = run_benchmarks(sizes, repeats)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    print(f"\n[OK] {len(document['results'])} results "
+          f"(peak RSS {document['peak_rss_bytes'] / 1e6:.0f} MB) saved to: {path}")
+
+
+if __name__ == "__main__":
+    main()
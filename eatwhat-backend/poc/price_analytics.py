@@ -0,0 +1,318 @@
+"""
+Price Analytics
+Per-store and per-category price statistics and cross-supermarket price gaps
+for a whole crawl, computed as grouped array operations (one sort per
+grouping, no per-product Python loops)
+
+Output is a printable report plus a machine-readable JSON table.
+
+Usage:
+    python price_analytics.py [supermarket_products.json] [price_report.json] [product_clusters.json]
+"""
+
+import json
+import os
+import sys
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from compression import open_input, open_output, resolve_input
+from prices import format_cents, to_cents
+
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+NO_CATEGORY = '(none)'
+
+# Column arrays for a crawl; prices are float cents with NaN for missing
+CatalogueArrays = namedtuple('CatalogueArrays', [
+    'stores', 'store_names', 'categories', 'category_names',
+    'price', 'was_price', 'on_sale', 'discount', 'keys',
+])
+
+
+def _codes(values: Sequence) -> Tuple[np.ndarray, List]:
+    """Factorize labels into integer codes (first-seen order) and their names"""
+    lookup: Dict = {}
+    codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=len(values))
+    return codes, list(lookup)
+
+
+def _cents_array(values: Sequence) -> np.ndarray:
+    """Row prices (2dp dollars) -> float cents, rounded so 0.1 + 0.2 style error cannot leak"""
+    dollars = np.fromiter((np.nan if v is None else v for v in values), dtype=np.float64, count=len(values))
+    return np.round(dollars * 100)
+
+
+def load_arrays(rows: Sequence[Dict]) -> CatalogueArrays:
+    """Turn supermarket_products rows into column arrays"""
+    stores, store_names = _codes([row['supermarket_brand'] for row in rows])
+    categories, category_names = _codes([row['category'] or NO_CATEGORY for row in rows])
+    return CatalogueArrays(
+        stores=stores,
+        store_names=store_names,
+        categories=categories,
+        category_names=category_names,
+        price=_cents_array([row['current_price'] for row in rows]),
+        was_price=_cents_array([row['original_price'] for row in rows]),
+        on_sale=np.fromiter((bool(row['is_on_sale']) for row in rows), dtype=bool, count=len(rows)),
+        discount=np.fromiter(
+            (np.nan if row['discount_percentage'] is None else row['discount_percentage'] for row in rows),
+            dtype=np.float64, count=len(rows),
+        ),
+        keys=[f"{row['supermarket_brand']}\t{row['product_id']}" for row in rows],
+    )
+
+
+def grouped_stats(group: np.ndarray, n_groups: int, price: np.ndarray, on_sale: np.ndarray,
+                  discount: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Count, mean, percentiles, on-sale share and average discount per group
+
+    Products without a price only count towards `count` and the sale share.
+
+    Args:
+        group: Group code per product, 0 <= code < n_groups
+
+    Returns:
+        Dict of arrays of length n_groups (NaN where a group has no prices)
+    """
+    counts = np.bincount(group, minlength=n_groups)
+    priced = ~np.isnan(price)
+    price_group = group[priced]
+    prices = price[priced]
+    price_counts = np.bincount(price_group, minlength=n_groups)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats = {
+            'count': counts,
+            'mean': np.bincount(price_group, weights=prices, minlength=n_groups) / price_counts,
+            'on_sale_share': np.bincount(group, weights=on_sale, minlength=n_groups) / counts,
+        }
+        discounted = ~np.isnan(discount)
+        stats['avg_discount'] = (
+            np.bincount(group[discounted], weights=discount[discounted], minlength=n_groups)
+            / np.bincount(group[discounted], minlength=n_groups)
+        )
+
+    # Sort once by (group, price); every percentile is then an interpolated
+    # lookup at a computed offset inside each group's run
+    order = np.lexsort((prices, price_group))
+    sorted_prices = prices[order]
+    starts = np.concatenate(([0], np.cumsum(price_counts)[:-1]))
+    has_prices = price_counts > 0
+    for q in PERCENTILES:
+        position = starts + (q / 100) * np.maximum(price_counts - 1, 0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        fraction = position - low
+        values = np.full(n_groups, np.nan)
+        if len(sorted_prices):
+            low_c = np.where(has_prices, low, 0)
+            high_c = np.where(has_prices, high, 0)
+            values = sorted_prices[low_c] + (sorted_prices[high_c] - sorted_prices[low_c]) * fraction
+            values[~has_prices] = np.nan
+        stats['median' if q == 50 else f'p{q}'] = values
+    return stats
+
+
+def matched_gaps(arrays: CatalogueArrays, assignments: Dict[str, int]) -> Dict:
+    """
+    Price gaps between supermarkets for matched products
+
+    Args:
+        arrays: Output of load_arrays
+        assignments: Product key ("<supermarket_brand>\\t<product_id>") -> cluster
+                     ID, as kept by product_matcher.ClusterStore
+
+    Returns:
+        {'clusters': per-cluster list, 'stores': per-store summary}
+    """
+    cluster = np.fromiter((assignments.get(key, -1) for key in arrays.keys), dtype=np.int64,
+                          count=len(arrays.keys))
+    usable = np.flatnonzero((cluster >= 0) & ~np.isnan(arrays.price))
+    empty = {'clusters': [], 'stores': []}
+    if len(usable) == 0:
+        return empty
+
+    order = usable[np.lexsort((arrays.price[usable], cluster[usable]))]
+    sorted_cluster = cluster[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_cluster[1:] != sorted_cluster[:-1])))
+    sizes = np.diff(np.append(starts, len(order)))
+    keep = sizes >= 2
+    if not keep.any():
+        return empty
+
+    cheapest_rows = order[starts]
+    dearest_rows = order[starts + sizes - 1]
+    low = arrays.price[cheapest_rows]
+    high = arrays.price[dearest_rows]
+
+    # Premium of every matched product over its cluster's cheapest price
+    run = np.repeat(np.arange(len(starts)), sizes)
+    member_keep = keep[run]
+    members = order[member_keep]
+    premium = arrays.price[members] - low[run[member_keep]]
+    n_stores = len(arrays.store_names)
+    store_matched = np.bincount(arrays.stores[members], minlength=n_stores)
+    store_cheapest = np.bincount(arrays.stores[cheapest_rows[keep]], minlength=n_stores)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        store_premium = np.bincount(arrays.stores[members], weights=premium, minlength=n_stores) / store_matched
+
+    clusters = []
+    for i in np.flatnonzero(keep):
+        clusters.append({
+            'cluster_id': int(sorted_cluster[starts[i]]),
+            'products': int(sizes[i]),
+            'cheapest_store': arrays.store_names[arrays.stores[cheapest_rows[i]]],
+            'min_price': _dollars_value(low[i]),
+            'max_price': _dollars_value(high[i]),
+            'gap': _dollars_value(high[i] - low[i]),
+            'gap_pct': round(float((high[i] - low[i]) / low[i] * 100), 1) if low[i] else None,
+        })
+    stores = []
+    for code, name in enumerate(arrays.store_names):
+        if store_matched[code]:
+            stores.append({
+                'supermarket_brand': name,
+                'matched': int(store_matched[code]),
+                'cheapest': int(store_cheapest[code]),
+                'avg_premium': _dollars_value(store_premium[code]),
+            })
+    return {'clusters': clusters, 'stores': stores}
+
+
+def _dollars_value(cents) -> Optional[float]:
+    """Float cents (NaN for missing) -> plain float dollars for JSON"""
+    return None if np.isnan(cents) else round(float(cents) / 100, 2)
+
+
+def _table(labels: List[Dict], stats: Dict[str, np.ndarray]) -> List[Dict]:
+    """Stats arrays -> list of JSON-ready dicts, prices in dollars"""
+    table = []
+    for i, label in enumerate(labels):
+        if not stats['count'][i]:
+            continue
+        entry = dict(label)
+        entry['count'] = int(stats['count'][i])
+        for name in ('mean', 'p10', 'p25', 'median', 'p75', 'p90'):
+            entry[name] = _dollars_value(stats[name][i])
+        entry['on_sale_share'] = round(float(stats['on_sale_share'][i]), 3)
+        discount = stats['avg_discount'][i]
+        entry['avg_discount'] = None if np.isnan(discount) else round(float(discount), 1)
+        table.append(entry)
+    return table
+
+
+def analyze(rows: Sequence[Dict], assignments: Optional[Dict[str, int]] = None) -> Dict:
+    """
+    Full price report for one crawl
+
+    Args:
+        rows: supermarket_products rows
+        assignments: Optional cluster assignments for matched-product gaps
+
+    Returns:
+        {'products', 'stores', 'categories', 'matched'}; JSON-serialisable
+    """
+    arrays = load_arrays(rows)
+    n_stores = len(arrays.store_names)
+    n_categories = len(arrays.category_names)
+
+    by_store = grouped_stats(arrays.stores, n_stores, arrays.price, arrays.on_sale, arrays.discount)
+    store_labels = [{'supermarket_brand': name} for name in arrays.store_names]
+
+    group = arrays.stores.astype(np.int64) * n_categories + arrays.categories
+    by_category = grouped_stats(group, n_stores * n_categories, arrays.price, arrays.on_sale, arrays.discount)
+    category_labels = [
+        {'supermarket_brand': store, 'category': category}
+        for store in arrays.store_names for category in arrays.category_names
+    ]
+
+    return {
+        'products': len(rows),
+        'stores': _table(store_labels, by_store),
+        'categories': _table(category_labels, by_category),
+        'matched': matched_gaps(arrays, assignments) if assignments else {'clusters': [], 'stores': []},
+    }
+
+
+def _dollars(value) -> str:
+    return 'N/A' if value is None else format_cents(to_cents(value))
+
+
+def format_report(report: Dict, top_categories: int = 10, top_gaps: int = 5) -> str:
+    """Human-readable summary of an analyze() report"""
+    lines = [f"Products analysed: {report['products']}", "", "By supermarket:"]
+    lines.append(f"  {'Store':<12}{'Count':>7}{'Mean':>9}{'Median':>9}{'P10':>9}{'P90':>9}{'On sale':>9}{'Avg disc':>10}")
+    for entry in report['stores']:
+        discount = '-' if entry['avg_discount'] is None else f"{entry['avg_discount']:.1f}%"
+        lines.append(
+            f"  {entry['supermarket_brand']:<12}{entry['count']:>7}{_dollars(entry['mean']):>9}"
+            f"{_dollars(entry['median']):>9}{_dollars(entry['p10']):>9}{_dollars(entry['p90']):>9}"
+            f"{entry['on_sale_share']:>9.0%}{discount:>10}"
+        )
+
+    largest = sorted(report['categories'], key=lambda e: -e['count'])[:top_categories]
+    if largest:
+        lines += ["", "Largest categories:"]
+        for entry in largest:
+            lines.append(
+                f"  {entry['supermarket_brand']:<12}{entry['category'][:28]:<30}{entry['count']:>6}"
+                f"  median {_dollars(entry['median'])}"
+            )
+
+    matched = report['matched']
+    if matched['stores']:
+        lines += ["", f"Matched products ({len(matched['clusters'])} across supermarkets):"]
+        for entry in matched['stores']:
+            lines.append(
+                f"  {entry['supermarket_brand']:<12} cheapest for {entry['cheapest']} of {entry['matched']}, "
+                f"avg {_dollars(entry['avg_premium'])} above the cheapest"
+            )
+        widest = sorted(matched['clusters'], key=lambda c: -c['gap'])[:top_gaps]
+        for cluster in widest:
+            lines.append(
+                f"  cluster #{cluster['cluster_id']}: {_dollars(cluster['min_price'])} - "
+                f"{_dollars(cluster['max_price'])} (cheapest at {cluster['cheapest_store']})"
+            )
+    return '\n'.join(lines)
+
+
+def save_report(report: Dict, filename: str = "price_report.json"):
+    """Save the machine-readable report (.zst/.gz compress it)"""
+    with open_output(filename) as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[OK] Saved price report to: {filename}")
+
+
+def load_assignments(path: str = "product_clusters.json") -> Optional[Dict[str, int]]:
+    """Cluster assignments saved by product_matcher.ClusterStore, if any"""
+    if not os.path.exists(path):
+        return None
+    with open_input(path) as f:
+        return json.load(f)['assignments']
+
+
+def main():
+    """Report on a supermarket_products.json row file"""
+    import time
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "supermarket_products.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else "price_report.json"
+    clusters = sys.argv[3] if len(sys.argv) > 3 else "product_clusters.json"
+
+    with open_input(resolve_input(source)) as f:
+        rows = json.load(f)
+
+    start = time.perf_counter()
+    report = analyze(rows, load_assignments(clusters))
+    print(f"Analysed {len(rows)} products in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+    print(format_report(report))
+    save_report(report, target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Append-Only Price History
+Run-length encoded price series stored next to the product store: a row is
+appended only when a product's price, was-price or sale status changes, and
+each row holds the run until the next change
+
+    valid_from            price  was   on_sale  change
+    2026-01-10T06:00:00   450    NULL  0        NULL
+    2026-02-03T06:00:00   350    450   1        -100   <- 24 daily crawls later
+
+Usage:
+    python price_history.py [products.db] [supermarket_brand] [product_id]
+"""
+
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+
+# Installed by ProductStore, so every upsert into supermarket_products records
+# history without the writers knowing about it. History rows are never
+# replaced or deleted: a second change stamped with the same scraped_at (the
+# same product on two pages of one crawl) closes that run and opens the next
+# one a microsecond later, so the latest run always matches the product row.
+# scraped_at is second-precision ISO-8601 ('2026-01-10T06:00:00+00:00'). The
+# triggers are re-created, so older databases pick this up.
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_history (
+    product_ref INTEGER NOT NULL REFERENCES supermarket_products(id),
+    valid_from TEXT NOT NULL,
+    price_cents INTEGER,
+    was_price_cents INTEGER,
+    is_on_sale INTEGER NOT NULL,
+    change_cents INTEGER,
+    PRIMARY KEY (product_ref, valid_from)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_price_history_valid_from ON price_history(valid_from);
+
+DROP TRIGGER IF EXISTS price_history_on_insert;
+CREATE TRIGGER price_history_on_insert
+AFTER INSERT ON supermarket_products
+BEGIN
+    INSERT INTO price_history
+    SELECT NEW.id, NEW.scraped_at, NEW.current_price_cents, NEW.original_price_cents, NEW.is_on_sale, NULL
+    WHERE NOT EXISTS (SELECT 1 FROM price_history WHERE product_ref = NEW.id AND valid_from = NEW.scraped_at);
+END;
+
+DROP TRIGGER IF EXISTS price_history_on_change;
+CREATE TRIGGER price_history_on_change
+AFTER UPDATE OF current_price_cents, original_price_cents, is_on_sale ON supermarket_products
+WHEN OLD.current_price_cents IS NOT NEW.current_price_cents
+  OR OLD.original_price_cents IS NOT NEW.original_price_cents
+  OR OLD.is_on_sale IS NOT NEW.is_on_sale
+BEGIN
+    INSERT INTO price_history
+    SELECT NEW.id,
+           CASE WHEN runs = 0 THEN NEW.scraped_at
+                ELSE substr(NEW.scraped_at, 1, 19) || printf('.%06d', runs) || substr(NEW.scraped_at, 20) END,
+           NEW.current_price_cents, NEW.original_price_cents, NEW.is_on_sale,
+           NEW.current_price_cents - OLD.current_price_cents
+    FROM (SELECT COUNT(*) AS runs FROM price_history
+          WHERE product_ref = NEW.id AND substr(valid_from, 1, 19) = substr(NEW.scraped_at, 1, 19));
+END;
+
+CREATE TRIGGER IF NOT EXISTS price_history_no_update
+BEFORE UPDATE ON price_history
+BEGIN
+    SELECT RAISE(ABORT, 'price_history is append-only');
+END;
+
+CREATE TRIGGER IF NOT EXISTS price_history_no_delete
+BEFORE DELETE ON price_history
+BEGIN
+    SELECT RAISE(ABORT, 'price_history is append-only');
+END;
+
+-- Products stored before history existed start their series at their last scrape
+INSERT INTO price_history
+SELECT id, scraped_at, current_price_cents, original_price_cents, is_on_sale, NULL
+FROM supermarket_products
+WHERE id NOT IN (SELECT DISTINCT product_ref FROM price_history);
+"""
+
+_RUN_COLUMNS = "h.valid_from, h.price_cents, h.was_price_cents, h.is_on_sale, h.change_cents"
+
+
+def _runs(cursor) -> List[Dict]:
+    """Turn change rows (oldest first) into runs with an exclusive valid_to"""
+    runs = [dict(zip(('valid_from', 'price_cents', 'was_price_cents', 'is_on_sale', 'change_cents'), row))
+            for row in cursor]
+    for run, following in zip(runs, runs[1:]):
+        run['valid_to'] = following['valid_from']
+    if runs:
+        runs[-1]['valid_to'] = None
+    for run in runs:
+        run['is_on_sale'] = bool(run['is_on_sale'])
+    return runs
+
+
+def weeks_ago(weeks: int) -> str:
+    """ISO-8601 UTC timestamp `weeks` weeks before now"""
+    return (datetime.now(timezone.utc) - timedelta(weeks=weeks)).isoformat(timespec='seconds')
+
+
+def price_series(conn: sqlite3.Connection, supermarket_brand: str, product_id: str,
+                 since: Optional[str] = None, weeks: Optional[int] = 52) -> List[Dict]:
+    """
+    Price runs of one product, oldest first
+
+    The run in force at the start of the window is included, so the series
+    covers the whole window even if the price last changed before it.
+
+    Args:
+        conn: Connection to a product store database (ProductStore.conn)
+        supermarket_brand: e.g. 'Coles'
+        product_id: Supermarket's product ID
+        since: ISO-8601 start of the window; overrides weeks
+        weeks: Window length in weeks (None for the full history)
+
+    Returns:
+        List of dicts: valid_from, valid_to (None for the current run),
+        price_cents, was_price_cents, is_on_sale, change_cents
+    """
+    if since is None and weeks is not None:
+        since = weeks_ago(weeks)
+
+    ref = conn.execute(
+        "SELECT id FROM supermarket_products WHERE supermarket_brand = ? AND product_id = ?",
+        (supermarket_brand, str(product_id)),
+    ).fetchone()
+    if ref is None:
+        return []
+    ref = ref[0]
+
+    if since is None:
+        cursor = conn.execute(
+            f"SELECT {_RUN_COLUMNS} FROM price_history h WHERE h.product_ref = ? ORDER BY h.valid_from",
+            (ref,),
+        )
+    else:
+        cursor = conn.execute(
+            f"SELECT {_RUN_COLUMNS} FROM price_history h WHERE h.product_ref = ? AND h.valid_from >= "
+            "COALESCE((SELECT MAX(valid_from) FROM price_history WHERE product_ref = ? AND valid_from <= ?), ?) "
+            "ORDER BY h.valid_from",
+            (ref, ref, since, since),
+        )
+    return _runs(cursor)
+
+
+def changes_since(conn: sqlite3.Connection, since: str, supermarket_brand: Optional[str] = None) -> List[Dict]:
+    """
+    Every price or sale-status change recorded after a point in time
+
+    First sightings (change_cents NULL with no earlier run) are included, so
+    newly listed products show up too.
+
+    Returns:
+        List of dicts: supermarket_brand, product_id, name plus the run columns,
+        ordered by valid_from
+    """
+    query = (
+        f"SELECT p.supermarket_brand, p.product_id, p.name, {_RUN_COLUMNS} "
+        "FROM price_history h JOIN supermarket_products p ON p.id = h.product_ref "
+        "WHERE h.valid_from > ?"
+    )
+    params = [since]
+    if supermarket_brand:
+        query += " AND p.supermarket_brand = ?"
+        params.append(supermarket_brand)
+    query += " ORDER BY h.valid_from"
+
+    changes = []
+    for row in conn.execute(query, params):
+        change = dict(zip(('supermarket_brand', 'product_id', 'name', 'valid_from', 'price_cents',
+                           'was_price_cents', 'is_on_sale', 'change_cents'), row))
+        change['is_on_sale'] = bool(change['is_on_sale'])
+        changes.append(change)
+    return changes
+
+
+def main():
+    """Print the 52-week price series of one product"""
+    from prices import format_cents
+    from product_store import ProductStore
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "products.db"
+    with ProductStore(path) as store:
+        if len(sys.argv) > 3:
+            supermarket_brand, product_id = sys.argv[2], sys.argv[3]
+        else:
+            row = store.conn.execute(
+                "SELECT supermarket_brand, product_id FROM supermarket_products LIMIT 1").fetchone()
+            if row is None:
+                print(f"[ERROR] No products in {path}")
+                return
+            supermarket_brand, product_id = row
+
+        product = store.get(supermarket_brand, product_id)
+        print(f"{supermarket_brand} {product_id}: {product['name'] if product else '?'}")
+        for run in price_series(store.conn, supermarket_brand, product_id):
+            sale = " (on sale)" if run['is_on_sale'] else ""
+            print(f"  {run['valid_from']} -> {run['valid_to'] or 'now':<25} "
+                  f"{format_cents(run['price_cents'])}{sale}")
+
+
+if __name__ == "__main__":
+    main()
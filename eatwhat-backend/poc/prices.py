@@ -0,0 +1,150 @@
+"""
+Price Parsing - Integer Cents Money Model
+Parses every price format the scrapers see into exact integer cents
+"""
+
+import re
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Iterable, Optional, Tuple
+
+
+# A comparison price such as "($1.49 per 1 each)" or "$1.70/ 1kg"
+PriceText = namedtuple('PriceText', ['cents', 'quantity', 'unit'])
+
+_CENT = Decimal('0.01')
+
+# "$1,299.00", "1.49", "$3", "3.00"
+_MONEY_PATTERN = re.compile(r'\$?\s*(\d[\d,]*(?:\.\d+)?|\.\d+)')
+
+# "($1.49 per 1 each)", "($0.44 per 10 g)", "$1.70/ 1kg", "$0.35 / 1EA", "$5.99 per kg"
+_PRICE_TEXT_PATTERN = re.compile(
+    r'\$\s*([\d,]*\.?\d+)\s*(?:per|/)\s*([\d.]+)?\s*([A-Za-z]+)',
+    re.IGNORECASE
+)
+
+
+def to_cents(value) -> Optional[int]:
+    """
+    Convert a price to exact integer cents
+
+    Args:
+        value: Float or int dollars (1.49), Decimal, or text ("$1.49", "3.00", "$1,299")
+
+    Returns:
+        Price in cents, or None if value is None, empty or not a price
+    """
+    if value is None or isinstance(value, bool):
+        return None
+
+    if isinstance(value, int):
+        return value * 100
+
+    if isinstance(value, float):
+        # repr() gives the shortest string that round-trips, so 0.29 -> "0.29"
+        # rather than 0.28999999999999998
+        amount = Decimal(repr(value))
+    elif isinstance(value, Decimal):
+        amount = value
+    else:
+        match = _MONEY_PATTERN.search(str(value))
+        if not match:
+            return None
+        try:
+            amount = Decimal(match.group(1).replace(',', ''))
+        except InvalidOperation:
+            return None
+
+    if not amount.is_finite():
+        return None
+    return int((amount / _CENT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_dollars(cents: Optional[int]) -> Optional[float]:
+    """Cents to a float dollar amount for JSON output (exact to 2 decimal places)"""
+    if cents is None:
+        return None
+    return cents / 100
+
+
+def to_decimal(cents: Optional[int]) -> Optional[Decimal]:
+    """Cents to an exact Decimal, suitable for DECIMAL(10,2) database columns"""
+    if cents is None:
+        return None
+    return Decimal(cents).scaleb(-2)
+
+
+def format_cents(cents: Optional[int]) -> str:
+    """Format cents for display, e.g. 149 -> "$1.49" """
+    if cents is None:
+        return 'N/A'
+    sign = '-' if cents < 0 else ''
+    dollars, remainder = divmod(abs(cents), 100)
+    return f"{sign}${dollars}.{remainder:02d}"
+
+
+def parse_price_text(text) -> Optional[PriceText]:
+    """
+    Parse a comparison price string
+
+    Handles ALDI "($1.49 per 1 each)", Coles "$1.70/ 1kg" and
+    Woolworths "$0.35 / 1EA" formats.
+
+    Args:
+        text: Price text as scraped
+
+    Returns:
+        PriceText(cents, quantity, unit) with the unit lower-cased, or None
+    """
+    if not text:
+        return None
+    match = _PRICE_TEXT_PATTERN.search(str(text))
+    if not match:
+        return None
+    quantity = float(match.group(2)) if match.group(2) else 1.0
+    return PriceText(to_cents(match.group(1)), quantity, match.group(3).lower())
+
+
+def parse_was_now(now, was) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Parse a was/now price pair
+
+    A was price is only kept when it is higher than the current price; the
+    supermarkets report was == now (Woolworths) or was == 0 (Coles) for
+    products that are not discounted.
+
+    Returns:
+        (now_cents, was_cents)
+    """
+    now_cents = to_cents(now)
+    was_cents = to_cents(was)
+    if was_cents is None or now_cents is None or was_cents <= now_cents:
+        was_cents = None
+    return now_cents, was_cents
+
+
+def savings_cents(now_cents: Optional[int], was_cents: Optional[int]) -> int:
+    """Amount saved in cents, 0 when not discounted"""
+    if now_cents is None or was_cents is None or was_cents <= now_cents:
+        return 0
+    return was_cents - now_cents
+
+
+def discount_percentage(now_cents: Optional[int], was_cents: Optional[int], decimals: int = 1):
+    """
+    Discount as a percentage rounded half-up to the given decimal places
+
+    Computed in integer arithmetic so the same inputs always give the same
+    result, e.g. (300, 400) -> 25.0. With decimals=0 an int is returned.
+    """
+    saved = savings_cents(now_cents, was_cents)
+    if not saved:
+        return 0
+    scale = 10 ** decimals
+    units = (200 * scale * saved + was_cents) // (2 * was_cents)
+    return units / scale if decimals else units
+
+
+def sum_cents(values: Iterable[Optional[int]]) -> int:
+    """Exact total of cent amounts, ignoring missing prices"""
+    return sum(value for value in values if value is not None)
@@ -0,0 +1,294 @@
+"""
+Shared Product Record
+One compact, typed product record for Woolworths, Coles and ALDI scraper output
+"""
+
+import re
+import sys
+from dataclasses import dataclass, field, fields
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional
+
+from prices import format_cents, parse_price_text, parse_was_now, to_cents
+
+
+class Supermarket(str, Enum):
+    """Supermarket brand, valued as stored in supermarket_products.supermarket_brand"""
+
+    WOOLWORTHS = 'Woolworths'
+    COLES = 'Coles'
+    ALDI = 'ALDI'
+
+    @classmethod
+    def parse(cls, value) -> 'Supermarket':
+        """
+        Resolve a supermarket from any spelling the scrapers use
+
+        Args:
+            value: Supermarket instance or name, e.g. 'ALDI', 'coles', 'Woolworths'
+
+        Returns:
+            Supermarket member
+
+        Raises:
+            ValueError: If the value is not a known supermarket
+        """
+        if isinstance(value, cls):
+            return value
+        member = _SUPERMARKET_LOOKUP.get(str(value).strip().lower())
+        if member is None:
+            raise ValueError(f"Unknown supermarket: {value!r}")
+        return member
+
+
+_SUPERMARKET_LOOKUP = {member.value.lower(): member for member in Supermarket}
+
+
+class Unit(str, Enum):
+    """Unit of measure for sale units and unit prices"""
+
+    EACH = 'each'
+    G = 'g'
+    KG = 'kg'
+    ML = 'ml'
+    L = 'l'
+
+    @classmethod
+    def parse(cls, value) -> Optional['Unit']:
+        """
+        Resolve a unit from scraper text such as 'Each', '1EA', 'KG', '100G' or '1 kg'
+
+        Args:
+            value: Unit instance or free text
+
+        Returns:
+            Unit member, or None if the text is empty or not a known unit
+        """
+        if value is None or isinstance(value, cls):
+            return value
+        match = _UNIT_TEXT_PATTERN.match(str(value).strip().lower())
+        if not match:
+            return None
+        return _UNIT_LOOKUP.get(match.group(1))
+
+
+_UNIT_TEXT_PATTERN = re.compile(r'^[\d.]*\s*([a-z]+)$')
+
+_UNIT_LOOKUP = {
+    'each': Unit.EACH, 'ea': Unit.EACH, 'unit': Unit.EACH,
+    'g': Unit.G, 'gm': Unit.G, 'gram': Unit.G, 'grams': Unit.G,
+    'kg': Unit.KG, 'kilo': Unit.KG, 'kilogram': Unit.KG,
+    'ml': Unit.ML, 'millilitre': Unit.ML,
+    'l': Unit.L, 'lt': Unit.L, 'litre': Unit.L, 'liter': Unit.L,
+}
+
+
+def _intern(value) -> Optional[str]:
+    """Intern short, highly repeated strings (brands, categories, measures)"""
+    if value is None or value == '':
+        return None
+    return sys.intern(str(value))
+
+
+def _text(value) -> Optional[str]:
+    """Normalize optional text fields: empty strings become None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+@dataclass(frozen=True, slots=True)
+class Product:
+    """
+    Immutable product record shared by all scrapers
+
+    Attributes:
+        supermarket: Supermarket the product was scraped from
+        product_id: Supermarket-specific id (Woolworths stockcode, Coles id, ALDI URL slug)
+        name: Display name
+        price_cents: Current shelf price in integer cents
+        was_price_cents: Regular price in cents, only set when higher than price_cents
+        on_sale: Whether the supermarket flags the product as discounted
+        unit: Unit the product is sold by
+        unit_price_cents: Comparison price in cents per unit_measure
+        unit_measure: Comparison measure, e.g. '1KG', '1kg', '10 g'
+        raw: Original scraper dict, only kept when requested
+    """
+
+    supermarket: Supermarket
+    product_id: str
+    name: str
+    price_cents: Optional[int]
+    was_price_cents: Optional[int] = None
+    on_sale: bool = False
+    brand: Optional[str] = None
+    size: Optional[str] = None
+    unit: Optional[Unit] = None
+    unit_price_cents: Optional[int] = None
+    unit_measure: Optional[str] = None
+    barcode: Optional[str] = None
+    category: Optional[str] = None
+    image_url: Optional[str] = None
+    url: Optional[str] = None
+    raw: Optional[Dict[str, Any]] = field(default=None, compare=False, repr=False)
+
+    @property
+    def key(self):
+        """Identity of the product across crawls: (supermarket, product_id)"""
+        return (self.supermarket, self.product_id)
+
+    @property
+    def price_display(self) -> str:
+        """Current price formatted for display, e.g. "$1.49" """
+        return format_cents(self.price_cents)
+
+    @classmethod
+    def from_woolworths(cls, item: Dict, keep_raw: bool = False) -> 'Product':
+        """Build a record from WoolworthsScraper output"""
+        price_cents, was_price_cents = parse_was_now(item.get('price'), item.get('was_price'))
+        return cls(
+            supermarket=Supermarket.WOOLWORTHS,
+            product_id=str(item['stockcode']),
+            name=item['name'],
+            price_cents=price_cents,
+            was_price_cents=was_price_cents,
+            on_sale=bool(item.get('on_sale')),
+            brand=_intern(item.get('brand')),
+            size=_intern(item.get('package_size')),
+            unit=Unit.parse(item.get('unit')),
+            unit_price_cents=to_cents(item.get('cup_price')),
+            unit_measure=_intern(item.get('cup_measure')),
+            barcode=_text(item.get('barcode')),
+            category=_intern(item.get('category')),
+            image_url=item.get('image_medium') or item.get('image_url'),
+            url=item.get('url'),
+            raw=dict(item) if keep_raw else None,
+        )
+
+    @classmethod
+    def from_coles(cls, item: Dict, keep_raw: bool = False) -> 'Product':
+        """Build a record from ColesScraper / ColesScraperPOC output"""
+        price_cents, was_price_cents = parse_was_now(item.get('price'), item.get('was_price'))
+        unit_measure = None
+        comparable = item.get('comparable')
+        if comparable and '/' in comparable:
+            # "$1.70/ 1kg" -> "1kg"
+            unit_measure = comparable.split('/', 1)[1].strip()
+
+        return cls(
+            supermarket=Supermarket.COLES,
+            product_id=str(item['product_id']),
+            name=item['name'],
+            price_cents=price_cents,
+            was_price_cents=was_price_cents,
+            on_sale=bool(item.get('on_sale')),
+            brand=_intern(item.get('brand')),
+            size=_intern(item.get('size')),
+            unit=Unit.parse(unit_measure),
+            unit_price_cents=to_cents(item.get('unit_price')),
+            unit_measure=_intern(unit_measure),
+            category=_intern(item.get('category')),
+            image_url=item.get('image_medium') or item.get('image_url'),
+            url=item.get('url'),
+            raw=dict(item) if keep_raw else None,
+        )
+
+    @classmethod
+    def from_aldi(cls, item: Dict, keep_raw: bool = False) -> 'Product':
+        """Build a record from AldiScraper output"""
+        # "($11.96 per 1 kg)" is the comparison price; the shelf price is "$2.99"
+        comparison = parse_price_text(item.get('price_text'))
+        unit_price_cents = comparison.cents if comparison else None
+        unit_measure = f"{comparison.quantity:g} {comparison.unit}" if comparison else None
+        price_cents = to_cents(item.get('shelf_price_text'))
+        if price_cents is None and comparison and (comparison.quantity, comparison.unit) == (1, 'each'):
+            # Without a shelf price, only a per-item comparison price is the item's price
+            price_cents = comparison.cents
+
+        return cls(
+            supermarket=Supermarket.ALDI,
+            product_id=str(item['product_id']),
+            name=item['name'],
+            price_cents=price_cents,
+            on_sale=bool(item.get('on_sale')),
+            brand=_intern(item.get('brand')),
+            size=_intern(item.get('size')),
+            unit=Unit.parse(item.get('unit')),
+            unit_price_cents=unit_price_cents,
+            unit_measure=_intern(unit_measure),
+            category=_intern(item.get('category')),
+            image_url=item.get('image_url'),
+            url=item.get('url'),
+            raw=dict(item) if keep_raw else None,
+        )
+
+    @classmethod
+    def from_scraped(cls, item: Dict, keep_raw: bool = False) -> 'Product':
+        """
+        Build a record from any scraper's output dict
+
+        The supermarket is taken from the dict's 'supermarket' key; it is never
+        guessed from the presence of other keys.
+
+        Raises:
+            ValueError: If the supermarket is missing or unknown
+            KeyError: If the product id or name is missing
+        """
+        return _FACTORIES[Supermarket.parse(item.get('supermarket'))](item, keep_raw)
+
+    def to_dict(self, include_raw: bool = False) -> Dict[str, Any]:
+        """Plain JSON-serialisable dict with enum values as strings"""
+        data = {}
+        for f in fields(self):
+            if f.name == 'raw' and not include_raw:
+                continue
+            value = getattr(self, f.name)
+            data[f.name] = value.value if isinstance(value, Enum) else value
+        return data
+
+
+_FACTORIES = {
+    Supermarket.WOOLWORTHS: Product.from_woolworths,
+    Supermarket.COLES: Product.from_coles,
+    Supermarket.ALDI: Product.from_aldi,
+}
+
+
+def products_from_scraped(items: Iterable[Dict], keep_raw: bool = False) -> List[Product]:
+    """
+    Convert scraper dicts to Product records, skipping malformed entries
+
+    Args:
+        items: Dicts as returned by any scraper's search/scrape methods
+        keep_raw: Keep the original dict on each record (uses more memory)
+
+    Returns:
+        List of Product records
+    """
+    products = []
+    for item in items:
+        try:
+            products.append(Product.from_scraped(item, keep_raw=keep_raw))
+        except (KeyError, ValueError) as e:
+            print(f"[WARNING] Skipping product {item.get('name', 'N/A')!r}: {e}")
+    return products
+
+
+def main():
+    """Example: load the combined scraper output as Product records"""
+    import json
+    from compression import open_input, resolve_input
+
+    with open_input(resolve_input("all_supermarkets_products.json")) as f:
+        data = json.load(f)
+
+    for supermarket, section in data['supermarkets'].items():
+        products = products_from_scraped(section['products'])
+        print(f"{supermarket}: {len(products)} products")
+        for product in products[:2]:
+            print(f"  {product}")
+
+
+if __name__ == "__main__":
+    main()
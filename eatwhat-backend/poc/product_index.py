@@ -0,0 +1,201 @@
+"""
+Trigram Product Index
+Character-trigram inverted index over product names, built after each crawl
+and exported as JSON for the backend's shopping-list matcher
+(src/services/productIndex.ts), so an ingredient lookup only touches the
+postings of its own trigrams instead of fuzzy-scanning every product
+
+Scoring: match_score is the share of the ingredient's trigrams found in the
+product name (0-1, rounded to 2 places like shoppingListService's Fuse score).
+DEFAULT_MIN_SCORE 0.6 corresponds to its Fuse threshold of 0.4. Ties go to
+the product whose name is covered most, i.e. the shortest close match.
+
+Usage:
+    python product_index.py [supermarket_products.json] [product_index.json] [ingredient ...]
+"""
+
+import json
+import math
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set
+
+from compression import open_input, open_output, resolve_input
+
+
+INDEX_VERSION = 1
+
+DEFAULT_MIN_SCORE = 0.6
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Trigrams of each word, padded like pg_trgm ("  carrot " -> "  c", " ca", ...)
+
+    Only ASCII letters and digits are kept; productIndex.ts must stay in step.
+    """
+    grams = set()
+    for word in _NON_ALNUM.sub(' ', text.lower()).split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class ProductIndex:
+    """Inverted index from name trigrams to product numbers"""
+
+    def __init__(self):
+        self.keys: List[List[str]] = []          # [supermarket_brand, product_id] per product
+        self.names: List[str] = []
+        self.gram_counts = array('H')            # distinct trigrams per name
+        self.postings: Dict[str, array] = {}     # trigram -> ascending product numbers
+
+    @classmethod
+    def build(cls, rows: List[Dict]) -> 'ProductIndex':
+        """Index supermarket_products rows by name"""
+        index = cls()
+        for number, row in enumerate(rows):
+            grams = trigrams(row['name'])
+            index.keys.append([row['supermarket_brand'], row['product_id']])
+            index.names.append(row['name'])
+            index.gram_counts.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                postings = index.postings.get(gram)
+                if postings is None:
+                    postings = index.postings[gram] = array('I')
+                postings.append(number)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, term: str, limit: int = 5, min_score: float = DEFAULT_MIN_SCORE,
+               supermarket_brand: Optional[str] = None) -> List[Dict]:
+        """
+        Best matching products for an ingredient name
+
+        Args:
+            term: Ingredient name, e.g. "carrot"
+            limit: Maximum results
+            min_score: Lowest match_score returned
+            supermarket_brand: Restrict results to one supermarket
+
+        Returns:
+            List of dicts: supermarket_brand, product_id, name, match_score
+        """
+        query = trigrams(term)
+        if not query:
+            return []
+
+        # A product with at least `needed` of the m query trigrams must appear
+        # in one of the m - needed + 1 shortest postings, so only those are
+        # scanned; the longer ones are probed by binary search per candidate
+        needed = max(1, math.ceil(min_score * len(query) - 1e-9))
+        lists = sorted((self.postings.get(gram, ()) for gram in query), key=len)
+        split = len(lists) - needed + 1
+
+        hits: Dict[int, int] = {}
+        for postings in lists[:split]:
+            for number in postings:
+                hits[number] = hits.get(number, 0) + 1
+        for postings in lists[split:]:
+            for number in hits:
+                i = bisect_left(postings, number)
+                if i < len(postings) and postings[i] == number:
+                    hits[number] += 1
+
+        ranked = []
+        for number, shared in hits.items():
+            if shared < needed:
+                continue
+            if supermarket_brand and self.keys[number][0] != supermarket_brand:
+                continue
+            ranked.append((-shared, -shared / self.gram_counts[number], number))
+        ranked.sort()
+
+        results = []
+        for negative_shared, _, number in ranked[:limit]:
+            supermarket, product_id = self.keys[number]
+            results.append({
+                'supermarket_brand': supermarket,
+                'product_id': product_id,
+                'name': self.names[number],
+                'match_score': round(-negative_shared / len(query), 2),
+            })
+        return results
+
+    def to_dict(self) -> Dict:
+        """
+        Exportable form; postings are delta-encoded (gaps between product numbers)
+        to keep the file small
+        """
+        postings = {}
+        for gram, numbers in self.postings.items():
+            previous = 0
+            gaps = []
+            for number in numbers:
+                gaps.append(number - previous)
+                previous = number
+            postings[gram] = gaps
+        return {
+            'version': INDEX_VERSION,
+            'keys': self.keys,
+            'names': self.names,
+            'gram_counts': self.gram_counts.tolist(),
+            'postings': postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ProductIndex':
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported product index version: {data.get('version')}")
+        index = cls()
+        index.keys = data['keys']
+        index.names = data['names']
+        index.gram_counts = array('H', data['gram_counts'])
+        for gram, gaps in data['postings'].items():
+            numbers = array('I')
+            total = 0
+            for gap in gaps:
+                total += gap
+                numbers.append(total)
+            index.postings[gram] = numbers
+        return index
+
+    def save(self, path: str = "product_index.json"):
+        """Write the index (name it .json.gz to compress; the backend reads both)"""
+        with open_output(path) as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+        print(f"[OK] Indexed {len(self)} products ({len(self.postings)} trigrams) to: {path}")
+
+    @classmethod
+    def load(cls, path: str = "product_index.json") -> 'ProductIndex':
+        with open_input(resolve_input(path)) as f:
+            return cls.from_dict(json.load(f))
+
+
+def main():
+    """Build the index from a row file and try a few ingredient lookups"""
+    source = sys.argv[1] if len(sys.argv) > 1 else "supermarket_products.json"
+    path = sys.argv[2] if len(sys.argv) > 2 else "product_index.json"
+    terms = sys.argv[3:] or ["carrot", "broccoli", "sweet potato"]
+
+    with open_input(resolve_input(source)) as f:
+        rows = json.load(f)
+
+    index = ProductIndex.build(rows)
+    index.save(path)
+
+    for term in terms:
+        print(f"\n{term}:")
+        for result in index.search(term):
+            print(f"  {result['match_score']:.2f}  {result['supermarket_brand']:<10} {result['name']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Cross-Supermarket Product Matcher
+Groups the same product sold at Woolworths, Coles and ALDI into equivalence
+clusters: exact joins on barcode where both sides have one, otherwise
+MinHash/LSH blocking on normalized name words followed by an exact Jaccard
+check, so only likely pairs are ever compared. Pack sizes never add to the
+similarity; they only keep products of different sizes apart.
+
+Cluster IDs are kept in a small JSON file and carried over between crawls,
+so a product keeps its cluster as long as its members keep matching.
+
+Usage:
+    python product_matcher.py [all_supermarkets_products.json] [product_clusters.json]
+"""
+
+import json
+import os
+import re
+import sys
+import zlib
+from collections import Counter
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from compression import open_input, open_output, resolve_input
+from product import Product, products_from_scraped
+from unit_prices import BASE_EACH, BASE_NONE, BASE_UNIT_NAMES, parse_measure
+
+
+NUM_PERM = 64
+BANDS = 16                  # 16 bands x 4 rows: pairs above ~0.5 Jaccard collide
+MIN_JACCARD = 0.5
+MAX_BUCKET = 200            # larger buckets are generic tokens, not products
+
+_PRIME = (1 << 31) - 1
+_SEED = 20260124            # fixed, so signatures are reproducible
+
+_WORD = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+_SIZE = re.compile(r'(\d+(?:\.\d+)?)\s*(kg|g|ml|l|pk|pack)\b')
+_EACH_SIZES = frozenset({'each', 'ea', '1 each', '1ea'})
+
+# Words that say nothing about which product it is
+_STOPWORDS = frozenset({
+    'woolworths', 'coles', 'aldi', 'fresh', 'loose', 'each', 'ea', 'approx',
+    'prepacked', 'pack', 'bag', 'bagged', 'punnet', 'bunch', 'the', 'and', 'of',
+    'per', 'kg', 'g', 'ml', 'l', 'x',
+})
+
+Key = Tuple[str, str]
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith('oes'):
+        return word[:-2]
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def size_token(product: Product) -> Optional[str]:
+    """
+    Normalized pack size such as 'size:0.5kg', or None for loose/approximate items
+
+    Taken from the size field, else from a size written in the name. Items
+    sold each get 'size:each', so they never match a weighed pack.
+    """
+    if product.size and product.size.strip().lower() in _EACH_SIZES:
+        return 'size:each'
+    for text in (product.size, product.name):
+        if not text or 'approx' in text.lower():
+            continue
+        match = _SIZE.search(text.lower())
+        if not match:
+            continue
+        if match.group(2) in ('pk', 'pack'):
+            return f"size:{int(float(match.group(1)))}pk"
+        base_unit, quantity = parse_measure(match.group(1) + match.group(2))
+        if base_unit not in (BASE_NONE, BASE_EACH):
+            return f"size:{quantity:g}{BASE_UNIT_NAMES[base_unit]}"
+    return None
+
+
+def tokens(product: Product) -> FrozenSet[str]:
+    """
+    Normalized name words used for matching
+
+    The pack size is left out: a shared size says nothing about whether two
+    names are the same product (size_token is compared separately).
+    """
+    words = set()
+    for word in _WORD.findall(product.name.lower()):
+        if word in _STOPWORDS or _SIZE.fullmatch(word) or word.replace('.', '').isdigit():
+            continue
+        words.add(_singular(word))
+    return frozenset(words)
+
+
+def minhash_signatures(token_sets: Sequence[FrozenSet[str]], num_perm: int = NUM_PERM) -> np.ndarray:
+    """
+    MinHash signatures for many token sets at once
+
+    Every set must be non-empty. Each distinct token is hashed once; the
+    permutations are then applied to all token occurrences as whole arrays.
+
+    Returns:
+        uint64 array of shape (len(token_sets), num_perm)
+    """
+    token_hash: Dict[str, int] = {}
+    values, offsets = [], []
+    for token_set in token_sets:
+        offsets.append(len(values))
+        for token in token_set:
+            value = token_hash.get(token)
+            if value is None:
+                value = token_hash[token] = zlib.crc32(token.encode('utf-8')) & _PRIME
+            values.append(value)
+
+    x = np.array(values, dtype=np.uint64)
+    starts = np.array(offsets, dtype=np.int64)
+    rng = np.random.default_rng(_SEED)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    signatures = np.empty((len(token_sets), num_perm), dtype=np.uint64)
+    for i in range(num_perm):
+        hashed = (a[i] * x + b[i]) % _PRIME
+        signatures[:, i] = np.minimum.reduceat(hashed, starts)
+    return signatures
+
+
+def candidate_pairs(signatures: np.ndarray, stores: np.ndarray, bands: int = BANDS,
+                    max_bucket: int = MAX_BUCKET) -> set:
+    """
+    Pairs of rows that share at least one LSH band, from different supermarkets
+
+    Args:
+        signatures: MinHash signatures (rows x permutations)
+        stores: Supermarket code per row
+
+    Returns:
+        Set of (i, j) with i < j
+    """
+    rows_per_band = signatures.shape[1] // bands
+    pairs = set()
+    for band in range(bands):
+        block = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        keys = np.zeros(len(block), dtype=np.uint64)
+        for column in range(rows_per_band):
+            keys = keys * np.uint64(0x9E3779B1) + block[:, column]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for bucket in np.split(order, boundaries):
+            if len(bucket) < 2 or len(bucket) > max_bucket:
+                continue
+            if len(set(stores[bucket].tolist())) < 2:
+                continue
+            members = sorted(bucket.tolist())
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    i, j = members[x], members[y]
+                    if stores[i] != stores[j]:
+                        pairs.add((i, j))
+    return pairs
+
+
+def _sizes_conflict(size_a: Optional[str], size_b: Optional[str]) -> bool:
+    """Both pack sizes are known and differ"""
+    return bool(size_a and size_b and size_a != size_b)
+
+
+def match_products(products: Sequence[Product], min_jaccard: float = MIN_JACCARD) -> List[List[Product]]:
+    """
+    Group products that are the same item at different supermarkets
+
+    Edges are barcode matches first, then verified LSH candidates by
+    descending Jaccard similarity; an edge is only taken if the merged
+    cluster would still hold at most one product per supermarket.
+
+    Returns:
+        Clusters of two or more products
+    """
+    products = list({p.key: p for p in products}.values())
+    edges: List[Tuple[float, int, int]] = []
+
+    by_barcode: Dict[str, List[int]] = {}
+    for i, product in enumerate(products):
+        if product.barcode:
+            by_barcode.setdefault(product.barcode.lstrip('0'), []).append(i)
+    for members in by_barcode.values():
+        for i in members[1:]:
+            edges.append((2.0, members[0], i))
+
+    token_sets = [tokens(p) for p in products]
+    sizes = [size_token(p) for p in products]
+    indexed = [i for i, t in enumerate(token_sets) if t]
+    if len(indexed) > 1:
+        store_codes = {s: n for n, s in enumerate(sorted({p.supermarket.value for p in products}))}
+        stores = np.array([store_codes[products[i].supermarket.value] for i in indexed])
+        signatures = minhash_signatures([token_sets[i] for i in indexed])
+        for x, y in candidate_pairs(signatures, stores):
+            i, j = indexed[x], indexed[y]
+            if _sizes_conflict(sizes[i], sizes[j]):
+                continue
+            a, b = token_sets[i], token_sets[j]
+            similarity = len(a & b) / len(a | b)
+            if similarity >= min_jaccard:
+                edges.append((similarity, i, j))
+
+    parent = list(range(len(products)))
+    members_of = {i: {products[i].supermarket} for i in range(len(products))}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for _, i, j in sorted(edges, key=lambda e: (-e[0], e[1], e[2])):
+        root_i, root_j = find(i), find(j)
+        if root_i == root_j or members_of[root_i] & members_of[root_j]:
+            continue
+        parent[root_j] = root_i
+        members_of[root_i] |= members_of.pop(root_j)
+
+    clusters: Dict[int, List[Product]] = {}
+    for i, product in enumerate(products):
+        clusters.setdefault(find(i), []).append(product)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+class ClusterStore:
+    """Persistent product -> cluster ID assignments, carried across crawls"""
+
+    def __init__(self, path: str = "product_clusters.json"):
+        self.path = path
+        self.next_id = 1
+        self.assignments: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open_input(path) as f:
+                data = json.load(f)
+            self.next_id = data['next_id']
+            self.assignments = data['assignments']
+
+    @staticmethod
+    def key(product: Product) -> str:
+        return f"{product.supermarket.value}\t{product.product_id}"
+
+    def assign(self, clusters: List[List[Product]],
+               crawled: Sequence[Product] = ()) -> Dict[int, List[Product]]:
+        """
+        Give each cluster a stable ID
+
+        A cluster keeps the ID most of its members already had; largest
+        clusters choose first and each ID is used once per crawl. Earlier
+        members of a reused ID that are not in its cluster now, and crawled
+        products that matched nothing, lose their assignment; products
+        missing from this crawl keep theirs.
+
+        Args:
+            clusters: Clusters from match_products
+            crawled: Every product of this crawl
+
+        Returns:
+            cluster ID -> member products
+        """
+        taken = set()
+        result = {}
+        for members in sorted(clusters, key=len, reverse=True):
+            previous = Counter(self.assignments[self.key(p)] for p in members if self.key(p) in self.assignments)
+            cluster_id = next((cid for cid, _ in previous.most_common() if cid not in taken), None)
+            if cluster_id is None:
+                cluster_id = self.next_id
+                self.next_id += 1
+            taken.add(cluster_id)
+            result[cluster_id] = members
+
+        # Products matched this crawl move to their new cluster; unmatched ones
+        # and stale members of the IDs in use are dropped
+        current = {self.key(p): cluster_id for cluster_id, members in result.items() for p in members}
+        unmatched = {self.key(p) for p in crawled} - current.keys()
+        self.assignments = {
+            key: cluster_id for key, cluster_id in self.assignments.items()
+            if key not in unmatched and cluster_id not in taken
+        }
+        self.assignments.update(current)
+        return result
+
+    def save(self):
+        with open_output(self.path) as f:
+            json.dump({'next_id': self.next_id, 'assignments': self.assignments}, f, separators=(',', ':'))
+
+
+def main():
+    """Match a saved crawl and update the persistent clusters"""
+    import time
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "all_supermarkets_products.json"
+    path = sys.argv[2] if len(sys.argv) > 2 else "product_clusters.json"
+
+    with open_input(resolve_input(source)) as f:
+        data = json.load(f)
+    products = []
+    for section in data['supermarkets'].values():
+        products.extend(products_from_scraped(section['products']))
+
+    start = time.perf_counter()
+    clusters = match_products(products)
+    store = ClusterStore(path)
+    assigned = store.assign(clusters, products)
+    store.save()
+    print(f"[OK] {len(assigned)} clusters from {len(products)} products "
+          f"in {time.perf_counter() - start:.2f}s -> {path}")
+
+    for cluster_id, members in sorted(assigned.items())[:10]:
+        names = ' | '.join(f"{p.supermarket.value}: {p.name}" for p in members)
+        print(f"  #{cluster_id}: {names}")
+
+
+if __name__ == "__main__":
+    main()
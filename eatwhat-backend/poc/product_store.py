@@ -0,0 +1,256 @@
+"""
+Local SQLite Product Store
+Embedded mirror of the supermarket_products table, written by the scrapers
+through batched transactional upserts and queryable locally in milliseconds.
+Price changes are kept in an append-only history (see price_history.py).
+
+Usage:
+    python product_store.py [supermarket_products.json] [products.db]
+"""
+
+import sqlite3
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from normalize import SUPERMARKET_PRODUCT_COLUMNS, to_rows, utc_timestamp
+from price_history import HISTORY_SCHEMA
+from prices import to_cents, to_dollars
+from product import products_from_scraped
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS supermarket_products (
+    id INTEGER PRIMARY KEY,
+    supermarket_brand TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT,
+    brand TEXT,
+    size TEXT,
+    image_url TEXT,
+    current_price_cents INTEGER,
+    original_price_cents INTEGER,
+    is_on_sale INTEGER NOT NULL DEFAULT 0,
+    discount_percentage INTEGER,
+    sale_end_date TEXT,
+    scraped_at TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    UNIQUE(supermarket_brand, product_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_products_name ON supermarket_products(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_products_category ON supermarket_products(category);
+CREATE INDEX IF NOT EXISTS idx_products_on_sale ON supermarket_products(is_on_sale, supermarket_brand);
+CREATE INDEX IF NOT EXISTS idx_products_updated_at ON supermarket_products(updated_at);
+"""
+
+# Columns whose change counts as a product update (everything but timestamps)
+_CONTENT_COLUMNS = (
+    'name', 'category', 'brand', 'size', 'image_url', 'current_price_cents',
+    'original_price_cents', 'is_on_sale', 'discount_percentage', 'sale_end_date',
+)
+
+_INSERT_COLUMNS = (
+    'supermarket_brand', 'product_id') + _CONTENT_COLUMNS + ('scraped_at', 'created_at', 'updated_at')
+
+# scraped_at always moves forward; updated_at only when the content changed,
+# so incremental exports pick up real changes only
+_UPSERT_SQL = (
+    f"INSERT INTO supermarket_products ({', '.join(_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _INSERT_COLUMNS)}) "
+    "ON CONFLICT(supermarket_brand, product_id) DO UPDATE SET "
+    + ', '.join(f"{c} = excluded.{c}" for c in _CONTENT_COLUMNS)
+    + ", scraped_at = excluded.scraped_at, updated_at = CASE WHEN "
+    + ' OR '.join(f"{c} IS NOT excluded.{c}" for c in _CONTENT_COLUMNS)
+    + " THEN excluded.updated_at ELSE supermarket_products.updated_at END"
+)
+
+
+class ProductStore:
+    """SQLite-backed product catalogue keyed on (supermarket_brand, product_id)"""
+
+    def __init__(self, path: str = "products.db"):
+        """
+        Args:
+            path: Database file, created on first use (':memory:' for tests)
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.executescript(HISTORY_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def upsert_rows(self, rows: Iterable[Dict], batch_size: int = 1000) -> int:
+        """
+        Insert or update supermarket_products rows in batched transactions
+
+        Args:
+            rows: Rows as produced by normalize.to_rows
+            batch_size: Rows per transaction
+
+        Returns:
+            Number of rows processed
+        """
+        now = utc_timestamp()
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(_to_params(row, now))
+            if len(batch) >= batch_size:
+                total += self._write_batch(batch)
+                batch = []
+        if batch:
+            total += self._write_batch(batch)
+        return total
+
+    def _write_batch(self, batch: List[tuple]) -> int:
+        with self.conn:
+            self.conn.executemany(_UPSERT_SQL, batch)
+        return len(batch)
+
+    def upsert_products(self, items: Iterable[Dict], scraped_at: Optional[str] = None) -> int:
+        """Normalize one page of scraper output and upsert it"""
+        return self.upsert_rows(to_rows(products_from_scraped(items), scraped_at))
+
+    def get(self, supermarket_brand: str, product_id: str) -> Optional[Dict]:
+        """Look up one product by its unique key"""
+        cursor = self.conn.execute(
+            "SELECT * FROM supermarket_products WHERE supermarket_brand = ? AND product_id = ?",
+            (supermarket_brand, str(product_id)),
+        )
+        row = cursor.fetchone()
+        return _to_row(row) if row else None
+
+    def search(self, name: Optional[str] = None, supermarket_brand: Optional[str] = None,
+               category: Optional[str] = None, on_sale: Optional[bool] = None,
+               limit: int = 50) -> List[Dict]:
+        """
+        Find products by name prefix/substring, store, category and sale status
+
+        A name without wildcards is matched as a case-insensitive prefix, which
+        uses idx_products_name; pass '%carrot%' for a substring scan.
+        """
+        clauses, params = [], []
+        if name:
+            clauses.append("name LIKE ?")
+            params.append(name if '%' in name else name + '%')
+        if supermarket_brand:
+            clauses.append("supermarket_brand = ?")
+            params.append(supermarket_brand)
+        if category:
+            clauses.append("category = ?")
+            params.append(category)
+        if on_sale is not None:
+            clauses.append("is_on_sale = ?")
+            params.append(int(on_sale))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.conn.execute(
+            f"SELECT * FROM supermarket_products {where} ORDER BY current_price_cents LIMIT ?",
+            params + [limit],
+        )
+        return [_to_row(row) for row in cursor]
+
+    def iter_rows(self, updated_since: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Stream supermarket_products rows, optionally only those changed since a time
+
+        Args:
+            updated_since: ISO-8601 timestamp; only rows whose content changed after it
+        """
+        if updated_since:
+            cursor = self.conn.execute(
+                "SELECT * FROM supermarket_products WHERE updated_at > ? ORDER BY updated_at",
+                (updated_since,),
+            )
+        else:
+            cursor = self.conn.execute("SELECT * FROM supermarket_products ORDER BY id")
+        for row in cursor:
+            yield _to_row(row)
+
+    def count(self, supermarket_brand: Optional[str] = None) -> int:
+        if supermarket_brand:
+            cursor = self.conn.execute(
+                "SELECT COUNT(*) FROM supermarket_products WHERE supermarket_brand = ?",
+                (supermarket_brand,),
+            )
+        else:
+            cursor = self.conn.execute("SELECT COUNT(*) FROM supermarket_products")
+        return cursor.fetchone()[0]
+
+
+def _to_params(row: Dict, now: str) -> tuple:
+    """supermarket_products row -> upsert parameters (prices as integer cents)"""
+    return (
+        row['supermarket_brand'],
+        row['product_id'],
+        row['name'],
+        row['category'],
+        row['brand'],
+        row['size'],
+        row['image_url'],
+        to_cents(row['current_price']),
+        to_cents(row['original_price']),
+        int(row['is_on_sale']),
+        row['discount_percentage'],
+        row['sale_end_date'],
+        row['scraped_at'],
+        now,
+        now,
+    )
+
+
+def _to_row(record: sqlite3.Row) -> Dict:
+    """Database record -> supermarket_products row as exported to Supabase"""
+    row = {}
+    for column in SUPERMARKET_PRODUCT_COLUMNS:
+        if column == 'current_price':
+            row[column] = to_dollars(record['current_price_cents'])
+        elif column == 'original_price':
+            row[column] = to_dollars(record['original_price_cents'])
+        elif column == 'is_on_sale':
+            row[column] = bool(record['is_on_sale'])
+        else:
+            row[column] = record[column]
+    return row
+
+
+def main():
+    """Load a supermarket_products.json row file into the store and query it"""
+    import json
+    import time
+    from compression import open_input, resolve_input
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "supermarket_products.json"
+    path = sys.argv[2] if len(sys.argv) > 2 else "products.db"
+
+    with open_input(resolve_input(source)) as f:
+        rows = json.load(f)
+
+    with ProductStore(path) as store:
+        start = time.perf_counter()
+        store.upsert_rows(rows)
+        print(f"[OK] Upserted {len(rows)} rows into {path} "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        carrots = store.search('carrot', supermarket_brand='Coles')
+        print(f"Coles 'carrot*' query: {len(carrots)} results "
+              f"in {(time.perf_counter() - start) * 1000:.2f} ms")
+        for row in carrots[:3]:
+            print(f"  {row['name']}: ${row['current_price']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Offline Replay Transport
+Serves captured responses to the scrapers instead of the network, so the
+whole pipeline (scrape_all_supermarkets.py included) runs deterministically
+offline for profiling and throughput testing
+
+Requests are looked up by signature: method, normalized URL with sorted
+query parameters, and a hash of the body if there is one. The manifest maps
+signatures to the captured files already in this directory:
+
+    {"version": 1, "responses": [
+        {"method": "GET", "url": "https://www.coles.com.au/search?q=vegetables",
+         "status": 200, "content_type": "text/html; charset=utf-8",
+         "file": "coles_search_page.html"}, ...]}
+
+A request without a recording fails like a dropped connection, so the
+scrapers take their usual error path instead of silently going online.
+Recording mode does the opposite: real requests are made and each response
+is saved as a fixture and added to the manifest.
+
+Usage:
+    python replay.py [replay_manifest.json]      list the recordings
+    python scrape_all_supermarkets.py --offline  replay the full pipeline
+    python scrape_all_supermarkets.py --record   capture fresh fixtures
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+from datetime import timedelta
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+MANIFEST_VERSION = 1
+
+DEFAULT_MANIFEST = "replay_manifest.json"
+
+# Query parameters that only bust caches and never change the response
+IGNORED_PARAMS = frozenset({'_', 'cb', 'timestamp'})
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class ReplayMissError(requests.exceptions.ConnectionError):
+    """A request has no recorded response"""
+
+
+def request_signature(method: str, url: str, body: Optional[bytes] = None) -> str:
+    """
+    Stable key of a request: 'GET https://host/path?a=1&b=2 [#bodyhash]'
+
+    Scheme and host are lowercased, default ports, fragments, trailing
+    slashes and cache-busting parameters dropped, and the query sorted, so
+    the same request built in a different order still matches.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k not in IGNORED_PARAMS)
+    signature = f"{method.upper()} {urlunsplit((scheme, host, path, urlencode(query), ''))}"
+    if body:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        signature += " #" + hashlib.blake2b(body, digest_size=8).hexdigest()
+    return signature
+
+
+def _charset(content_type: str) -> Optional[str]:
+    match = re.search(r'charset=([\w-]+)', content_type or '')
+    return match.group(1) if match else None
+
+
+class ReplayAdapter(BaseAdapter):
+    """requests transport adapter answering from a replay manifest"""
+
+    def __init__(self, manifest_path: str = DEFAULT_MANIFEST):
+        super().__init__()
+        self.manifest_path = manifest_path
+        self.fixture_dir = os.path.dirname(os.path.abspath(manifest_path))
+        self.recordings: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._bodies: Dict[str, bytes] = {}
+
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported replay manifest version: {manifest.get('version')}")
+        for entry in manifest['responses']:
+            body = entry.get('body')
+            signature = request_signature(entry.get('method', 'GET'), entry['url'],
+                                          body.encode('utf-8') if body else None)
+            self.recordings[signature] = entry
+
+    def _content(self, entry: Dict) -> bytes:
+        """Fixture bytes, read once per run"""
+        path = os.path.join(self.fixture_dir, entry['file'])
+        content = self._bodies.get(path)
+        if content is None:
+            with open(path, 'rb') as f:
+                content = self._bodies[path] = f.read()
+        return content
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        signature = request_signature(request.method, request.url, request.body)
+        entry = self.recordings.get(signature)
+        if entry is None:
+            self.misses += 1
+            raise ReplayMissError(f"No recorded response for {signature}", request=request)
+        self.hits += 1
+
+        content = self._content(entry)
+        response = requests.Response()
+        response.status_code = entry.get('status', 200)
+        response.reason = entry.get('reason', 'OK' if response.status_code == 200 else '')
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        content_type = entry.get('content_type')
+        if content_type:
+            response.headers['Content-Type'] = content_type
+        response.headers['Content-Length'] = str(len(content))
+        # Captures are saved as UTF-8; skip requests' charset detection
+        response.encoding = _charset(content_type) or 'utf-8'
+        response.raw = io.BytesIO(content)
+        response._content = content
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = timedelta(0)
+        response.from_cache = True
+        return response
+
+    def close(self):
+        self._bodies.clear()
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTP adapter that saves every response as a fixture for later replay"""
+
+    def __init__(self, manifest_path: str = DEFAULT_MANIFEST, fixture_dir: str = "recordings", **kwargs):
+        super().__init__(**kwargs)
+        self.manifest_path = manifest_path
+        self.fixture_dir = fixture_dir
+        self.manifest = {'version': MANIFEST_VERSION, 'responses': []}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        signature = request_signature(request.method, request.url, request.body)
+
+        parts = urlsplit(request.url)
+        name = re.sub(r'[^0-9A-Za-z]+', '_', f"{parts.hostname}{parts.path}").strip('_')
+        digest = hashlib.blake2b(signature.encode('utf-8'), digest_size=4).hexdigest()
+        content_type = response.headers.get('Content-Type', '')
+        extension = '.json' if 'json' in content_type else '.html'
+        relative = os.path.join(self.fixture_dir, f"{name}_{digest}{extension}")
+
+        base = os.path.dirname(os.path.abspath(self.manifest_path))
+        os.makedirs(os.path.join(base, self.fixture_dir), exist_ok=True)
+        with open(os.path.join(base, relative), 'wb') as f:
+            f.write(response.content)
+
+        entry = {
+            'method': request.method,
+            'url': request.url,
+            'status': response.status_code,
+            'content_type': content_type,
+            'file': relative,
+        }
+        if request.body:
+            body = request.body
+            entry['body'] = body.decode('utf-8') if isinstance(body, bytes) else body
+        # A new recording of the same request replaces the old one
+        self.manifest['responses'] = [
+            e for e in self.manifest['responses']
+            if request_signature(e.get('method', 'GET'), e['url'],
+                                 e['body'].encode('utf-8') if e.get('body') else None) != signature
+        ] + [entry]
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        return response
+
+
+def replay_session(manifest_path: str = DEFAULT_MANIFEST) -> requests.Session:
+    """Session that answers every http(s) request from the manifest"""
+    session = requests.Session()
+    adapter = ReplayAdapter(manifest_path)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # Lets clients skip persisting what they learn from captured responses,
+    # and start from what the captures were recorded with instead
+    session.is_replay = True
+    session.recorded_urls = [entry['url'] for entry in adapter.recordings.values()]
+    return session
+
+
+def record_session(manifest_path: str = DEFAULT_MANIFEST, fixture_dir: str = "recordings") -> requests.Session:
+    """Session that goes online and records every response into the manifest"""
+    session = requests.Session()
+    adapter = RecordingAdapter(manifest_path, fixture_dir)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def main():
+    """List the recordings of a manifest and check their fixtures exist"""
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MANIFEST
+    adapter = ReplayAdapter(path)
+    missing = 0
+    for signature, entry in adapter.recordings.items():
+        fixture = os.path.join(adapter.fixture_dir, entry['file'])
+        if os.path.exists(fixture):
+            print(f"[OK] {signature} -> {entry['file']} ({os.path.getsize(fixture):,} bytes)")
+        else:
+            missing += 1
+            print(f"[ERROR] {signature} -> {entry['file']} (missing)")
+    print(f"\n{len(adapter.recordings)} recordings, {missing} missing fixtures")
+
+
+if __name__ == "__main__":
+    main()
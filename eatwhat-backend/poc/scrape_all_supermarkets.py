@@ -1,24 +1,115 @@
 """
 Comprehensive Scraper for All Australian Supermarkets
 Demonstrates scraping from Woolworths, Coles, and ALDI
+
+Usage:
+    python scrape_all_supermarkets.py            live crawl
+    python scrape_all_supermarkets.py --offline  replay the captured responses (replay.py)
+    python scrape_all_supermarkets.py --record   live crawl, saving responses for replay
+    python scrape_all_supermarkets.py --mock http://127.0.0.1:8765
+                                                 crawl a local mock server (mock_supermarket_server.py)
+
+    --metrics-port 9464 / --metrics-textfile eatwhat_crawl.prom expose live
+    Prometheus metrics while crawling (metrics_exporter.py)
+    --memory-profile traces allocations per stage; --memory-budget-mb 1024
+    flushes, then sheds work, above that RSS (memory_monitor.py)
 """
 
 import json
+import sys
 import time
 from woolworths_scraper_final import WoolworthsScraper
-from coles_scraper_poc import ColesScraperPOC
+from coles_data_client import ColesDataClient
 from aldi_scraper_final import AldiScraper
-
-
-def scrape_all_supermarkets(search_term=None, aldi_category=None):
+from catalogue import write_catalogue
+from compression import open_output
+from crawl_metrics import CrawlMetrics, instrument_scraper
+from deals import DealEngine
+from memory_monitor import MemoryMonitor
+from metrics_exporter import MetricsServer, TextfileWriter
+from delta_export import export_delta
+from ndjson_writer import NDJSONProductWriter
+from normalize import rows_from_scraped, to_rows
+from price_analytics import analyze, format_report, save_report
+from prices import format_cents
+from product import products_from_scraped
+from product_index import ProductIndex
+from product_matcher import ClusterStore, match_products
+from product_store import ProductStore
+from replay import record_session, replay_session
+from snapshots import write_snapshot
+
+
+def _publish(products, supermarket, metrics, writer=None, store=None, rows_out=None, records_out=None):
+    """Hand one page of scraped products to the streaming outputs, normalized once for all"""
+    if not (writer or store or rows_out is not None or records_out is not None):
+        return
+    with metrics.stage('normalize', store=supermarket) as stage:
+        records = products_from_scraped(products)
+        rows = to_rows(records, writer.scraped_at if writer else None)
+        stage['rows'] = len(rows)
+    metrics.count('rows', len(rows), store=supermarket)
+    metrics.count('dedup', len(records) - len({r.key for r in records}), store=supermarket)
+    metrics.count('skipped', len(products) - len(rows), store=supermarket)
+
+    with metrics.stage('write', store=supermarket):
+        if writer:
+            writer.write_rows(rows)
+            writer.skipped += len(products) - len(rows)
+        if store:
+            store.upsert_rows(rows)
+        if rows_out is not None:
+            rows_out.extend(rows)
+        if records_out is not None:
+            records_out.setdefault(supermarket, []).extend(records)
+
+    if metrics.memory:
+        action = metrics.memory.page_done(supermarket)
+        if action != 'ok':
+            metrics.count(f"memory_{action}", store=supermarket)
+            print(f"[WARNING] Memory budget: {action} after {supermarket} page")
+
+
+def _shed(metrics, supermarket):
+    """True when the memory budget says to skip the rest of the crawl"""
+    if metrics.memory and metrics.memory.shedding:
+        print(f"[WARNING] Memory budget exceeded, skipping {supermarket}")
+        metrics.count('shed', store=supermarket)
+        return True
+    return False
+
+
+def scrape_all_supermarkets(search_term=None, aldi_category=None, writer=None, store=None,
+                            session=None, delay=2, metrics=None, base_urls=None, rows=None, records=None):
     """
     Scrape a product from all three supermarkets
 
     Args:
         search_term: Search term for Woolworths and Coles (e.g., "carrots")
         aldi_category: ALDI category URL (e.g., "/products/fruits-vegetables/fresh-vegetables/k/1111111153")
+        writer: Optional NDJSONProductWriter; each page of products is
+                appended to it as soon as it is parsed
+        store: Optional ProductStore; each page is upserted into it in one
+               transaction
+        session: Optional requests session shared by the scrapers, e.g.
+                 replay.replay_session() to run offline
+        delay: Seconds to wait between supermarkets
+        metrics: Optional CrawlMetrics collecting request/stage timings and
+                 counters (a quiet one is used otherwise)
+        base_urls: Optional site root per supermarket, e.g. a local mock
+                   server; the real sites otherwise
+        rows: Optional list collecting the normalized rows of every page, so
+              later steps reuse them instead of normalizing (and warning) again
+        records: Optional dict collecting the Product records of every page
+                 per supermarket, for the matching and display steps
     """
 
+    metrics = metrics or CrawlMetrics(echo=False)
+    # Only overridden roots are passed, so the scrapers keep their defaults
+    sites = {name: {'base_url': url} for name, url in (base_urls or {}).items()}
+    if metrics.memory and session is not None:
+        # Cached replay bodies and pooled connections are rebuilt on demand
+        metrics.memory.register_flush(session.close)
     all_products = {
         'woolworths': [],
         'coles': [],
@@ -32,139 +123,157 @@ def scrape_all_supermarkets(search_term=None, aldi_category=None):
     # 1. Scrape Woolworths
     print("\n[1/3] Scraping Woolworths...")
     print("-"*70)
+    # Supermarkets still waiting in the crawl queue
+    metrics.set_gauge('stores', 3)
     try:
-        woolworths = WoolworthsScraper()
-        woolworths_products = woolworths.search_products(search_term or "vegetables", page_size=20)
+        woolworths = instrument_scraper(WoolworthsScraper(session, **sites.get('woolworths', {})), metrics)
+        with metrics.stage('scrape', store='woolworths') as stage:
+            woolworths_products = woolworths.search_products(search_term or "vegetables", page_size=20)
+            stage['products'] = len(woolworths_products)
+        metrics.count('products', len(woolworths_products), store='woolworths')
         all_products['woolworths'] = woolworths_products
-        print(f"[OK] Found {len(woolworths_products)} Woolworths products")
+        _publish(woolworths_products, 'woolworths', metrics, writer, store, rows, records)
     except Exception as e:
         print(f"[ERROR] Woolworths scraping failed: {e}")
 
     # Delay between supermarkets
-    time.sleep(2)
+    time.sleep(delay)
 
     # 2. Scrape Coles
     print("\n[2/3] Scraping Coles...")
     print("-"*70)
-    try:
-        coles = ColesScraperPOC()
-        coles_products = coles.search_products(search_term or "vegetables")
-        all_products['coles'] = coles_products
-        print(f"[OK] Found {len(coles_products)} Coles products")
-    except Exception as e:
-        print(f"[ERROR] Coles scraping failed: {e}")
+    metrics.set_gauge('stores', 2)
+    if not _shed(metrics, 'coles'):
+        try:
+            # JSON from the Next.js data route; the HTML page only when that fails
+            coles = instrument_scraper(ColesDataClient(session, **sites.get('coles', {})), metrics)
+            with metrics.stage('scrape', store='coles') as stage:
+                coles_products = coles.search_products(search_term or "vegetables")
+                stage['products'] = len(coles_products)
+            metrics.count('products', len(coles_products), store='coles')
+            all_products['coles'] = coles_products
+            _publish(coles_products, 'coles', metrics, writer, store, rows, records)
+        except Exception as e:
+            print(f"[ERROR] Coles scraping failed: {e}")
 
     # Delay between supermarkets
-    time.sleep(2)
+    time.sleep(delay)
 
     # 3. Scrape ALDI
     print("\n[3/3] Scraping ALDI...")
     print("-"*70)
-    try:
-        aldi = AldiScraper()
-        aldi_url = aldi_category or "/products/fruits-vegetables/fresh-vegetables/k/1111111153"
-        aldi_products = aldi.scrape_category(aldi_url)
-        all_products['aldi'] = aldi_products
-        print(f"[OK] Found {len(aldi_products)} ALDI products")
-    except Exception as e:
-        print(f"[ERROR] ALDI scraping failed: {e}")
+    metrics.set_gauge('stores', 1)
+    if not _shed(metrics, 'aldi'):
+        try:
+            aldi = instrument_scraper(AldiScraper(session, **sites.get('aldi', {})), metrics)
+            aldi_url = aldi_category or "/products/fruits-vegetables/fresh-vegetables/k/1111111153"
+            with metrics.stage('scrape', store='aldi') as stage:
+                aldi_products = aldi.scrape_category(aldi_url)
+                stage['products'] = len(aldi_products)
+            metrics.count('products', len(aldi_products), store='aldi')
+            all_products['aldi'] = aldi_products
+            _publish(aldi_products, 'aldi', metrics, writer, store, rows, records)
+        except Exception as e:
+            print(f"[ERROR] ALDI scraping failed: {e}")
+    metrics.set_gauge('stores', 0)
 
     return all_products
 
 
-def display_price_comparison(all_products):
-    """Display price comparison across supermarkets"""
+def display_price_comparison(all_products, assignments=None, rows=None, records=None):
+    """
+    Display price comparison across supermarkets
+
+    Args:
+        all_products: Scraper output ({'woolworths': [...], ...})
+        assignments: Optional product_matcher cluster assignments, adds
+                     matched-product price gaps to the report
+        rows: Normalized rows of all_products, if already built
+        records: Product records of all_products per supermarket, if already built
+
+    Returns:
+        price_analytics report (machine-readable form of what is printed)
+    """
+
+    if records is None:
+        records = {
+            supermarket: products_from_scraped(products)
+            for supermarket, products in all_products.items()
+        }
 
     print("\n" + "="*70)
     print("Price Comparison Summary")
     print("="*70)
+    print()
 
-    # Count products
-    woolworths_count = len(all_products.get('woolworths', []))
-    coles_count = len(all_products.get('coles', []))
-    aldi_count = len(all_products.get('aldi', []))
-
-    total = woolworths_count + coles_count + aldi_count
-
-    print(f"\nTotal products scraped: {total}")
-    print(f"  - Woolworths: {woolworths_count} products")
-    print(f"  - Coles: {coles_count} products")
-    print(f"  - ALDI: {aldi_count} products")
-
-    # Calculate average prices
-    print("\nAverage Prices:")
-
-    if woolworths_count > 0:
-        woolworths_prices = [p.get('price', 0) for p in all_products['woolworths'] if p.get('price') is not None]
-        if woolworths_prices:
-            woolworths_avg = sum(woolworths_prices) / len(woolworths_prices)
-            print(f"  - Woolworths: ${woolworths_avg:.2f}")
-
-    if coles_count > 0:
-        coles_prices = [p.get('price', 0) for p in all_products['coles'] if p.get('price') is not None]
-        if coles_prices:
-            coles_avg = sum(coles_prices) / len(coles_prices)
-            print(f"  - Coles: ${coles_avg:.2f}")
-
-    if aldi_count > 0:
-        aldi_prices = [p.get('price', 0) for p in all_products['aldi'] if p.get('price') is not None]
-        if aldi_prices:
-            aldi_avg = sum(aldi_prices) / len(aldi_prices)
-            print(f"  - ALDI: ${aldi_avg:.2f}")
+    if rows is None:
+        rows = rows_from_scraped(all_products)
+    report = analyze(rows, assignments)
+    print(format_report(report))
 
     # Sample products from each
     print("\n" + "="*70)
     print("Sample Products from Each Supermarket")
     print("="*70)
 
-    for supermarket, products in all_products.items():
+    for supermarket, products in records.items():
         if products:
             print(f"\n{supermarket.upper()} - Sample Products:")
             print("-"*70)
             for product in products[:3]:
-                name = product.get('name', 'N/A')
-                price = product.get('price', 'N/A')
-
-                # Handle different price formats
-                if price != 'N/A':
-                    # Check for unit information
-                    unit = product.get('unit', product.get('cup_string', ''))
-                    if unit:
-                        print(f"  {name}: ${price} ({unit})")
-                    else:
-                        print(f"  {name}: ${price}")
+                if product.price_cents is None:
+                    print(f"  {product.name}: Price not available")
+                elif product.unit_measure:
+                    unit_price = format_cents(product.unit_price_cents)
+                    print(f"  {product.name}: {product.price_display} ({unit_price} / {product.unit_measure})")
                 else:
-                    print(f"  {name}: Price not available")
-
-
-def save_all_products(all_products, filename="all_supermarkets_products.json"):
-    """Save all products to a single JSON file"""
-
-    # Add metadata
-    output = {
-        'scraped_at': time.strftime('%Y-%m-%d %H:%M:%S'),
-        'supermarkets': {
-            'woolworths': {
-                'count': len(all_products.get('woolworths', [])),
-                'products': all_products.get('woolworths', [])
-            },
-            'coles': {
-                'count': len(all_products.get('coles', [])),
-                'products': all_products.get('coles', [])
-            },
-            'aldi': {
-                'count': len(all_products.get('aldi', [])),
-                'products': all_products.get('aldi', [])
-            }
-        },
-        'total_products': sum(len(products) for products in all_products.values())
-    }
+                    print(f"  {product.name}: {product.price_display}")
+
+    return report
 
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+
+def save_all_products(all_products, filename="all_supermarkets_products.json", snapshot_dir=None, rows=None):
+    """
+    Save all products to a single JSON file
+
+    The file is written product by product, one per line, instead of being
+    built and serialized as a whole; the streamed NDJSON rows
+    (all_supermarkets_products.ndjson) remain the importer's input.
+
+    Args:
+        all_products: Products per supermarket, as returned by scrape_all_supermarkets
+        filename: Combined JSON output file; a .zst or .gz extension compresses it
+        snapshot_dir: Also write a columnar Parquet snapshot partitioned by
+                      supermarket and crawl date here (requires pyarrow)
+        rows: Normalized rows of all_products for the snapshot, if already built
+    """
+
+    def dumps(value):
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+    with open_output(filename) as f:
+        f.write(f'{{"scraped_at":{dumps(time.strftime("%Y-%m-%d %H:%M:%S"))},"supermarkets":{{')
+        for n, supermarket in enumerate(('woolworths', 'coles', 'aldi')):
+            products = all_products.get(supermarket, [])
+            f.write(f'{"," if n else ""}\n"{supermarket}":{{"count":{len(products)},"products":[')
+            for i, product in enumerate(products):
+                f.write(("," if i else "") + "\n" + dumps(product))
+            f.write(']}')
+        f.write(f'}},\n"total_products":{sum(len(products) for products in all_products.values())}}}\n')
 
     print(f"\n[OK] Saved all products to: {filename}")
 
+    if snapshot_dir:
+        write_snapshot(rows if rows is not None else rows_from_scraped(all_products), snapshot_dir)
+
+
+def _option(name, default=None):
+    """Value following a command-line flag, e.g. --metrics-port 9464"""
+    args = sys.argv[1:]
+    if name in args and args.index(name) + 1 < len(args):
+        return args[args.index(name) + 1]
+    return default
+
 
 def main():
     """Example usage"""
@@ -173,24 +282,109 @@ def main():
     print("EXAMPLE: Scraping vegetables from all supermarkets")
     print()
 
-    all_products = scrape_all_supermarkets(
-        search_term="vegetables",
-        aldi_category="/products/fruits-vegetables/fresh-vegetables/k/1111111153"
-    )
-
-    # Display comparison
-    display_price_comparison(all_products)
-
-    # Save to file
-    save_all_products(all_products)
+    offline = '--offline' in sys.argv[1:]
+    mock = _option('--mock')
+    session = None
+    base_urls = None
+    aldi_category = "/products/fruits-vegetables/fresh-vegetables/k/1111111153"
+    if offline:
+        session = replay_session()
+        # The captured ALDI page is the fresh fruit category
+        aldi_category = "/products/fruits-vegetables/fresh-fruits/k/1111111152"
+        print("[INFO] Offline: replaying captured responses from replay_manifest.json")
+    elif mock:
+        base_urls = {name: mock for name in ('woolworths', 'coles', 'aldi')}
+        print(f"[INFO] Crawling the mock supermarkets at {mock}")
+    elif '--record' in sys.argv[1:]:
+        session = record_session()
+        print("[INFO] Recording responses into replay_manifest.json")
+
+    # Every request and stage is logged; the summary shows where the time went
+    memory = None
+    if '--memory-profile' in sys.argv[1:] or _option('--memory-budget-mb'):
+        budget = _option('--memory-budget-mb')
+        memory = MemoryMonitor(trace='--memory-profile' in sys.argv[1:],
+                               budget_mb=float(budget) if budget else None).start()
+    metrics = CrawlMetrics("crawl_log.ndjson", memory=memory)
+    exporters = []
+    if _option('--metrics-port'):
+        exporters.append(MetricsServer(metrics, int(_option('--metrics-port'))).start())
+        print(f"[INFO] Prometheus metrics at {exporters[-1].url}")
+    if _option('--metrics-textfile'):
+        exporters.append(TextfileWriter(metrics, _option('--metrics-textfile')).start())
+
+    rows = []
+    records = {}
+    with NDJSONProductWriter("all_supermarkets_products.ndjson") as writer, ProductStore("products.db") as store:
+        all_products = scrape_all_supermarkets(
+            search_term="vegetables",
+            aldi_category=aldi_category,
+            writer=writer,
+            store=store,
+            session=session,
+            delay=0 if offline or mock else 2,
+            metrics=metrics,
+            base_urls=base_urls,
+            rows=rows,
+            records=records
+        )
+
+        # Only products whose price changed in this crawl, whose regular price aged
+        # out of the window or that are back on the shelf are re-evaluated
+        with metrics.stage('deals'):
+            counts = DealEngine(store).update()
+        print(f"\n[OK] {counts['deals']} current deals ({counts['processed']} products re-evaluated)")
+
+    # Save to file, plus a Parquet snapshot per crawl date with --snapshots DIR
+    snapshot_dir = _option('--snapshots')
+    try:
+        save_all_products(all_products, snapshot_dir=snapshot_dir, rows=rows)
+    except ImportError as e:
+        print(f"[WARNING] No snapshot written: {e}")
+
+    # Only what changed since the last export goes to Supabase
+    with metrics.stage('export'):
+        export_delta(rows)
+
+    # Read-only snapshot for fast local lookups (catalogue.Catalogue)
+    with metrics.stage('catalogue'):
+        write_catalogue(rows)
+
+    # Ingredient -> product index loaded by the backend's shopping-list matcher
+    with metrics.stage('index'):
+        ProductIndex.build(rows).save("product_index.json")
+
+    # Same product across supermarkets, with cluster IDs kept between crawls
+    products = [p for items in records.values() for p in items]
+    clusters = ClusterStore("product_clusters.json")
+    with metrics.stage('match'):
+        matched = clusters.assign(match_products(products), products)
+    print(f"[OK] Matched {sum(len(m) for m in matched.values())} products into {len(matched)} cross-supermarket clusters")
+    clusters.save()
+
+    # Display comparison, and keep the full table for later analysis; price
+    # gaps only compare products matched in this crawl
+    assignments = {ClusterStore.key(p): cluster_id for cluster_id, members in matched.items() for p in members}
+    report = display_price_comparison(all_products, assignments, rows, records)
+    save_report(report, "price_report.json")
+
+    print("\n" + metrics.format_summary())
+    for exporter in exporters:
+        exporter.stop()
+    metrics.close()
+    if memory:
+        memory.stop()
+    print("[OK] Request and stage log saved to: crawl_log.ndjson")
 
     print("\n" + "="*70)
     print("Scraping Complete!")
     print("="*70)
     print("\nNext Steps:")
     print("1. Check all_supermarkets_products.json for complete data")
-    print("2. Integrate this data into your meal planning database")
-    print("3. Build price comparison features in your app")
+    print("2. Import the changes: npm run import:products -- poc/supermarket_products.delta.ndjson")
+    print("   (the export state advances once it succeeds; until then the next crawl exports these changes again)")
+    print("   (first run or full reload: npm run import:products -- poc/all_supermarkets_products.ndjson)")
+    print("3. Query products.db locally (python product_store.py) or build price comparison features")
     print("4. Schedule daily scraping to keep prices updated")
 
 
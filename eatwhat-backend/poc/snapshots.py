@@ -0,0 +1,269 @@
+"""
+Columnar Catalogue Snapshots (Parquet / Arrow)
+Writes supermarket_products rows as a columnar dataset partitioned by
+supermarket and crawl date, so readers load only the columns and partitions
+they need
+
+Layout:
+    snapshots/supermarket_brand=Coles/crawl_date=2026-01-24/part-0.parquet
+
+Requirements:
+    pip install pyarrow
+
+Usage:
+    python snapshots.py [supermarket_products.json] [snapshots]
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    ds = None
+
+from compression import open_input
+from normalize import SUPERMARKET_PRODUCT_COLUMNS
+
+
+# File extension per supported format
+FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}
+
+PARTITION_COLUMNS = ('supermarket_brand', 'crawl_date')
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Columnar snapshots need pyarrow: pip install pyarrow")
+
+
+def snapshot_schema():
+    """Arrow schema for supermarket_products rows (partition columns excluded)"""
+    _require_pyarrow()
+    price = pa.decimal128(10, 2)
+    return pa.schema([
+        ('product_id', pa.string()),
+        ('name', pa.string()),
+        ('category', pa.dictionary(pa.int32(), pa.string())),
+        ('brand', pa.dictionary(pa.int32(), pa.string())),
+        ('size', pa.string()),
+        ('image_url', pa.string()),
+        ('current_price', price),
+        ('original_price', price),
+        ('is_on_sale', pa.bool_()),
+        ('discount_percentage', pa.int16()),
+        ('sale_end_date', pa.string()),
+        ('scraped_at', pa.string()),
+    ])
+
+
+def _price(value) -> Optional[Decimal]:
+    """Row price (exact 2dp float) to Decimal for the decimal128 column"""
+    if value is None:
+        return None
+    return Decimal(repr(value)).quantize(Decimal('0.01'))
+
+
+def _partition_table(rows: List[Dict]):
+    """Build one Arrow table from rows that share a partition"""
+    schema = snapshot_schema()
+    columns = {}
+    for field in schema:
+        values = [row[field.name] for row in rows]
+        if field.name in ('current_price', 'original_price'):
+            values = [_price(v) for v in values]
+        columns[field.name] = pa.array(values, type=field.type)
+    return pa.table(columns, schema=schema)
+
+
+def partition_path(root: str, supermarket_brand: str, crawl_date: str, file_format: str = 'parquet') -> str:
+    """Path of the file holding one supermarket's products for one crawl date"""
+    return os.path.join(
+        root,
+        f"supermarket_brand={supermarket_brand}",
+        f"crawl_date={crawl_date}",
+        f"part-0.{FORMATS[file_format]}",
+    )
+
+
+def crawl_date_of(rows: Sequence[Dict]) -> str:
+    """UTC date (YYYY-MM-DD) of the latest scraped_at in the rows, today if there are none"""
+    scraped_at = [datetime.fromisoformat(row['scraped_at']) for row in rows if row.get('scraped_at')]
+    latest = max(scraped_at, default=None, key=lambda t: t.timestamp())
+    if latest is None:
+        return datetime.now(timezone.utc).date().isoformat()
+    if latest.tzinfo is not None:
+        latest = latest.astimezone(timezone.utc)
+    return latest.date().isoformat()
+
+
+def write_snapshot(rows: Sequence[Dict], root: str = "snapshots", crawl_date: Optional[str] = None,
+                   file_format: str = 'parquet') -> List[str]:
+    """
+    Write supermarket_products rows as a partitioned columnar snapshot
+
+    Re-running a crawl on the same date replaces that date's partitions:
+    those of supermarkets missing from the rows (e.g. a store whose scrape
+    failed) are removed once the new ones are written, so the date never
+    mixes two crawls.
+
+    Args:
+        rows: Rows as produced by normalize.to_rows
+        root: Dataset directory
+        crawl_date: YYYY-MM-DD partition value, defaults to the UTC date
+                    the rows were scraped
+        file_format: 'parquet' (compressed, best for analytics) or 'arrow'
+                     (Arrow IPC, memory-mappable, fastest to read)
+
+    Returns:
+        Paths of the files written
+    """
+    _require_pyarrow()
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown snapshot format: {file_format!r}")
+    crawl_date = crawl_date or crawl_date_of(rows)
+
+    partitions: Dict[str, List[Dict]] = {}
+    for row in rows:
+        partitions.setdefault(row['supermarket_brand'], []).append(row)
+
+    written = []
+    for supermarket_brand, partition_rows in sorted(partitions.items()):
+        path = partition_path(root, supermarket_brand, crawl_date, file_format)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = _partition_table(partition_rows)
+        tmp_path = path + '.tmp'
+        if file_format == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(table, tmp_path, compression='zstd')
+        else:
+            import pyarrow.feather as feather
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+        written.append(path)
+
+    stale = [path for path in _date_partitions(root, crawl_date, file_format) if path not in written]
+    for path in stale:
+        os.remove(path)
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass  # other files (e.g. the other format) remain
+
+    removed = f" (removed {len(stale)} stale)" if stale else ""
+    print(f"[OK] Wrote {len(rows)} products to {len(written)} snapshot partitions under: {root}{removed}")
+    return written
+
+
+def _date_partitions(root: str, crawl_date: str, file_format: str) -> List[str]:
+    """Existing files of every supermarket for one crawl date"""
+    if not os.path.isdir(root):
+        return []
+    paths = []
+    for supermarket_dir in sorted(os.listdir(root)):
+        if not supermarket_dir.startswith('supermarket_brand='):
+            continue
+        path = partition_path(root, supermarket_dir.split('=', 1)[1], crawl_date, file_format)
+        if os.path.exists(path):
+            paths.append(path)
+    return paths
+
+
+def open_snapshot(root: str = "snapshots", file_format: str = 'parquet'):
+    """Open the snapshot directory as a lazily-read pyarrow Dataset"""
+    _require_pyarrow()
+    return ds.dataset(
+        root,
+        format='parquet' if file_format == 'parquet' else 'ipc',
+        partitioning='hive',
+        exclude_invalid_files=True,
+    )
+
+
+def read_snapshot(root: str = "snapshots", columns: Optional[Sequence[str]] = None,
+                  supermarkets: Optional[Sequence[str]] = None, crawl_dates: Optional[Sequence[str]] = None,
+                  file_format: str = 'parquet'):
+    """
+    Read selected columns and partitions of a snapshot
+
+    Partition filters are applied to directory names, so files of other
+    supermarkets and dates are never opened; unselected columns are never
+    decoded.
+
+    Args:
+        root: Dataset directory
+        columns: Columns to load (partition columns may be included), default all
+        supermarkets: supermarket_brand values to include, default all
+        crawl_dates: YYYY-MM-DD dates to include, default all
+
+    Returns:
+        pyarrow.Table
+    """
+    dataset = open_snapshot(root, file_format)
+    condition = None
+    if supermarkets:
+        condition = ds.field('supermarket_brand').isin(list(supermarkets))
+    if crawl_dates:
+        date_condition = ds.field('crawl_date').isin(list(crawl_dates))
+        condition = date_condition if condition is None else condition & date_condition
+    return dataset.to_table(columns=list(columns) if columns else None, filter=condition)
+
+
+def latest_crawl_date(root: str = "snapshots") -> Optional[str]:
+    """Most recent crawl_date partition in the snapshot, from directory names only"""
+    dates = set()
+    if not os.path.isdir(root):
+        return None
+    for supermarket_dir in os.listdir(root):
+        path = os.path.join(root, supermarket_dir)
+        if os.path.isdir(path):
+            dates.update(d.split('=', 1)[1] for d in os.listdir(path) if d.startswith('crawl_date='))
+    return max(dates) if dates else None
+
+
+def read_rows(root: str = "snapshots", crawl_date: Optional[str] = None,
+              file_format: str = 'parquet') -> List[Dict]:
+    """
+    Read one crawl back as supermarket_products rows (e.g. for the importer)
+
+    Args:
+        crawl_date: Date to read, defaults to the latest in the snapshot
+    """
+    crawl_date = crawl_date or latest_crawl_date(root)
+    if crawl_date is None:
+        return []
+    table = read_snapshot(root, crawl_dates=[crawl_date], file_format=file_format)
+    rows = []
+    for record in table.to_pylist():
+        row = {column: record.get(column) for column in SUPERMARKET_PRODUCT_COLUMNS}
+        for column in ('current_price', 'original_price'):
+            if row[column] is not None:
+                row[column] = float(row[column])
+        rows.append(row)
+    return rows
+
+
+def main():
+    """Convert a supermarket_products.json row file into a Parquet snapshot"""
+    source = sys.argv[1] if len(sys.argv) > 1 else "supermarket_products.json"
+    root = sys.argv[2] if len(sys.argv) > 2 else "snapshots"
+
+    with open_input(source) as f:
+        rows = json.load(f)
+
+    crawl_date = crawl_date_of(rows)
+    write_snapshot(rows, root, crawl_date)
+
+    table = read_snapshot(root, columns=['supermarket_brand', 'name', 'current_price'],
+                          supermarkets=['Coles'], crawl_dates=[crawl_date])
+    print(f"Read back {table.num_rows} Coles rows, columns: {table.column_names}")
+
+
+if __name__ == "__main__":
+    main()
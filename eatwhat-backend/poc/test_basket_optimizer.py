@@ -0,0 +1,92 @@
+"""Candidate scoring and line costing of basket_optimizer"""
+
+import math
+
+import pytest
+
+from basket_optimizer import MATE_SCORE_FACTOR, BasketOptimizer, ShoppingItem, line_cost, pack_size
+from product import Product, Supermarket, Unit
+from unit_prices import BASE_EACH, BASE_KG, BASE_L
+
+
+def product(supermarket, product_id, name, price_cents, unit, unit_price_cents, unit_measure, size=None):
+    return Product(supermarket=supermarket, product_id=product_id, name=name, price_cents=price_cents,
+                   unit=unit, unit_price_cents=unit_price_cents, unit_measure=unit_measure, size=size)
+
+
+WOOLWORTHS_EACH = product(Supermarket.WOOLWORTHS, '135344', 'Carrot Fresh each', 35, Unit.EACH, 35, '1EA', 'each')
+COLES_BAG = product(Supermarket.COLES, '9006560', 'Carrots', 170, Unit.KG, 170, '1kg', '1Kg')
+COLES_LOOSE = product(Supermarket.COLES, '4223335', 'Carrots Loose', 44, Unit.KG, 260, '1kg', 'approx. 170g')
+COLES_ROOTS = product(Supermarket.COLES, '1', 'Dutch Bunch Orange Roots', 300, Unit.EACH, 300, '1EA', 'each')
+
+
+def key(p):
+    return f"{p.supermarket.value}\t{p.product_id}"
+
+
+def candidate_scores(optimizer, name):
+    return {optimizer.products[i].name: score for i, score in optimizer.candidates(name)}
+
+
+def test_cluster_mate_does_not_outscore_direct_matches_at_its_store():
+    # Loose carrots are clustered with the Woolworths item that matches "Carrot" best
+    assignments = {key(WOOLWORTHS_EACH): 1, key(COLES_LOOSE): 1}
+    optimizer = BasketOptimizer([WOOLWORTHS_EACH, COLES_BAG, COLES_LOOSE], assignments)
+
+    scores = candidate_scores(optimizer, 'Carrot')
+    assert scores['Carrots Loose'] <= scores['Carrots']
+
+    basket = optimizer.optimize([ShoppingItem('Carrot', 1, 'kg')], allowed_stores=['Coles'])
+    assert [line.product.name for line in basket.lines] == ['Carrots']
+    assert basket.total_cents == 170
+
+
+def test_mate_found_only_through_its_cluster_is_discounted():
+    assignments = {key(WOOLWORTHS_EACH): 1, key(COLES_ROOTS): 1}
+    optimizer = BasketOptimizer([WOOLWORTHS_EACH, COLES_ROOTS], assignments)
+
+    scores = candidate_scores(optimizer, 'Carrot')
+    assert 'Carrots' not in scores
+    assert scores['Dutch Bunch Orange Roots'] == pytest.approx(scores['Carrot Fresh each'] * MATE_SCORE_FACTOR)
+
+
+def test_mate_score_is_capped_by_its_store_best_direct_match():
+    assignments = {key(WOOLWORTHS_EACH): 1, key(COLES_ROOTS): 1}
+    optimizer = BasketOptimizer([WOOLWORTHS_EACH, COLES_ROOTS, COLES_LOOSE], assignments)
+
+    scores = candidate_scores(optimizer, 'Carrot')
+    assert scores['Dutch Bunch Orange Roots'] <= scores['Carrots Loose']
+
+
+def test_weight_need_buys_whole_packs():
+    optimizer = BasketOptimizer([COLES_BAG])
+    amount, cost = line_cost(COLES_BAG, (BASE_KG, 1.5), pack_size(COLES_BAG), optimizer.unit_prices[0])
+    assert (amount, cost) == (2.0, 340)
+
+
+def test_weight_need_on_items_sold_each_uses_the_item_weight():
+    # $3.00 each at $12.00/kg: one item weighs 250 g
+    melon = product(Supermarket.ALDI, 'm', 'Rockmelon', 300, Unit.EACH, 1200, '1kg')
+    optimizer = BasketOptimizer([melon])
+    amount, cost = line_cost(melon, (BASE_KG, 0.6), pack_size(melon), optimizer.unit_prices[0])
+    assert (amount, cost) == (3.0, 900)
+
+
+def test_weight_need_on_items_without_a_weight_is_not_comparable():
+    optimizer = BasketOptimizer([WOOLWORTHS_EACH])
+    amount, cost = line_cost(WOOLWORTHS_EACH, (BASE_KG, 1.0), pack_size(WOOLWORTHS_EACH),
+                             optimizer.unit_prices[0])
+    assert cost == math.inf
+
+
+def test_volume_need_is_not_met_by_a_weight():
+    optimizer = BasketOptimizer([COLES_BAG])
+    _, cost = line_cost(COLES_BAG, (BASE_L, 1.0), pack_size(COLES_BAG), optimizer.unit_prices[0])
+    assert cost == math.inf
+
+
+def test_count_need_buys_that_many_items():
+    optimizer = BasketOptimizer([WOOLWORTHS_EACH])
+    amount, cost = line_cost(WOOLWORTHS_EACH, (BASE_EACH, 3), pack_size(WOOLWORTHS_EACH),
+                             optimizer.unit_prices[0])
+    assert (amount, cost) == (3.0, 105)
@@ -0,0 +1,92 @@
+"""Regression gate of bench_compare on synthetic parser_bench results"""
+
+import random
+
+from bench_compare import compare_results, holm
+from parser_bench import RESULTS_VERSION
+
+
+def document(times_by_benchmark, repeats=10):
+    return {
+        'version': RESULTS_VERSION,
+        'environment': {'python': '3.12', 'machine': 'x86_64', 'repeats': repeats, 'sizes': [1000]},
+        'results': [{'benchmark': name, 'load': 'synthetic-1000', 'times_s': times, 'peak_memory_bytes': 1000}
+                    for name, times in times_by_benchmark.items()],
+    }
+
+
+def noisy(rng, base_s, repeats=10, noise=0.2):
+    """Run times around base_s, a few of them slowed down by machine load"""
+    return [base_s * (1 + rng.random() * noise) for _ in range(repeats)]
+
+
+def statuses(comparisons):
+    return {c['benchmark']: c['status'] for c in comparisons}
+
+
+def test_holm_tightens_the_smallest_p_value():
+    assert holm({'a': 0.01, 'b': 0.2, 'c': 0.5}) == {'a'}
+    assert holm({'a': 0.02, 'b': 0.03, 'c': 0.04}) == set()
+    assert holm({'a': 0.001, 'b': 0.02, 'c': 0.5}) == {'a', 'b'}
+
+
+def test_unchanged_code_reports_no_regressions():
+    for seed in range(5):
+        rng = random.Random(seed)
+        bases = {f'bench{i}': 0.01 * (i + 1) for i in range(18)}
+        baseline = document({name: noisy(rng, base) for name, base in bases.items()})
+        current = document({name: noisy(rng, base) for name, base in bases.items()})
+        comparisons, warnings = compare_results(baseline, current)
+        assert set(statuses(comparisons).values()) == {'same'}, seed
+        assert warnings == []
+
+
+def test_clear_slowdown_is_flagged():
+    rng = random.Random(1)
+    baseline = document({'slow': noisy(rng, 0.05), 'steady': noisy(rng, 0.05)})
+    current = document({'slow': noisy(rng, 0.075), 'steady': noisy(rng, 0.05)})
+    comparisons, _ = compare_results(baseline, current)
+    assert statuses(comparisons) == {'slow': 'slower', 'steady': 'same'}
+
+
+def test_clear_speedup_is_reported():
+    rng = random.Random(2)
+    baseline = document({'fast': noisy(rng, 0.05)})
+    current = document({'fast': noisy(rng, 0.03)})
+    comparisons, _ = compare_results(baseline, current)
+    assert statuses(comparisons) == {'fast': 'faster'}
+
+
+def test_slower_median_with_unchanged_minimum_is_noise():
+    baseline = document({'bench': [0.050] * 10})
+    current = document({'bench': [0.050] * 4 + [0.065] * 6})
+    comparisons, _ = compare_results(baseline, current)
+    assert comparisons[0]['change_pct'] == 30.0
+    assert comparisons[0]['min_change_pct'] == 0.0
+    assert comparisons[0]['status'] == 'same'
+
+
+def test_slowdown_below_the_absolute_floor_is_noise():
+    baseline = document({'bench': [0.0004 + i * 1e-6 for i in range(10)]})
+    current = document({'bench': [0.0008 + i * 1e-6 for i in range(10)]})
+    comparisons, _ = compare_results(baseline, current)
+    assert comparisons[0]['status'] == 'same'
+
+
+def test_too_few_repeats_for_the_corrected_test_are_warned_about():
+    rng = random.Random(3)
+    names = [f'bench{i}' for i in range(18)]
+    baseline = document({name: noisy(rng, 0.05, repeats=5) for name in names}, repeats=5)
+    current = document({name: noisy(rng, 0.10, repeats=5) for name in names}, repeats=5)
+    comparisons, warnings = compare_results(baseline, current)
+    assert set(statuses(comparisons).values()) == {'same'}
+    assert warnings == ["5 repeats cannot show a significant change across 18 benchmarks; "
+                        "run parser_bench.py with more repeats"]
+
+
+def test_memory_growth_is_flagged_separately():
+    baseline = document({'bench': [0.05] * 10})
+    current = document({'bench': [0.05] * 10})
+    current['results'][0]['peak_memory_bytes'] = 1500
+    comparisons, _ = compare_results(baseline, current)
+    assert comparisons[0]['status'] == 'memory'
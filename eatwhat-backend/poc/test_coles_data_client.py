@@ -0,0 +1,55 @@
+"""Data route use and buildId caching of coles_data_client under replay"""
+
+import json
+import os
+
+from coles_data_client import ColesDataClient
+from replay import replay_session
+
+POC_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = os.path.join(POC_DIR, 'replay_manifest.json')
+LIVE_CACHE = {'https://www.coles.com.au': {'build_id': 'live', 'page': '/search/products', 'locale': 'en',
+                                           'discovered_at': '2026-10-01T00:00:00+00:00'}}
+
+
+def search_page_manifest(tmp_path):
+    """Manifest replaying the Coles search page only"""
+    with open(MANIFEST, encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['responses'] = [dict(e, file=os.path.join(POC_DIR, e['file'])) for e in manifest['responses']
+                             if e['url'] == 'https://www.coles.com.au/search?q=vegetables']
+    path = tmp_path / 'replay_manifest.json'
+    path.write_text(json.dumps(manifest), encoding='utf-8')
+    return str(path)
+
+
+def write_cache(tmp_path):
+    path = tmp_path / 'coles_build_id.json'
+    path.write_text(json.dumps(LIVE_CACHE), encoding='utf-8')
+    return path
+
+
+def test_offline_crawl_uses_the_recorded_data_route(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = ColesDataClient(replay_session(MANIFEST), build_id_cache=str(write_cache(tmp_path)))
+
+    products = client.search_products('vegetables')
+
+    assert len(products) == 48
+    assert client.fetches == {'data': 1, 'html': 0, 'refreshes': 0}
+    assert client.route['build_id'].startswith('20260121.4-')
+
+
+def test_replayed_search_page_leaves_the_build_id_cache_untouched(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = write_cache(tmp_path)
+    before = cache.read_bytes()
+    client = ColesDataClient(replay_session(search_page_manifest(tmp_path)), build_id_cache=str(cache))
+
+    products = client.search_products('vegetables')
+
+    assert len(products) == 48
+    assert client.fetches['html'] == 1
+    # Learned from the captured page, kept in memory only
+    assert client.route['build_id'].startswith('20260121.4-')
+    assert cache.read_bytes() == before
@@ -0,0 +1,58 @@
+"""Scraper log messages as crawl_metrics events"""
+
+import json
+
+import requests
+
+from aldi_scraper_final import AldiScraper
+from coles_data_client import ColesDataClient
+from crawl_metrics import CrawlMetrics, instrument_scraper
+
+
+def events(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_scraper_messages_become_log_events_of_the_store(tmp_path, capsys):
+    log_path = tmp_path / 'crawl_log.ndjson'
+    metrics = CrawlMetrics(str(log_path), echo=True)
+    aldi = instrument_scraper(AldiScraper(requests.Session()), metrics)
+    tile = '<div class="product-tile" title="Carrots"><span class="price">$1</span></div>'
+    with metrics.stage('scrape', store='aldi'):
+        aldi._extract_products_from_html(tile)
+        aldi.save_to_json([], str(tmp_path / 'aldi.json'))
+    metrics.close()
+
+    logged = [e for e in events(log_path) if e['event'] == 'log']
+    assert [(e['store'], e['level'], e['logger']) for e in logged] == [('aldi', 'info', 'aldi_scraper_final')]
+    assert logged[0]['message'].startswith('Saved 0 products')
+    # Progress goes to the crawl log only
+    assert 'Saved 0 products' not in capsys.readouterr().out
+
+
+def test_warnings_are_echoed_only_when_the_metrics_echo(tmp_path, capsys):
+    for echo in (True, False):
+        metrics = CrawlMetrics(str(tmp_path / f'{echo}.ndjson'), echo=echo)
+        coles = instrument_scraper(ColesDataClient(requests.Session(), build_id_cache=None), metrics)
+        with metrics.stage('scrape', store='coles'):
+            coles._extract_from_nextjs_data({'props': {'pageProps': {'products': [None]}}})
+        metrics.close()
+
+        levels = [e['level'] for e in events(tmp_path / f'{echo}.ndjson') if e['event'] == 'log']
+        assert levels == ['warning']
+        out = capsys.readouterr().out
+        assert ('[WARNING] coles: Failed to normalize product' in out) is echo
+
+
+def test_closed_metrics_stop_capturing(tmp_path):
+    first = CrawlMetrics(str(tmp_path / 'first.ndjson'))
+    aldi = instrument_scraper(AldiScraper(requests.Session()), first)
+    first.close()
+    second = CrawlMetrics(str(tmp_path / 'second.ndjson'))
+    instrument_scraper(aldi, second)
+    aldi.save_to_json([], str(tmp_path / 'aldi.json'))
+    second.close()
+
+    assert [e['event'] for e in events(tmp_path / 'first.ndjson')] == ['summary']
+    assert [e['event'] for e in events(tmp_path / 'second.ndjson')] == ['log', 'summary']
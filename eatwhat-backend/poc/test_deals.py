@@ -0,0 +1,97 @@
+"""Incremental deal detection of deals.DealEngine"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from deals import DealEngine
+from product_store import ProductStore
+
+
+def week(n: int) -> str:
+    return (datetime(2026, 1, 1, 6, tzinfo=timezone.utc) + timedelta(weeks=n)).isoformat(timespec='seconds')
+
+
+@pytest.fixture
+def store():
+    with ProductStore(':memory:') as store:
+        yield store
+
+
+def crawl(store, engine, *rows):
+    store.upsert_rows(rows)
+    return engine.update()
+
+
+def deal_prices(engine):
+    return {d['product_id']: (d['price_cents'], d['reference_cents'], d['source']) for d in engine.deals()}
+
+
+def test_reported_sale_is_a_deal(store, make_row):
+    engine = DealEngine(store)
+    crawl(store, engine, make_row('a', 3.00, week(0), supermarket_brand='Coles', original_price=4.00,
+                                  is_on_sale=True, discount_percentage=25))
+
+    assert deal_prices(engine) == {'a': (300, 400, 'reported')}
+    assert engine.deals()[0]['depth_pct'] == 25.0
+
+
+def test_price_drop_below_the_regular_price_is_inferred(store, make_row):
+    engine = DealEngine(store)
+    crawl(store, engine, make_row('a', 4.00, week(0)), make_row('b', 2.00, week(0)))
+    # b drops by under MIN_INFERRED_DROP_PCT
+    crawl(store, engine, make_row('a', 3.00, week(1)), make_row('b', 1.95, week(1)))
+
+    assert deal_prices(engine) == {'a': (300, 400, 'inferred')}
+
+
+def test_only_changed_products_are_re_evaluated(store, make_row):
+    engine = DealEngine(store)
+    assert crawl(store, engine, make_row('a', 4.00, week(0)), make_row('b', 2.00, week(0)))['processed'] == 2
+    assert crawl(store, engine, make_row('a', 3.00, week(1)), make_row('b', 2.00, week(1)))['processed'] == 1
+    assert crawl(store, engine, make_row('a', 3.00, week(2)), make_row('b', 2.00, week(2)))['processed'] == 0
+
+
+def test_deal_ends_when_the_price_goes_back_up(store, make_row):
+    engine = DealEngine(store)
+    crawl(store, engine, make_row('a', 4.00, week(0)))
+    crawl(store, engine, make_row('a', 3.00, week(1)))
+    crawl(store, engine, make_row('a', 4.00, week(2)))
+
+    assert deal_prices(engine) == {}
+
+
+def test_inferred_deal_ends_when_its_reference_ages_out(store, make_row):
+    engine = DealEngine(store)
+    crawl(store, engine, make_row('a', 4.00, week(0)))
+    crawl(store, engine, make_row('a', 3.00, week(1)))
+    crawl(store, engine, make_row('a', 3.00, week(8)))
+    assert deal_prices(engine) == {'a': (300, 400, 'inferred')}
+
+    # Unchanged price, but $4.00 was last seen over REGULAR_PRICE_WEEKS ago
+    counts = crawl(store, engine, make_row('a', 3.00, week(10)))
+    assert counts['processed'] == 1
+    assert deal_prices(engine) == {}
+
+
+def test_deal_is_dropped_off_the_shelf_and_restored_on_return(store, make_row):
+    engine = DealEngine(store)
+    crawl(store, engine, make_row('a', 4.00, week(0)), make_row('b', 2.00, week(0)))
+    crawl(store, engine, make_row('a', 3.00, week(1)), make_row('b', 2.00, week(1)))
+
+    counts = crawl(store, engine, make_row('b', 2.00, week(2)))
+    assert counts['expired'] == 1
+    assert deal_prices(engine) == {}
+
+    # Back at the same price: no history change, re-checked all the same
+    crawl(store, engine, make_row('a', 3.00, week(3)), make_row('b', 2.00, week(3)))
+    assert deal_prices(engine) == {'a': (300, 400, 'inferred')}
+
+
+def test_continuing_deal_keeps_its_start(store, make_row):
+    engine = DealEngine(store)
+    crawl(store, engine, make_row('a', 4.00, week(0)))
+    crawl(store, engine, make_row('a', 3.00, week(1)))
+    crawl(store, engine, make_row('a', 2.50, week(2)))
+
+    assert [d['started_at'] for d in engine.deals()] == [week(1)]
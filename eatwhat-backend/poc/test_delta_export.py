@@ -0,0 +1,75 @@
+"""Crawl diffing and import confirmation of delta_export"""
+
+import json
+
+import pytest
+
+from delta_export import confirm_import, diff_rows, export_delta, load_state, pending_path, row_key
+
+
+def ops(operations):
+    return sorted((op['op'], op['product_id']) for op in operations)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'supermarket_products.delta.ndjson'), str(tmp_path / 'export_state.json.gz')
+
+
+def read_delta(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_diff_reports_inserts_updates_and_deletes(make_row):
+    _, previous = diff_rows({}, [make_row('a', 1.00), make_row('b', 2.00), make_row('c', 3.00)])
+    operations, state = diff_rows(previous, [
+        make_row('a', 1.00, '2026-01-02T00:00:00+00:00'),
+        make_row('b', 2.50),
+        make_row('d', 4.00),
+    ])
+
+    assert ops(operations) == [('delete', 'c'), ('insert', 'd'), ('update', 'b')]
+    assert sorted(state) == [row_key(make_row(p, 0)) for p in ('a', 'b', 'd')]
+
+
+def test_crawl_timestamp_alone_is_not_a_change(make_row):
+    _, previous = diff_rows({}, [make_row('a', 1.00, '2026-01-01T00:00:00+00:00')])
+    operations, _ = diff_rows(previous, [make_row('a', 1.00, '2026-01-08T00:00:00+00:00')])
+    assert operations == []
+
+
+def test_supermarket_missing_from_the_crawl_is_not_deleted(make_row):
+    _, previous = diff_rows({}, [make_row('a', 1.00), make_row('w', 2.00, supermarket_brand='Woolworths')])
+    operations, state = diff_rows(previous, [make_row('a', 1.00)])
+
+    assert operations == []
+    assert state == previous
+
+
+def test_state_advances_only_after_the_import_is_confirmed(paths, make_row):
+    delta, state = paths
+    export_delta([make_row('a', 1.00)], delta, state)
+    assert load_state(state) == {}
+
+    # Not imported yet: the next crawl exports the same insert again
+    export_delta([make_row('a', 1.00)], delta, state)
+    assert [op['op'] for op in read_delta(delta)] == ['insert']
+
+    assert confirm_import(delta, state)
+    assert list(load_state(state)) == [row_key(make_row('a', 0))]
+    export_delta([make_row('a', 1.00)], delta, state)
+    assert read_delta(delta) == []
+
+
+def test_confirming_another_delta_does_not_advance_the_state(paths, tmp_path, make_row):
+    delta, state = paths
+    export_delta([make_row('a', 1.00)], delta, state)
+
+    assert not confirm_import(str(tmp_path / 'older.delta.ndjson'), state)
+    assert load_state(state) == {}
+    assert not confirm_import(delta, str(tmp_path / 'missing_state.json.gz'))
+
+
+def test_pending_state_sits_next_to_the_state():
+    assert pending_path('/data/export_state.json.gz') == '/data/export_state.pending.json.gz'
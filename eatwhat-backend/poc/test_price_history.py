@@ -0,0 +1,69 @@
+"""Append-only price history recorded by the product store triggers"""
+
+import sqlite3
+
+import pytest
+
+from price_history import changes_since, price_series
+from product_store import ProductStore
+
+T1 = '2026-01-01T06:00:00+00:00'
+T2 = '2026-01-02T06:00:00+00:00'
+
+
+@pytest.fixture
+def store():
+    with ProductStore(':memory:') as store:
+        yield store
+
+
+def series(store, product_id='a'):
+    return [(run['valid_from'], run['price_cents'], run['change_cents'])
+            for run in price_series(store.conn, 'ALDI', product_id, weeks=None)]
+
+
+def test_first_sighting_opens_a_run(store, make_row):
+    store.upsert_rows([make_row('a', 4.50, T1)])
+    assert series(store) == [(T1, 450, None)]
+
+
+def test_only_price_changes_append_runs(store, make_row):
+    store.upsert_rows([make_row('a', 4.50, T1)])
+    store.upsert_rows([make_row('a', 4.50, T2, name='Renamed')])
+    assert series(store) == [(T1, 450, None)]
+
+    store.upsert_rows([make_row('a', 3.50, T2, original_price=4.50, is_on_sale=True, discount_percentage=22)])
+    assert series(store) == [(T1, 450, None), (T2, 350, -100)]
+    assert price_series(store.conn, 'ALDI', 'a', weeks=None)[0]['valid_to'] == T2
+
+
+def test_second_change_in_the_same_crawl_reopens_the_run(store, make_row):
+    store.upsert_rows([make_row('a', 4.50, T1)])
+    # The same product on three pages of one crawl, all stamped T2
+    store.upsert_rows([make_row('a', 4.00, T2)])
+    store.upsert_rows([make_row('a', 3.50, T2)])
+    store.upsert_rows([make_row('a', 3.00, T2)])
+
+    assert series(store) == [
+        (T1, 450, None),
+        (T2, 400, -50),
+        ('2026-01-02T06:00:00.000001+00:00', 350, -50),
+        ('2026-01-02T06:00:00.000002+00:00', 300, -50),
+    ]
+    assert store.get('ALDI', 'a')['current_price'] == 3.00
+    assert [c['price_cents'] for c in changes_since(store.conn, T1)] == [400, 350, 300]
+
+
+def test_same_crawl_changes_of_other_products_do_not_interfere(store, make_row):
+    store.upsert_rows([make_row('a', 4.50, T1), make_row('b', 2.00, T1)])
+    store.upsert_rows([make_row('a', 4.00, T2), make_row('b', 1.50, T2)])
+    assert series(store, 'a')[-1] == (T2, 400, -50)
+    assert series(store, 'b')[-1] == (T2, 150, -50)
+
+
+def test_history_rows_cannot_be_changed(store, make_row):
+    store.upsert_rows([make_row('a', 4.50, T1)])
+    with pytest.raises(sqlite3.IntegrityError, match='append-only'):
+        store.conn.execute("UPDATE price_history SET price_cents = 1")
+    with pytest.raises(sqlite3.IntegrityError, match='append-only'):
+        store.conn.execute("DELETE FROM price_history")
@@ -0,0 +1,87 @@
+"""Matching thresholds and persistent cluster IDs of product_matcher"""
+
+from product import Product, Supermarket
+from product_matcher import ClusterStore, match_products, size_token, tokens
+
+
+def product(supermarket, product_id, name, size=None, barcode=None):
+    return Product(supermarket=supermarket, product_id=product_id, name=name, price_cents=100,
+                   size=size, barcode=barcode)
+
+
+def names(clusters):
+    return sorted(sorted(p.name for p in members) for members in clusters)
+
+
+def test_size_is_not_a_matching_token():
+    mixed = product(Supermarket.WOOLWORTHS, '1', 'Woolworths Carrots Peas & Corn 1kg')
+    assert tokens(mixed) == {'carrot', 'pea', 'corn'}
+    assert size_token(mixed) == 'size:1kg'
+
+
+def test_shared_size_does_not_make_different_products_match():
+    clusters = match_products([
+        product(Supermarket.WOOLWORTHS, '1', 'Woolworths Carrots Peas & Corn 1kg'),
+        product(Supermarket.COLES, '2', 'Coles Carrots 1kg'),
+    ])
+    assert clusters == []
+
+
+def test_same_name_and_size_match_across_supermarkets():
+    clusters = match_products([
+        product(Supermarket.WOOLWORTHS, '1', 'Woolworths Baby Carrots 500g'),
+        product(Supermarket.COLES, '2', 'Coles Baby Carrots 500g'),
+        product(Supermarket.ALDI, '3', 'Baby Carrots', size='500g'),
+    ])
+    assert names(clusters) == [['Baby Carrots', 'Coles Baby Carrots 500g', 'Woolworths Baby Carrots 500g']]
+
+
+def test_different_sizes_never_match():
+    clusters = match_products([
+        product(Supermarket.WOOLWORTHS, '1', 'Woolworths Baby Carrots 500g'),
+        product(Supermarket.COLES, '2', 'Coles Baby Carrots 1kg'),
+    ])
+    assert clusters == []
+
+
+def test_barcode_matches_regardless_of_name():
+    clusters = match_products([
+        product(Supermarket.WOOLWORTHS, '1', 'Brushed Potatoes 2kg', barcode='09300000000001'),
+        product(Supermarket.COLES, '2', 'Washed Spuds', barcode='9300000000001'),
+    ])
+    assert names(clusters) == [['Brushed Potatoes 2kg', 'Washed Spuds']]
+
+
+def test_one_product_per_supermarket_in_a_cluster():
+    clusters = match_products([
+        product(Supermarket.WOOLWORTHS, '1', 'Red Onions 1kg'),
+        product(Supermarket.WOOLWORTHS, '2', 'Red Onion 1kg'),
+        product(Supermarket.COLES, '3', 'Red Onions 1kg'),
+    ])
+    assert len(clusters) == 1
+    assert len({p.supermarket for p in clusters[0]}) == len(clusters[0]) == 2
+
+
+def test_cluster_ids_are_stable_and_stale_members_pruned(tmp_path):
+    w1, c1, a1 = (product(Supermarket.WOOLWORTHS, 'w1', 'x'), product(Supermarket.COLES, 'c1', 'x'),
+                  product(Supermarket.ALDI, 'a1', 'x'))
+    w2, c2 = product(Supermarket.WOOLWORTHS, 'w2', 'y'), product(Supermarket.COLES, 'c2', 'y')
+    store = ClusterStore(str(tmp_path / 'clusters.json'))
+
+    first = store.assign([[w1, c1, a1], [w2, c2]], [w1, c1, a1, w2, c2])
+    store.save()
+    assert sorted(first) == [1, 2]
+
+    store = ClusterStore(str(tmp_path / 'clusters.json'))
+    second = store.assign([[w1, c1]], [w1, c1, a1, c2])
+    # w1/c1 keep their ID; a1 and c2 matched nothing; w2 was not crawled and keeps its ID
+    assert list(second) == [1]
+    assert store.assignments == {'Woolworths\tw1': 1, 'Coles\tc1': 1, 'Woolworths\tw2': 2}
+
+
+def test_items_sold_each_never_match_a_weighed_pack():
+    clusters = match_products([
+        product(Supermarket.WOOLWORTHS, '1', 'Carrot Fresh each', size='each'),
+        product(Supermarket.COLES, '2', 'Carrots', size='1Kg'),
+    ])
+    assert clusters == []
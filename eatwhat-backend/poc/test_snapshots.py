@@ -0,0 +1,45 @@
+"""Partition replacement of snapshots.write_snapshot"""
+
+import os
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from snapshots import partition_path, read_rows, write_snapshot  # noqa: E402
+
+DAY = '2026-01-24'
+
+
+def crawl(make_row, *stores, price=1.00):
+    return [make_row(f'{store}-1', price, f'{DAY}T06:00:00+00:00', supermarket_brand=store) for store in stores]
+
+
+def brands(root, crawl_date=DAY):
+    return sorted({row['supermarket_brand'] for row in read_rows(str(root), crawl_date)})
+
+
+def test_rerun_replaces_the_partitions_of_the_date(tmp_path, make_row):
+    write_snapshot(crawl(make_row, 'ALDI', 'Coles'), str(tmp_path))
+    write_snapshot(crawl(make_row, 'ALDI', 'Coles', price=2.00), str(tmp_path))
+
+    assert {row['current_price'] for row in read_rows(str(tmp_path), DAY)} == {2.0}
+
+
+def test_store_missing_from_a_rerun_loses_its_stale_partition(tmp_path, make_row):
+    write_snapshot(crawl(make_row, 'ALDI', 'Coles', 'Woolworths'), str(tmp_path))
+    # Coles failed in the second crawl of the day
+    write_snapshot(crawl(make_row, 'ALDI', 'Woolworths'), str(tmp_path))
+
+    assert brands(tmp_path) == ['ALDI', 'Woolworths']
+    assert not os.path.exists(os.path.dirname(partition_path(str(tmp_path), 'Coles', DAY)))
+
+
+def test_other_dates_and_formats_are_kept(tmp_path, make_row):
+    earlier = [make_row('c-1', 1.00, '2026-01-23T06:00:00+00:00', supermarket_brand='Coles')]
+    write_snapshot(earlier, str(tmp_path))
+    write_snapshot(crawl(make_row, 'Coles'), str(tmp_path), file_format='arrow')
+    write_snapshot(crawl(make_row, 'ALDI'), str(tmp_path))
+
+    assert brands(tmp_path, '2026-01-23') == ['Coles']
+    assert os.path.exists(partition_path(str(tmp_path), 'Coles', DAY, 'arrow'))
@@ -0,0 +1,202 @@
+"""
+Unit Price Normalization Engine
+Puts Woolworths cup prices, Coles comparable prices and ALDI per-unit prices
+on a common $/kg, $/L and $/each scale using array computation
+"""
+
+import re
+from collections import namedtuple
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from prices import parse_price_text
+
+
+# Canonical base units, stored as small integer codes in the base_unit column
+BASE_NONE, BASE_KG, BASE_L, BASE_EACH = 0, 1, 2, 3
+BASE_UNIT_NAMES = {BASE_NONE: None, BASE_KG: 'kg', BASE_L: 'l', BASE_EACH: 'each'}
+
+# unit text -> (base unit code, size of one unit in the base unit)
+_UNIT_FACTORS = {
+    'g': (BASE_KG, 0.001), 'gm': (BASE_KG, 0.001), 'gram': (BASE_KG, 0.001), 'grams': (BASE_KG, 0.001),
+    'kg': (BASE_KG, 1.0), 'kilo': (BASE_KG, 1.0), 'kilogram': (BASE_KG, 1.0),
+    'ml': (BASE_L, 0.001), 'millilitre': (BASE_L, 0.001),
+    'l': (BASE_L, 1.0), 'lt': (BASE_L, 1.0), 'litre': (BASE_L, 1.0), 'liter': (BASE_L, 1.0),
+    'ea': (BASE_EACH, 1.0), 'each': (BASE_EACH, 1.0), 'unit': (BASE_EACH, 1.0),
+}
+
+# "1KG", "100G", "1kg", "10 g", "1 each", "kg"
+_MEASURE_PATTERN = re.compile(r'^\s*([\d.]+)?\s*([a-z]+)\s*$')
+
+# Normalized catalogue columns. Prices are float cents per base unit; NaN
+# where the product has no comparison price for that unit.
+UnitPriceTable = namedtuple('UnitPriceTable', ['base_unit', 'per_kg', 'per_l', 'per_each'])
+
+
+def parse_measure(measure) -> Tuple[int, float]:
+    """
+    Parse one comparison measure into its base unit and quantity
+
+    Args:
+        measure: Measure text such as '1KG', '100G', '1kg', '10 g' or '1EA'
+
+    Returns:
+        (base unit code, quantity in base units); (BASE_NONE, nan) if unknown
+    """
+    if not measure:
+        return BASE_NONE, np.nan
+    match = _MEASURE_PATTERN.match(str(measure).lower())
+    if not match or match.group(2) not in _UNIT_FACTORS:
+        return BASE_NONE, np.nan
+    base_unit, factor = _UNIT_FACTORS[match.group(2)]
+    quantity = float(match.group(1)) if match.group(1) else 1.0
+    if quantity <= 0:
+        return BASE_NONE, np.nan
+    return base_unit, quantity * factor
+
+
+def _parse_unique(values: Sequence, parse) -> Tuple[np.ndarray, ...]:
+    """
+    Apply a scalar parser once per distinct value and broadcast the results
+
+    A catalogue has a handful of distinct measures ('1KG', '100G', '1EA', ...)
+    however many products it holds, so per-item parsing cost disappears.
+    """
+    codes = {}
+    inverse = np.fromiter(
+        (codes.setdefault(v, len(codes)) for v in values), dtype=np.intp, count=len(values)
+    )
+    parsed = [parse(value) for value in codes]
+    if not parsed:
+        return np.empty(0, dtype=np.int8), np.empty(0, dtype=np.float64)
+    return tuple(np.asarray(column)[inverse] for column in zip(*parsed))
+
+
+def _float_array(values) -> np.ndarray:
+    """Float64 array from an array or a sequence that may contain None"""
+    if isinstance(values, np.ndarray):
+        return values.astype(np.float64, copy=False)
+    return np.fromiter(
+        (np.nan if v is None else v for v in values), dtype=np.float64, count=len(values)
+    )
+
+
+def normalize(unit_price_cents, measures: Sequence) -> UnitPriceTable:
+    """
+    Normalize comparison prices to cents per kg, per litre and per each
+
+    Args:
+        unit_price_cents: Comparison prices in cents (None/NaN where missing)
+        measures: Matching measure text per price, e.g. '100G', '1kg', '1 each'
+
+    Returns:
+        UnitPriceTable of equal-length arrays
+    """
+    prices = _float_array(unit_price_cents)
+    if len(prices) != len(measures):
+        raise ValueError(f"Got {len(prices)} prices but {len(measures)} measures")
+
+    base_unit, quantity = _parse_unique(measures, parse_measure)
+    base_unit = base_unit.astype(np.int8)
+    quantity = quantity.astype(np.float64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        per_base = prices / quantity
+
+    def column(code):
+        return np.where(base_unit == code, per_base, np.nan)
+
+    return UnitPriceTable(
+        base_unit=np.where(np.isnan(per_base), BASE_NONE, base_unit).astype(np.int8),
+        per_kg=column(BASE_KG),
+        per_l=column(BASE_L),
+        per_each=column(BASE_EACH),
+    )
+
+
+def _parse_comparable(text) -> Tuple[float, str]:
+    """Split "$0.35 / 1EA" into (35.0, '1ea')"""
+    parsed = parse_price_text(text)
+    if not parsed:
+        return np.nan, ''
+    return float(parsed.cents), f"{parsed.quantity:g}{parsed.unit}"
+
+
+def normalize_comparable_strings(texts: Sequence) -> UnitPriceTable:
+    """
+    Normalize raw comparison strings in batch
+
+    Accepts Woolworths CupString ("$0.35 / 1EA"), Coles pricing.comparable
+    ("$1.70/ 1kg") and ALDI price_text ("($0.44 per 10 g)").
+    """
+    cents, measures = _parse_unique(texts, _parse_comparable)
+    return normalize(cents.astype(np.float64), measures)
+
+
+def normalize_products(products: Iterable) -> UnitPriceTable:
+    """Normalize the unit prices of a sequence of Product records"""
+    products = list(products)
+    return normalize(
+        [p.unit_price_cents for p in products],
+        [p.unit_measure for p in products],
+    )
+
+
+def price_column(table: UnitPriceTable, base_unit: int) -> np.ndarray:
+    """Select the per-kg, per-litre or per-each column by base unit code"""
+    return {BASE_KG: table.per_kg, BASE_L: table.per_l, BASE_EACH: table.per_each}[base_unit]
+
+
+def cheapest(table: UnitPriceTable, base_unit: int, count: int = 10,
+             mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Indices of the cheapest products by normalized unit price
+
+    Args:
+        table: Normalized unit prices
+        base_unit: BASE_KG, BASE_L or BASE_EACH
+        count: Number of indices to return
+        mask: Optional boolean array restricting the candidates
+
+    Returns:
+        Product indices, cheapest first
+    """
+    values = price_column(table, base_unit)
+    if mask is not None:
+        values = np.where(mask, values, np.nan)
+    candidates = np.flatnonzero(~np.isnan(values))
+    if len(candidates) > count:
+        candidates = candidates[np.argpartition(values[candidates], count)[:count]]
+    return candidates[np.argsort(values[candidates], kind='stable')]
+
+
+def main():
+    """Example: normalize the combined scraper output and show the cheapest per kg"""
+    import json
+    from compression import open_input, resolve_input
+    import time
+    from prices import format_cents
+    from product import products_from_scraped
+
+    with open_input(resolve_input("all_supermarkets_products.json")) as f:
+        data = json.load(f)
+
+    products = []
+    for section in data['supermarkets'].values():
+        products.extend(products_from_scraped(section['products']))
+
+    start = time.perf_counter()
+    table = normalize_products(products)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Normalized {len(products)} unit prices in {elapsed:.2f} ms")
+
+    print("\nCheapest per kg:")
+    for i in cheapest(table, BASE_KG, count=5):
+        product = products[i]
+        print(f"  {product.supermarket.value:<10} {product.name}: "
+              f"{format_cents(round(table.per_kg[i]))}/kg")
+
+
+if __name__ == "__main__":
+    main()
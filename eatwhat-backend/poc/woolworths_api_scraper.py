@@ -10,6 +10,8 @@ import requests
 import json
 import time
 
+from prices import discount_percentage, to_cents
+
 
 class WoolworthsAPIClient:
     """Client for Woolworths internal API"""
@@ -158,11 +160,9 @@ class WoolworthsAPIClient:
 
                 # Calculate discount percentage
                 if product['was_price'] and product['price']:
-                    try:
-                        discount = ((product['was_price'] - product['price']) / product['was_price']) * 100
-                        product['discount_percentage'] = round(discount, 1)
-                    except:
-                        pass
+                    product['discount_percentage'] = discount_percentage(
+                        to_cents(product['price']), to_cents(product['was_price'])
+                    )
 
                 products.append(product)
 
@@ -5,15 +5,23 @@ Uses Woolworths' public Search API
 
 import requests
 import json
+import logging
 import time
 
+from prices import discount_percentage, to_cents
+
+
+log = logging.getLogger(__name__)
+
 
 class WoolworthsScraper:
     """Scraper using Woolworths public API"""
 
-    def __init__(self):
-        self.base_url = "https://www.woolworths.com.au/apis/ui/Search/products"
-        self.session = requests.Session()
+    def __init__(self, session=None, base_url="https://www.woolworths.com.au"):
+        # base_url can point at a mock server (mock_supermarket_server.py)
+        self.base_url = base_url.rstrip('/') + "/apis/ui/Search/products"
+        # Injected sessions let the pipeline replay captured responses (replay.py)
+        self.session = session or requests.Session()
 
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -23,13 +31,14 @@ class WoolworthsScraper:
             'Origin': 'https://www.woolworths.com.au'
         })
 
-    def search_products(self, search_term, page_size=36):
+    def search_products(self, search_term, page_size=36, page=1):
         """
         Search for products
 
         Args:
             search_term: What to search for (e.g., 'vegetables', 'carrots')
             page_size: Number of results (max seems to be 36)
+            page: Results page, starting at 1
 
         Returns:
             list: Product data
@@ -38,20 +47,22 @@ class WoolworthsScraper:
             'searchTerm': search_term,
             'pageSize': page_size
         }
+        if page > 1:
+            params['pageNumber'] = page
 
         try:
-            print(f"Searching for: {search_term}")
+            log.info("Searching for: %s", search_term)
             response = self.session.get(self.base_url, params=params, timeout=30)
 
             if response.status_code == 200:
                 data = response.json()
                 return self._extract_products(data)
             else:
-                print(f"Error: Status {response.status_code}")
+                log.error("Search HTTP %s", response.status_code)
                 return []
 
         except Exception as e:
-            print(f"Exception: {e}")
+            log.error("Search failed: %s", e)
             return []
 
     def _extract_products(self, api_response):
@@ -95,16 +106,14 @@ class WoolworthsScraper:
                     }
 
                     # Calculate discount percentage
-                    if product['was_price'] and product['price'] and product['was_price'] > product['price']:
-                        discount = ((product['was_price'] - product['price']) / product['was_price']) * 100
-                        product['discount_percentage'] = round(discount, 1)
-                    else:
-                        product['discount_percentage'] = 0
+                    product['discount_percentage'] = discount_percentage(
+                        to_cents(product['price']), to_cents(product['was_price'])
+                    )
 
                     products.append(product)
 
                 except Exception as e:
-                    print(f"Error extracting product: {e}")
+                    log.warning("Failed to extract product: %s", e)
                     continue
 
         return products
@@ -114,9 +123,9 @@ class WoolworthsScraper:
         all_products = []
 
         for i, category in enumerate(categories):
-            print(f"\n[{i+1}/{len(categories)}] Processing category: {category}")
+            log.info("[%d/%d] Processing category: %s", i + 1, len(categories), category)
             products = self.search_products(category, page_size=36)
-            print(f"  Found {len(products)} products")
+            log.info("Found %d products", len(products))
             all_products.extend(products)
 
             # Rate limiting - be nice to the API
@@ -128,6 +137,7 @@ class WoolworthsScraper:
 
 def main():
     """Main function"""
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
     print("=" * 70)
     print("Woolworths Product Scraper - WORKING VERSION")
     print("=" * 70)
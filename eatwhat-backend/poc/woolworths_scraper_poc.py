@@ -12,6 +12,8 @@ import time
 from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
 
+from prices import to_cents, to_dollars
+
 
 class WoolworthsScraper:
     """Scraper for Woolworths online grocery store"""
@@ -186,13 +188,12 @@ class WoolworthsScraper:
         if price_elem:
             dollars = price_elem.get_text(strip=True).replace('$', '')
             cents = cents_elem.get_text(strip=True) if cents_elem else '00'
-            product['price'] = f"{dollars}.{cents}"
+            product['price'] = to_dollars(to_cents(f"{dollars}.{cents}"))
         else:
             # Try to find price in different formats
             price_text = tile.find(class_=lambda x: x and 'price' in x.lower())
             if price_text:
-                price_str = price_text.get_text(strip=True).replace('$', '')
-                product['price'] = price_str
+                product['price'] = to_dollars(to_cents(price_text.get_text(strip=True)))
 
         # Size/Weight
         size_elem = (
@@ -224,7 +225,7 @@ class WoolworthsScraper:
         sale_elem = tile.find(attrs={'data-testid': 'price-was'})
         if sale_elem:
             product['on_sale'] = True
-            product['original_price'] = sale_elem.get_text(strip=True).replace('was $', '')
+            product['original_price'] = to_dollars(to_cents(sale_elem.get_text(strip=True)))
         else:
             product['on_sale'] = False
 
@@ -1,5 +1,7 @@
 import * as fs from 'fs'
 import * as path from 'path'
+import * as readline from 'readline'
+import * as zlib from 'zlib'
 import { createClient } from '@supabase/supabase-js'
 
 // Parse .env
@@ -12,10 +14,12 @@ envContent.split('\n').forEach(line => {
 
 const supabase = createClient(env.SUPABASE_URL, env.SUPABASE_SERVICE_KEY)
 
-interface NormalizedProduct {
+// Rows are produced by poc/normalize.py and already match supermarket_products
+interface SupermarketProductInsert {
   supermarket_brand: string
   product_id: string
   name: string
+  category: string | null
   brand: string | null
   size: string | null
   image_url: string | null
@@ -23,130 +27,177 @@ interface NormalizedProduct {
   original_price: number | null
   is_on_sale: boolean
   discount_percentage: number | null
-  category: string | null
+  sale_end_date: string | null
   scraped_at: string
 }
 
-function normalizeWoolworths(raw: any): NormalizedProduct {
-  return {
-    supermarket_brand: 'Woolworths',
-    product_id: String(raw.stockcode),
-    name: raw.name,
-    brand: raw.brand || null,
-    size: raw.package_size || null,
-    image_url: raw.image_medium || null,
-    current_price: raw.price,
-    original_price: raw.was_price || null,
-    is_on_sale: raw.on_sale || false,
-    discount_percentage: raw.discount_percentage ? Math.round(raw.discount_percentage) : null,
-    category: raw.category || null,
-    scraped_at: new Date().toISOString(),
-  }
+// Lines of a delta file from poc/delta_export.py carry an op; plain rows are upserts
+type DeltaOp = 'insert' | 'update' | 'delete'
+
+interface ImportRecord extends SupermarketProductInsert {
+  op?: DeltaOp
 }
 
-function normalizeColes(raw: any): NormalizedProduct {
-  return {
-    supermarket_brand: 'Coles',
-    product_id: String(raw.product_id),
-    name: raw.name,
-    brand: raw.brand || null,
-    size: raw.size || null,
-    image_url: raw.image_url || null,
-    current_price: raw.price,
-    original_price: raw.was_price || null,
-    is_on_sale: raw.on_sale || false,
-    discount_percentage: raw.discount_percentage ? Math.round(raw.discount_percentage) : null,
-    category: raw.category || null,
-    scraped_at: new Date().toISOString(),
+const BATCH_SIZE = 100
+
+// Written by poc/delta_export.py next to the delta; it replaces the export
+// state only once the whole delta has been imported
+const STATE_FILE = 'export_state.json.gz'
+const PENDING_STATE_FILE = 'export_state.pending.json.gz'
+
+// Batches whose upsert or delete failed; any failure makes the import exit nonzero
+let failedBatches = 0
+
+async function upsertBatch(batch: SupermarketProductInsert[], batchNumber: number) {
+  const { error } = await supabase
+    .from('supermarket_products')
+    .upsert(batch, { onConflict: 'supermarket_brand,product_id' })
+
+  if (error) {
+    console.error(`Batch ${batchNumber} failed:`, error.message)
+    failedBatches++
+  } else {
+    console.log(`  Upserted batch ${batchNumber} (${batch.length} products)`)
   }
 }
 
-function normalizeAldi(raw: any): NormalizedProduct {
-  return {
-    supermarket_brand: 'ALDI',
-    product_id: raw.product_id,
-    name: raw.name,
-    brand: raw.brand || null,
-    size: raw.unit || null,
-    image_url: raw.image_url || null,
-    current_price: raw.price,
-    original_price: null,
-    is_on_sale: false,
-    discount_percentage: null,
-    category: null,
-    scraped_at: new Date().toISOString(),
+async function deleteBatch(batch: ImportRecord[], batchNumber: number) {
+  const byBrand = new Map<string, string[]>()
+  for (const record of batch) {
+    const ids = byBrand.get(record.supermarket_brand) || []
+    ids.push(record.product_id)
+    byBrand.set(record.supermarket_brand, ids)
+  }
+
+  let failed = false
+  for (const [brand, ids] of byBrand) {
+    const { error } = await supabase
+      .from('supermarket_products')
+      .delete()
+      .eq('supermarket_brand', brand)
+      .in('product_id', ids)
+
+    if (error) {
+      console.error(`Delete batch ${batchNumber} (${brand}) failed:`, error.message)
+      failed = true
+    }
+  }
+  if (failed) {
+    failedBatches++
+  } else {
+    console.log(`  Deleted batch ${batchNumber} (${batch.length} products)`)
   }
 }
 
-function detectSupermarket(product: any): string {
-  if (product.supermarket) {
-    const s = product.supermarket.toLowerCase()
-    if (s === 'woolworths') return 'woolworths'
-    if (s === 'coles') return 'coles'
-    if (s === 'aldi') return 'aldi'
+// Advances the export state of poc/delta_export.py once its delta is imported
+// (same as: python poc/delta_export.py --confirm <delta file>)
+function confirmDelta(filePath: string) {
+  const dir = path.dirname(filePath)
+  const pendingPath = path.join(dir, PENDING_STATE_FILE)
+  if (!fs.existsSync(pendingPath)) return
+  const pending = JSON.parse(zlib.gunzipSync(fs.readFileSync(pendingPath)).toString('utf-8'))
+  if (pending.delta !== path.basename(filePath)) {
+    console.warn(`${pendingPath} belongs to ${pending.delta}; export state not advanced`)
+    return
   }
-  if (product.stockcode) return 'woolworths'
-  return 'unknown'
+  fs.renameSync(pendingPath, path.join(dir, STATE_FILE))
+  console.log(`Export state advanced: ${path.join(dir, STATE_FILE)}`)
 }
 
-function normalizeProduct(raw: any): NormalizedProduct | null {
-  const supermarket = detectSupermarket(raw)
-  switch (supermarket) {
-    case 'woolworths': return normalizeWoolworths(raw)
-    case 'coles': return normalizeColes(raw)
-    case 'aldi': return normalizeAldi(raw)
-    default:
-      console.warn(`Unknown supermarket for product: ${raw.name}`)
-      return null
+// Opens a file as a text stream, decompressing .gz on the fly
+function openText(filePath: string): NodeJS.ReadableStream {
+  if (filePath.endsWith('.zst')) {
+    throw new Error('Zstandard input is not supported here; write .gz or decompress with: python poc/compression.py decompress <file>')
   }
+  const stream = fs.createReadStream(filePath)
+  return filePath.endsWith('.gz') ? stream.pipe(zlib.createGunzip()) : stream
 }
 
-async function upsertBatch(products: NormalizedProduct[]) {
-  const batchSize = 100
-  for (let i = 0; i < products.length; i += batchSize) {
-    const batch = products.slice(i, i + batchSize)
-    const { error } = await supabase
-      .from('supermarket_products')
-      .upsert(batch, { onConflict: 'supermarket_brand,product_id' })
+async function readAll(stream: NodeJS.ReadableStream): Promise<string> {
+  const chunks: Buffer[] = []
+  for await (const chunk of stream) chunks.push(Buffer.from(chunk))
+  return Buffer.concat(chunks).toString('utf-8')
+}
 
-    if (error) {
-      console.error(`Batch ${Math.floor(i / batchSize) + 1} failed:`, error.message)
-    } else {
-      console.log(`  Upserted batch ${Math.floor(i / batchSize) + 1} (${batch.length} products)`)
+// Yields rows from a JSON array file, or line by line from an .ndjson file
+// (either optionally gzip-compressed)
+async function* readRows(filePath: string): AsyncGenerator<ImportRecord> {
+  if (filePath.replace(/\.gz$/, '').endsWith('.ndjson')) {
+    const lines = readline.createInterface({
+      input: openText(filePath),
+      crlfDelay: Infinity,
+    })
+    for await (const line of lines) {
+      if (line.trim()) yield JSON.parse(line)
     }
+    return
   }
+
+  const rows = JSON.parse(await readAll(openText(filePath)))
+  if (!Array.isArray(rows)) {
+    throw new Error(
+      'Expected an array of supermarket_products rows. ' +
+      'Convert scraper output first: python poc/normalize.py <scraper-output.json>'
+    )
+  }
+  yield* rows
 }
 
 async function main() {
-  // Default: reads all_supermarkets_products.json from poc/
+  // Default: reads all_supermarkets_products.ndjson, the rows the last
+  //          poc/scrape_all_supermarkets.py crawl wrote to poc/
   // Override: npx ts-node scripts/import-products.ts path/to/file.json
-  const filePath = process.argv[2] || path.resolve(__dirname, '..', 'poc', 'all_supermarkets_products.json')
+  //           npx ts-node scripts/import-products.ts path/to/file.ndjson
+  //           npx ts-node scripts/import-products.ts poc/supermarket_products.delta.ndjson
+  const filePath = process.argv[2] || path.resolve(__dirname, '..', 'poc', 'all_supermarkets_products.ndjson')
   console.log(`Reading: ${filePath}`)
 
-  const raw = JSON.parse(fs.readFileSync(filePath, 'utf-8'))
-
-  let products: any[] = []
+  let batch: SupermarketProductInsert[] = []
+  let deletes: ImportRecord[] = []
+  let batchNumber = 0
+  let total = 0
+  let deleted = 0
+  let isDelta = false
+
+  for await (const record of readRows(filePath)) {
+    const { op, ...row } = record
+    if (op) isDelta = true
+    if (op === 'delete') {
+      deletes.push(record)
+      deleted++
+      if (deletes.length === BATCH_SIZE) {
+        await deleteBatch(deletes, ++batchNumber)
+        deletes = []
+      }
+      continue
+    }
 
-  if (Array.isArray(raw)) {
-    // Flat array (individual scraper output)
-    products = raw
-  } else if (raw.supermarkets) {
-    // Combined format: { supermarkets: { woolworths: { products: [] }, ... } }
-    for (const key of Object.keys(raw.supermarkets)) {
-      products.push(...(raw.supermarkets[key].products || []))
+    batch.push(row)
+    total++
+    if (batch.length === BATCH_SIZE) {
+      await upsertBatch(batch, ++batchNumber)
+      batch = []
     }
   }
+  if (batch.length > 0) {
+    await upsertBatch(batch, ++batchNumber)
+  }
+  if (deletes.length > 0) {
+    await deleteBatch(deletes, ++batchNumber)
+  }
 
-  console.log(`Found ${products.length} raw products`)
-
-  const normalized = products
-    .map(normalizeProduct)
-    .filter((p): p is NormalizedProduct => p !== null)
-
-  console.log(`Normalized ${normalized.length} products`)
+  if (failedBatches > 0) {
+    throw new Error(`${failedBatches} of ${batchNumber} batches failed; re-run the import on the same file`)
+  }
 
-  await upsertBatch(normalized)
+  console.log(`Imported ${total} rows` + (deleted ? `, deleted ${deleted}` : ''))
+  if (isDelta || filePath.replace(/\.gz$/, '').endsWith('.delta.ndjson')) {
+    confirmDelta(filePath)
+  }
   console.log('Done.')
 }
 
-main()
+main().catch(err => {
+  console.error(err.message)
+  process.exit(1)
+})
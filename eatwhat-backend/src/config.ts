@@ -17,4 +17,6 @@ export const config = {
   supabaseServiceKey: process.env.SUPABASE_SERVICE_KEY!,
   frontendUrl: process.env.FRONTEND_URL || 'http://localhost:3000',
   nodeEnv: process.env.NODE_ENV || 'development',
+  // Trigram index written by poc/product_index.py; Fuse over all products is used without it
+  productIndexPath: process.env.PRODUCT_INDEX_PATH || 'poc/product_index.json',
 }
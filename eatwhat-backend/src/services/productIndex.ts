@@ -0,0 +1,113 @@
+import * as fs from 'fs'
+import * as zlib from 'zlib'
+import { config } from '../config'
+
+// Loader for the trigram index built by poc/product_index.py after each crawl.
+// Normalisation and scoring must stay in step with that file.
+
+export interface ProductIndexMatch {
+  supermarket_brand: string
+  product_id: string
+  name: string
+  match_score: number
+}
+
+interface ProductIndexFile {
+  version: number
+  keys: [string, string][]
+  names: string[]
+  gram_counts: number[]
+  postings: Record<string, number[]>
+}
+
+const INDEX_VERSION = 1
+
+// Same cut-off as the Fuse threshold of 0.4 (match_score = 1 - score)
+export const DEFAULT_MIN_SCORE = 0.6
+
+export function trigrams(text: string): Set<string> {
+  const grams = new Set<string>()
+  for (const word of text.toLowerCase().replace(/[^0-9a-z]+/g, ' ').split(' ')) {
+    if (!word) continue
+    const padded = `  ${word} `
+    for (let i = 0; i < padded.length - 2; i++) grams.add(padded.slice(i, i + 3))
+  }
+  return grams
+}
+
+export class ProductIndex {
+  private readonly keys: [string, string][]
+  private readonly names: string[]
+  private readonly gramCounts: number[]
+  private readonly postings = new Map<string, Uint32Array>()
+
+  constructor(data: ProductIndexFile) {
+    if (data.version !== INDEX_VERSION) {
+      throw new Error(`Unsupported product index version: ${data.version}`)
+    }
+    this.keys = data.keys
+    this.names = data.names
+    this.gramCounts = data.gram_counts
+    // Postings are stored as gaps between ascending product numbers
+    for (const [gram, gaps] of Object.entries(data.postings)) {
+      const numbers = new Uint32Array(gaps.length)
+      let total = 0
+      gaps.forEach((gap, i) => {
+        total += gap
+        numbers[i] = total
+      })
+      this.postings.set(gram, numbers)
+    }
+  }
+
+  get size(): number {
+    return this.keys.length
+  }
+
+  // Best matches for an ingredient; only the postings of its trigrams are read
+  search(term: string, limit = 5, minScore = DEFAULT_MIN_SCORE): ProductIndexMatch[] {
+    const query = trigrams(term)
+    if (query.size === 0) return []
+
+    const hits = new Map<number, number>()
+    for (const gram of query) {
+      const numbers = this.postings.get(gram)
+      if (!numbers) continue
+      for (const number of numbers) hits.set(number, (hits.get(number) || 0) + 1)
+    }
+
+    const needed = Math.max(1, Math.ceil(minScore * query.size - 1e-9))
+    const ranked: [number, number, number][] = []
+    for (const [number, shared] of hits) {
+      if (shared >= needed) ranked.push([shared, shared / this.gramCounts[number], number])
+    }
+    // Most shared trigrams first, then the best-covered (shortest) name
+    ranked.sort((a, b) => b[0] - a[0] || b[1] - a[1] || a[2] - b[2])
+
+    return ranked.slice(0, limit).map(([shared, , number]) => ({
+      supermarket_brand: this.keys[number][0],
+      product_id: this.keys[number][1],
+      name: this.names[number],
+      match_score: parseFloat((shared / query.size).toFixed(2)),
+    }))
+  }
+}
+
+let cached: { path: string; mtimeMs: number; index: ProductIndex } | null = null
+
+// Loads the index (or its .gz sibling), reloading when a new crawl replaces it.
+// Returns null when no index has been built, so callers can fall back.
+export function loadProductIndex(filePath = config.productIndexPath): ProductIndex | null {
+  const candidates = [filePath, `${filePath}.gz`]
+  const found = candidates.find(p => fs.existsSync(p))
+  if (!found) return null
+
+  const { mtimeMs } = fs.statSync(found)
+  if (cached && cached.path === found && cached.mtimeMs === mtimeMs) return cached.index
+
+  let raw = fs.readFileSync(found)
+  if (found.endsWith('.gz')) raw = zlib.gunzipSync(raw)
+  const index = new ProductIndex(JSON.parse(raw.toString('utf-8')))
+  cached = { path: found, mtimeMs, index }
+  return index
+}
@@ -1,6 +1,7 @@
 import Fuse from 'fuse.js'
 import { supabaseService } from '../supabase'
 import { SupermarketProductRow, ShoppingListItem, ShoppingListResponse } from '../types'
+import { ProductIndex, ProductIndexMatch, loadProductIndex } from './productIndex'
 
 interface AggregatedIngredient {
   name: string
@@ -54,36 +55,12 @@ export async function generateShoppingList(mealPlanId: string): Promise<Shopping
     }
   }
 
-  // 4. Fetch all supermarket products for fuzzy matching
-  const { data: products } = await supabaseService
-    .from('supermarket_products')
-    .select('*')
-
-  const allProducts = (products || []) as SupermarketProductRow[]
-
-  // 5. Fuzzy match each aggregated ingredient
-  const fuse = new Fuse(allProducts, {
-    keys: ['name'],
-    threshold: 0.4,
-    includeScore: true,
-  })
-
-  const matched: ShoppingListItem[] = []
-
-  for (const [, ingredient] of aggregated) {
-    const searchTerm = ingredient.name_en || ingredient.name
-    const results = fuse.search(searchTerm)
-    const bestMatch = results.length > 0 ? results[0] : null
-
-    matched.push({
-      ingredient_name: ingredient.name,
-      ingredient_name_en: ingredient.name_en,
-      quantity: ingredient.quantity,
-      unit: ingredient.unit,
-      matched_product: bestMatch ? bestMatch.item : null,
-      match_score: bestMatch ? parseFloat((1 - (bestMatch.score || 1)).toFixed(2)) : 0,
-    })
-  }
+  // 4-5. Match each aggregated ingredient: through the precomputed trigram
+  //      index when one has been built, otherwise fuzzy-match every product
+  const index = loadProductIndex()
+  const matched = index
+    ? await matchWithIndex(index, aggregated)
+    : await matchWithFuse(aggregated)
 
   // 6. Group by supermarket
   const grouped: ShoppingListResponse['items_by_supermarket'] = {
@@ -117,3 +94,85 @@ export async function generateShoppingList(mealPlanId: string): Promise<Shopping
     total_cost: parseFloat(totalCost.toFixed(2)),
   }
 }
+
+function toItem(ingredient: AggregatedIngredient, product: SupermarketProductRow | null, score: number): ShoppingListItem {
+  return {
+    ingredient_name: ingredient.name,
+    ingredient_name_en: ingredient.name_en,
+    quantity: ingredient.quantity,
+    unit: ingredient.unit,
+    matched_product: product,
+    match_score: product ? score : 0,
+  }
+}
+
+// Looks up candidates in the index, then fetches only those products
+async function matchWithIndex(
+  index: ProductIndex,
+  aggregated: Map<string, AggregatedIngredient>
+): Promise<ShoppingListItem[]> {
+  const candidates = new Map<string, ProductIndexMatch[]>()
+  const idsByBrand = new Map<string, Set<string>>()
+
+  for (const [key, ingredient] of aggregated) {
+    const results = index.search(ingredient.name_en || ingredient.name)
+    candidates.set(key, results)
+    for (const result of results) {
+      const ids = idsByBrand.get(result.supermarket_brand) || new Set<string>()
+      ids.add(result.product_id)
+      idsByBrand.set(result.supermarket_brand, ids)
+    }
+  }
+
+  const products = new Map<string, SupermarketProductRow>()
+  for (const [brand, ids] of idsByBrand) {
+    const { data } = await supabaseService
+      .from('supermarket_products')
+      .select('*')
+      .eq('supermarket_brand', brand)
+      .in('product_id', [...ids])
+
+    for (const row of (data || []) as SupermarketProductRow[]) {
+      products.set(`${row.supermarket_brand}|${row.product_id}`, row)
+    }
+  }
+
+  const matched: ShoppingListItem[] = []
+  for (const [key, ingredient] of aggregated) {
+    // The index may be a crawl ahead of or behind the table; take the best candidate still present
+    const best = (candidates.get(key) || []).find(c => products.has(`${c.supermarket_brand}|${c.product_id}`))
+    const product = best ? products.get(`${best.supermarket_brand}|${best.product_id}`)! : null
+    matched.push(toItem(ingredient, product, best ? best.match_score : 0))
+  }
+  return matched
+}
+
+async function matchWithFuse(aggregated: Map<string, AggregatedIngredient>): Promise<ShoppingListItem[]> {
+  // Fetch all supermarket products for fuzzy matching
+  const { data: products } = await supabaseService
+    .from('supermarket_products')
+    .select('*')
+
+  const allProducts = (products || []) as SupermarketProductRow[]
+
+  const fuse = new Fuse(allProducts, {
+    keys: ['name'],
+    threshold: 0.4,
+    includeScore: true,
+  })
+
+  const matched: ShoppingListItem[] = []
+
+  for (const [, ingredient] of aggregated) {
+    const searchTerm = ingredient.name_en || ingredient.name
+    const results = fuse.search(searchTerm)
+    const bestMatch = results.length > 0 ? results[0] : null
+
+    matched.push(toItem(
+      ingredient,
+      bestMatch ? bestMatch.item : null,
+      bestMatch ? parseFloat((1 - (bestMatch.score || 1)).toFixed(2)) : 0
+    ))
+  }
+  return matched
+}